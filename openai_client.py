@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+
+import httpx
+from openai import OpenAI
+
+# Connection pool, timeout and retry settings, can be tuned via environment variables
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "16"))
+TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "300"))
+CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+
+METRICS_PATH = os.path.join("intermediate", "metrics", "openai_calls.jsonl")
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str = None) -> OpenAI:
+    """
+    Get the shared OpenAI client of this process.
+    All callers share one HTTP connection pool, so connections are kept alive between calls.
+
+    Args:
+        api_key (str): Optional API key, defaults to OPENAI_API_KEY
+
+    Returns:
+        OpenAI: The pooled client
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+                ),
+                timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT)
+            )
+            client = OpenAI(
+                api_key=api_key,
+                http_client=http_client,
+                max_retries=MAX_RETRIES,
+                timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT)
+            )
+            _clients[api_key] = client
+    return client
+
+
+class MetricsSink:
+    """Collects latency, token usage and model of every API call and appends them to a JSONL file."""
+
+    def __init__(self, path: str = METRICS_PATH):
+        self.path = path
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, model: str, latency: float, usage=None, error: str = None, **extra):
+        entry = {
+            "timestamp": time.time(),
+            "pid": os.getpid(),
+            "stage": stage,
+            "model": model,
+            "latency": round(latency, 3),
+            "tokens": _usage_to_dict(usage),
+        }
+        if error:
+            entry["error"] = error
+        entry.update(extra)
+        with self._lock:
+            self.records.append(entry)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def summary(self) -> dict:
+        """Aggregate the calls of this process per stage."""
+        stages = {}
+        with self._lock:
+            records = list(self.records)
+        for entry in records:
+            stage = stages.setdefault(entry["stage"], {"calls": 0, "errors": 0, "latency": 0.0, "tokens": 0})
+            stage["calls"] += 1
+            stage["errors"] += 1 if "error" in entry else 0
+            stage["latency"] += entry["latency"]
+            stage["tokens"] += entry["tokens"].get("total_tokens", 0)
+        return stages
+
+    def print_summary(self):
+        for stage, s in sorted(self.summary().items()):
+            print(f"- {stage}: {s['calls']} calls, {s['errors']} errors, "
+                  f"{s['latency']:.1f}s total latency, {s['tokens']} tokens")
+
+
+metrics = MetricsSink()
+
+
+def _usage_to_dict(usage) -> dict:
+    """Normalize the usage objects of the chat, image and audio endpoints."""
+    if usage is None:
+        return {}
+    tokens = {}
+    for key in ("prompt_tokens", "completion_tokens", "input_tokens", "output_tokens", "total_tokens"):
+        value = getattr(usage, key, None)
+        if value is not None:
+            tokens[key] = value
+    if "total_tokens" not in tokens and tokens:
+        tokens["total_tokens"] = sum(tokens.values())
+    return tokens
+
+
+def tracked_call(stage: str, fn, **kwargs):
+    """
+    Call an API method and record its latency, token usage and model in the metrics sink.
+
+    Args:
+        stage (str): Name of the pipeline stage making the call
+        fn (callable): API method, e.g. client.chat.completions.create
+        **kwargs: Arguments for the API method
+
+    Returns:
+        The API response
+    """
+    start = time.perf_counter()
+    try:
+        response = fn(**kwargs)
+    except Exception as e:
+        metrics.record(stage, kwargs.get("model"), time.perf_counter() - start, error=str(e))
+        raise
+    metrics.record(stage, kwargs.get("model"), time.perf_counter() - start, getattr(response, "usage", None))
+    return response
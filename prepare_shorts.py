@@ -5,136 +5,212 @@ import shutil
 
 import dotenv
 
-from video_processing.audio_converter import convert_to_mp3
-from video_processing.transcriber import transcribe_audio, get_word_level_timestamps
+# The modules read their settings (OPENAI_*, RENDER_PROFILE, REFRAME, ...) from the
+# environment when they are imported, so .env has to be loaded before them
+dotenv.load_dotenv()
+
+from openai_client import metrics
+
+from video_processing.audio_converter import convert_to_mp3, extract_asr_audio
+from video_processing.pcm_cache import open_session_audio
+from video_processing.proxy_media import build_proxy
+from video_processing.shot_index import build_shot_index, ShotIndex
+from video_processing.transcriber import transcribe_audio, find_sentence_words, words_to_timestamps
 from video_processing.transcript_reader import get_transcript_text, find_sentence_timestamps
 from video_processing.video_cutter import cut_video_clip
 from text_mining.extract_topics import extract_topics
-from text_mining.extract_speeches import extract_speeches
+from text_mining.extract_speeches import extract_speeches, iter_speeches
 from text_mining.extract_statements import extract_statements
 from text_mining.score_statements import score_statements
 from text_mining.create_topic_collections import create_topic_collections
 from text_mining.create_dialogues import create_dialogues
 from text_mining.extract_responses import extract_responses
 from text_mining.score_dialogues import score_dialogues
+from text_mining.streaming_pipeline import run_streaming_pipeline
 
 
 def create_shorts_from_collections(input_video_path: str, transcript_path: str):
     """
-    Create video shorts from topic collections using a two-step cutting process:
-    1. Rough cut using sentence-level timestamps
+    Create video shorts from topic collections using a two-step process:
+    1. Rough timestamps from the sentence-level transcript, the padded audio is aligned
     2. Precise cut using word-level timestamps
     
     Args:
         input_video_path (str): Path to the input video file
         transcript_path (str): Path to the transcript JSON file
     """
-    # Create shorts_draft directory
-    shorts_draft_dir = os.path.join("intermediate", "shorts_draft")
-    os.makedirs(shorts_draft_dir, exist_ok=True)
-    
     # Get all topic collection files
     topic_collections_dir = os.path.join("intermediate", "topic_collections")
     for collection_file in os.listdir(topic_collections_dir):
         if not collection_file.endswith(".jsonl"):
             continue
-            
-        # Create topic-specific directory
-        topic_name = os.path.splitext(collection_file)[0]
-        topic_dir = os.path.join(shorts_draft_dir, topic_name)
-        os.makedirs(topic_dir, exist_ok=True)
-        
-        # Copy the collection file
-        shutil.copy2(
+        create_short_from_collection(
             os.path.join(topic_collections_dir, collection_file),
-            os.path.join(topic_dir, collection_file)
+            input_video_path,
+            transcript_path
         )
+
+
+def use_rough_cut(statement: dict, topic_dir: str, input_video_path: str, proxy_path: str,
+                  rough_start: float, rough_end: float) -> bool:
+    """
+    Cut the padded rough range of a statement as its clip, when there is no precise cut.
+    
+    Returns:
+        bool: True if the rough clip was created
+    """
+    rough_clip_path = os.path.join(topic_dir, f"statement_{statement['id']}_rough.mp4")
+    try:
+        cut_video_clip(input_video_path, rough_clip_path, rough_start, rough_end)
+    except Exception as e:
+        print(f"Error creating rough clip for statement {statement['id']}: {e}")
+        return False
+    statement["clip_path"] = rough_clip_path
+    statement["timestamps"] = {
+        "rough": {"start": rough_start, "end": rough_end},
+        "precise": None
+    }
+    statement["source"] = {"video": input_video_path, "proxy": proxy_path, "start": rough_start, "end": rough_end}
+    return True
+
+
+def create_short_from_collection(collection_path: str, input_video_path: str, transcript_path: str):
+    """
+    Cut the clips for a single topic collection into its shorts_draft directory.
+    
+    Args:
+        collection_path (str): Path to the topic collection file
+        input_video_path (str): Path to the input video file
+        transcript_path (str): Path to the transcript JSON file
+    """
+    # Create shorts_draft directory
+    shorts_draft_dir = os.path.join("intermediate", "shorts_draft")
+    os.makedirs(shorts_draft_dir, exist_ok=True)
+    
+    # Create topic-specific directory
+    collection_file = os.path.basename(collection_path)
+    topic_name = os.path.splitext(collection_file)[0]
+    topic_dir = os.path.join(shorts_draft_dir, topic_name)
+    os.makedirs(topic_dir, exist_ok=True)
+    
+    # Copy the collection file
+    shutil.copy2(collection_path, os.path.join(topic_dir, collection_file))
+    
+    # Read the collection
+    with open(os.path.join(topic_dir, collection_file), 'r', encoding='utf-8') as f:
+        collection = json.load(f)
+    
+    # The word alignment reads padded excerpts of the memory-mapped session audio,
+    # the video is only cut once at the final timestamps
+    session_audio = open_session_audio(input_video_path)
+    # The analysis stages read the clips from the low resolution proxy, only the cuts
+    # and the final renders touch the original
+    proxy_path = build_proxy(input_video_path)
+    # Camera switches of the session, the cuts snap to them
+    try:
+        shot_index = build_shot_index(proxy_path)
+    except Exception as e:
+        print(f"Warning: Shot detection of {proxy_path} failed, the cuts are not snapped: {e}")
+        shot_index = ShotIndex([], session_audio.duration)
+
+    # Process each statement
+    for statement in collection["statements"]:
+        quote = statement["quote"]
         
-        # Read the collection
-        with open(os.path.join(topic_dir, collection_file), 'r', encoding='utf-8') as f:
-            collection = json.load(f)
-        
-        # Process each statement
-        for statement in collection["statements"]:
-            quote = statement["quote"]
-            
-            # Step 1: Get rough timestamps and create initial cut
-            rough_timestamps = find_sentence_timestamps(quote, transcript_path)
-            if rough_timestamps is None:
-                print(f"Could not find rough timestamps for quote: {quote[:100]}...")
-                continue
-                
-            rough_start, rough_end = rough_timestamps
-            # add a 10 second buffer
-            rough_start -= 10
-            rough_end += 10
-            
-            # Create rough cut
-            rough_clip_filename = f"statement_{statement['id']}_rough.mp4"
-            rough_clip_path = os.path.join(topic_dir, rough_clip_filename)
-            
-            try:
-                cut_video_clip(input_video_path, rough_clip_path, rough_start, rough_end)
-            except Exception as e:
-                print(f"Error creating rough clip for statement {statement['id']}: {e}")
-                continue
+        # Step 1: Get rough timestamps and extract the padded audio
+        rough_timestamps = find_sentence_timestamps(quote, transcript_path)
+        if rough_timestamps is None:
+            print(f"Could not find rough timestamps for quote: {quote[:100]}...")
+            continue
             
-            # Step 2: Get precise timestamps and create final cut
-            precise_timestamps = get_word_level_timestamps(
-                rough_clip_path,
+        rough_start, rough_end = rough_timestamps
+        # add a 10 second buffer
+        rough_start = max(rough_start - 10, 0)
+        rough_end += 10
+        
+        excerpt_path = os.path.join(topic_dir, f"statement_{statement['id']}_rough.wav")
+        quote_words = None
+        try:
+            excerpt_start = session_audio.write_wav(excerpt_path, rough_start, rough_end)
+            # Step 2: Get precise word timestamps within the excerpt
+            quote_words = find_sentence_words(
+                excerpt_path,
                 os.getenv("ASSEMBLYAI_API_KEY"),
                 quote
             )
-            
-            if precise_timestamps is None:
-                print(f"Could not find precise timestamps for quote: {quote[:100]}...")
-                # Use rough cut as final cut
-                statement["clip_path"] = rough_clip_path
-                statement["timestamps"] = {
-                    "rough": {"start": rough_start, "end": rough_end},
-                    "precise": None
-                }
-                continue
-            
-            precise_start, precise_end = precise_timestamps
-            
-            # Create final precise cut
-            final_clip_filename = f"statement_{statement['id']}_final.mp4"
-            final_clip_path = os.path.join(topic_dir, final_clip_filename)
-            
-            try:
-                cut_video_clip(rough_clip_path, final_clip_path, precise_start, precise_end)
-                # Add clip paths and timestamps to statement
-                statement["clip_path"] = final_clip_path
-                statement["timestamps"] = {
-                    "rough": {"start": rough_start, "end": rough_end},
-                    "precise": {"start": precise_start, "end": precise_end}
-                }
-                # Clean up rough cut
-                os.remove(rough_clip_path)
-            except Exception as e:
-                print(f"Error creating precise clip for statement {statement['id']}: {e}")
-                # Use rough cut as final cut
-                statement["clip_path"] = rough_clip_path
-                statement["timestamps"] = {
-                    "rough": {"start": rough_start, "end": rough_end},
-                    "precise": None
-                }
+        except Exception as e:
+            print(f"Error aligning statement {statement['id']}: {e}")
+        finally:
+            if os.path.exists(excerpt_path):
+                os.remove(excerpt_path)
+        
+        if quote_words is None:
+            print(f"Could not find precise timestamps for quote: {quote[:100]}...")
+            use_rough_cut(statement, topic_dir, input_video_path, proxy_path, rough_start, rough_end)
+            continue
+        
+        # Word timings in the session
+        quote_words = [
+            {"word": w["word"], "start": w["start"] + excerpt_start, "end": w["end"] + excerpt_start}
+            for w in quote_words
+        ]
+        precise_start, precise_end = shot_index.snap_cut(*words_to_timestamps(quote_words))
         
-        # Save updated collection with clip paths and timestamps
-        with open(os.path.join(topic_dir, collection_file), 'w', encoding='utf-8') as f:
-            json.dump(collection, f, indent=2, ensure_ascii=False)
+        # Create final precise cut straight from the session video
+        final_clip_filename = f"statement_{statement['id']}_final.mp4"
+        final_clip_path = os.path.join(topic_dir, final_clip_filename)
+        
+        try:
+            cut_video_clip(input_video_path, final_clip_path, precise_start, precise_end)
+            # Add clip paths and timestamps to statement
+            statement["clip_path"] = final_clip_path
+            statement["timestamps"] = {
+                "rough": {"start": rough_start, "end": rough_end},
+                "precise": {"start": precise_start, "end": precise_end}
+            }
+            # Where the clip is in the session and its proxy
+            statement["source"] = {"video": input_video_path, "proxy": proxy_path, "start": precise_start, "end": precise_end}
+            # Word timings relative to the final clip, used for the captions
+            statement["words"] = [
+                {"word": w["word"], "start": w["start"] - precise_start, "end": w["end"] - precise_start}
+                for w in quote_words
+            ]
+        except Exception as e:
+            print(f"Error creating precise clip for statement {statement['id']}: {e}")
+            # A partial final clip would be picked up instead of the rough one
+            if os.path.exists(final_clip_path):
+                os.remove(final_clip_path)
+            use_rough_cut(statement, topic_dir, input_video_path, proxy_path, rough_start, rough_end)
+    
+    # Save updated collection with clip paths and timestamps
+    with open(os.path.join(topic_dir, collection_file), 'w', encoding='utf-8') as f:
+        json.dump(collection, f, indent=2, ensure_ascii=False)
 
 
-def main(input_path: str):
-    #mp3_path = convert_to_mp3(input_path)
-    #transcript_path = transcribe_audio(mp3_path, os.getenv("OPENAI_API_KEY"))
+def main(input_path: str, streaming: bool = False):
+    # Mono 16 kHz speech, extracted and split for the upload in one ffmpeg pass
+    #asr_audio = extract_asr_audio(input_path)
+    #transcript_path = transcribe_audio(asr_audio["audio_path"], os.getenv("OPENAI_API_KEY"), chunks=asr_audio["chunks"])
     transcript_path = "intermediate/transcript/full_transcript_verbose.json"
     #raw_transcript = get_transcript_text(transcript_path)
     
     #extract_topics(raw_transcript)
     #extract_speeches(raw_transcript)
 
+    if streaming:
+        # Mine the speeches while the LLM is still streaming them, unless they already exist
+        speeches = None
+        if not os.path.exists(os.path.join("intermediate", "speeches.jsonl")):
+            speeches = iter_speeches(get_transcript_text(transcript_path), stream=True)
+        # Cut the clips of every topic as soon as its collection is curated
+        run_streaming_pipeline(
+            on_collection=lambda collection_path: create_short_from_collection(
+                collection_path, input_path, transcript_path
+            ),
+            speeches=speeches
+        )
+        return
+
     #extract_statements()
     #score_statements()
     #create_topic_collections()
@@ -148,7 +224,13 @@ if __name__ == "__main__":
         type=str,
         help="Path to the input file"
     )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Run extraction, scoring, curation and cutting as a streaming pipeline"
+    )
     args = parser.parse_args()
     print(f"Received file path: {args.filepath}")
-    dotenv.load_dotenv()
-    main(args.filepath)
+    main(args.filepath, streaming=args.streaming)
+    print("OpenAI API usage:")
+    metrics.print_summary()
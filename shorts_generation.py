@@ -1,15 +1,161 @@
-import dotenv
-from openai import OpenAI
+import argparse
 import os
-from video_processing.blue_box import create_video_Topic
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import dotenv
 
+# The modules read their settings (OPENAI_*, RENDER_PROFILE, REFRAME, ...) from the
+# environment when they are imported, so .env has to be loaded before them
 dotenv.load_dotenv()
 
-client = OpenAI()
+from video_processing.blue_box import create_video_Topic, SCRATCH_DIR
+from video_processing.create_thumbnail_from_video_add_quote import create_thumbnails
+from video_processing.render_profiles import RENDER_PROFILES, DEFAULT_PROFILE
+from video_processing.tts_cache import evict_cache, TTS_CACHE_DIR
+from openai_client import get_client, metrics
+
+
+def render_topic(topics_dir: str, topic_name: str, render_backend: str, threads: int,
+                 profile: str = None, reuse_assets: bool = False) -> dict:
+    """
+    Render a single topic in a worker process with its own scratch directory.
+
+    Returns:
+        dict: Topic name, path of the short, duration, error (None on success) and the API usage of the worker
+    """
+    start = time.perf_counter()
+    error = None
+    video_path = None
+    try:
+        video_path = create_video_Topic(
+            get_client(), topics_dir, topic_name,
+            render_backend=render_backend,
+            scratch_dir=os.path.join(SCRATCH_DIR, topic_name),
+            threads=threads,
+            profile=profile,
+            reuse_assets=reuse_assets
+        )
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    return {
+        "topic": topic_name,
+        "video_path": video_path,
+        "seconds": time.perf_counter() - start,
+        "error": error,
+        "api": metrics.summary()
+    }
+
+
+def render_topics(topics_dir: str, topic_names: list, workers: int = None, render_backend: str = "moviepy",
+                  profile: str = None, reuse_assets: bool = False) -> list:
+    """
+    Render several topics in parallel processes and split the CPU budget between
+    the concurrent encoders and their threads.
+
+    Args:
+        topics_dir (str): Directory with one sub-directory per topic
+        topic_names (list): Topics to render
+        workers (int): Number of concurrent topics, defaults to half the cores
+        render_backend (str): "moviepy", "ffmpeg" or "stream"
+        profile (str): Render profile, "preview" or "publish"
+        reuse_assets (bool): Reuse the script and images of an earlier run of each topic
+
+    Returns:
+        list: One result dict per topic, see render_topic
+    """
+    cpu_count = os.cpu_count() or 4
+    workers = max(1, min(workers or cpu_count // 2, len(topic_names)))
+    threads = max(1, cpu_count // workers)
+    print(f"Rendering {len(topic_names)} topics with {workers} workers and {threads} encoder threads each")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(render_topic, topics_dir, topic_name, render_backend, threads,
+                            profile, reuse_assets): topic_name
+            for topic_name in topic_names
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died
+                result = {"topic": futures[future], "video_path": None, "seconds": 0.0, "error": f"{type(e).__name__}: {e}", "api": {}}
+            status = "failed" if result["error"] else "done"
+            print(f"Topic {result['topic']} {status} after {result['seconds']:.1f}s")
+            results.append(result)
+    return results
+
+
+def thumbnail_stage(topics_dir: str, results: list) -> dict:
+    """
+    Create the thumbnails of all successfully rendered shorts in one batch in this process.
+
+    Returns:
+        dict: Topic -> thumbnail path, see create_thumbnails
+    """
+    topics = [
+        (r["topic"], r["video_path"], os.path.join(topics_dir, r["topic"], r["topic"] + ".jsonl"))
+        for r in results if not r["error"] and r["video_path"]
+    ]
+    if not topics:
+        return {}
+    start = time.perf_counter()
+    print(f"Creating {len(topics)} thumbnails")
+    thumbnails = create_thumbnails(get_client(), topics)
+    created = sum(1 for t in thumbnails.values() if t["thumbnail"])
+    print(f"{created} of {len(topics)} thumbnails created in {time.perf_counter() - start:.1f}s")
+    return thumbnails
+
+
+def print_summary(results: list, api_usage: list = None):
+    """Print the result of every topic and the API usage of the workers and of api_usage (further metrics summaries)."""
+    print("\nRender summary:")
+    for result in sorted(results, key=lambda r: r["topic"]):
+        status = f"FAILED ({result['error']})" if result["error"] else "ok"
+        print(f"- {result['topic']}: {result['seconds']:.1f}s {status}")
+    failures = sum(1 for r in results if r["error"])
+    print(f"{len(results) - failures} succeeded, {failures} failed")
+
+    api = {}
+    for summary in [result["api"] for result in results] + (api_usage or []):
+        for stage, s in summary.items():
+            total = api.setdefault(stage, {"calls": 0, "errors": 0, "latency": 0.0, "tokens": 0})
+            for key in total:
+                total[key] += s[key]
+    print("OpenAI API usage:")
+    for stage, s in sorted(api.items()):
+        print(f"- {stage}: {s['calls']} calls, {s['errors']} errors, "
+              f"{s['latency']:.1f}s total latency, {s['tokens']} tokens")
+
 
-topics_dir = "./intermediate/shorts_draft/"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the shorts of all prepared topics.")
+    parser.add_argument("--topics-dir", default="./intermediate/shorts_draft/", help="Directory with the prepared topics")
+    parser.add_argument("--workers", type=int, default=None, help="Number of topics rendered at the same time (default: half the cores)")
+    parser.add_argument("--backend", choices=["moviepy", "ffmpeg", "stream"], default=os.getenv("RENDER_BACKEND", "moviepy"),
+                        help="Render backend (default: %(default)s)")
+    parser.add_argument("--profile", choices=list(RENDER_PROFILES), default=DEFAULT_PROFILE,
+                        help="Render profile, preview for the editorial review (default: %(default)s)")
+    parser.add_argument("--reuse-assets", action="store_true",
+                        help="Reuse the script and images of the previous run, e.g. to publish an approved preview")
+    parser.add_argument("--skip-thumbnails", action="store_true",
+                        help="Do not create the thumbnails of the published shorts")
+    args = parser.parse_args()
 
-for topic_name in os.listdir(topics_dir):
-    if topic_name == '.DS_Store':
-        continue
-    create_video_Topic(client, topics_dir, topic_name)
+    topic_names = [
+        topic_name for topic_name in sorted(os.listdir(args.topics_dir))
+        if topic_name != '.DS_Store' and os.path.isdir(os.path.join(args.topics_dir, topic_name))
+    ]
+    results = render_topics(args.topics_dir, topic_names, workers=args.workers, render_backend=args.backend,
+                            profile=args.profile, reuse_assets=args.reuse_assets)
+    # The thumbnails are only needed for the published shorts
+    if args.profile == "publish" and not args.skip_thumbnails:
+        thumbnail_stage(args.topics_dir, results)
+    # Once after the batch, the workers might still use narrations evicted during it
+    if os.path.isdir(TTS_CACHE_DIR):
+        evict_cache()
+    print_summary(results, api_usage=[metrics.summary()])
@@ -0,0 +1,83 @@
+import itertools
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+pytest.importorskip("moviepy")
+if not shutil.which("ffmpeg"):
+    pytest.skip("ffmpeg is not installed", allow_module_level=True)
+
+from video_processing.ffmpeg_renderer import probe_duration, output_dimensions
+from video_processing.render_profiles import get_render_profile
+from video_processing.stream_assembly import assemble_timeline
+
+SEGMENTS = 20
+MAX_MEMORY_MB = 1024
+# Solid colors far apart, each segment gets its own so the order can be read from the output
+PALETTE = [c for c in itertools.product((0, 128, 255), repeat=3)][:SEGMENTS]
+
+
+def hex_color(color):
+    return "0x" + "".join(f"{c:02x}" for c in color)
+
+
+def make_timeline(tmp_dir, segments=SEGMENTS):
+    """Alternating 1 s clips and image narrations, each in its own solid color."""
+    timeline = []
+    for n in range(segments):
+        color = hex_color(PALETTE[n])
+        if n % 2 == 0:
+            path = os.path.join(tmp_dir, f"clip_{n}.mp4")
+            subprocess.run([
+                "ffmpeg", "-y", "-v", "error",
+                "-f", "lavfi", "-i", f"color=c={color}:size=1280x720:rate=25:duration=1",
+                "-f", "lavfi", "-i", "sine=frequency=440:duration=1",
+                "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", path
+            ], check=True)
+            timeline.append({"type": "clip", "path": path})
+        else:
+            image = os.path.join(tmp_dir, f"image_{n}.png")
+            audio = os.path.join(tmp_dir, f"narration_{n}.mp3")
+            subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"color=c={color}:size=1024x1536",
+                            "-frames:v", "1", image], check=True)
+            subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=220:duration=1",
+                            "-c:a", "libmp3lame", audio], check=True)
+            # No fade, it would change the color of the sampled frame
+            timeline.append({"type": "image", "image": image, "audio": audio, "duration": 1.0, "fade_out": 0})
+    return timeline
+
+
+def frame_color(video_path, t, dims):
+    """Mean RGB of the top left corner of the frame at t, away from the captions."""
+    width, height = dims
+    raw = subprocess.run([
+        "ffmpeg", "-v", "error", "-ss", f"{t:.3f}", "-i", video_path, "-frames:v", "1",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-"
+    ], check=True, capture_output=True).stdout
+    frame = np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 3)
+    return frame[:height // 8, :width // 8].reshape(-1, 3).mean(axis=0)
+
+
+def test_twenty_segment_timeline(tmp_path):
+    timeline = make_timeline(str(tmp_path))
+    output_path = str(tmp_path / "assembled.mp4")
+    profile = get_render_profile("preview")
+    words = [{"word": f"Wort{n}", "start": n * 0.5, "end": n * 0.5 + 0.4} for n in range(SEGMENTS * 2)]
+
+    stats = assemble_timeline(timeline, output_path, words=words, profile=profile, max_memory_mb=MAX_MEMORY_MB)
+
+    assert stats["segments"] == SEGMENTS
+    assert stats["max_open_sources"] == 1
+    assert stats["peak_rss"] <= MAX_MEMORY_MB * 2**20
+    assert abs(probe_duration(output_path) - SEGMENTS) < 0.25
+
+    dims = output_dimensions(timeline, profile["max_height"])
+    palette = np.array(PALETTE, dtype=np.float64)
+    order = [
+        int(np.argmin(np.abs(palette - frame_color(output_path, n + 0.5, dims)).sum(axis=1)))
+        for n in range(SEGMENTS)
+    ]
+    assert order == list(range(SEGMENTS))
@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from openai import OpenAI
+from openai_client import get_client, tracked_call
 from collections import Counter
 import re
 
@@ -30,7 +30,7 @@ def get_best_statements_for_topic(statements, topic, n=5):
 
 def create_topic_collection(topic, statements):
     """Create a curated collection of statements for a topic."""
-    client = OpenAI()
+    client = get_client()
     try:
         # Format statements for the prompt
         statements_text = "\n\n".join([
@@ -39,7 +39,9 @@ def create_topic_collection(topic, statements):
         ])
         
         # Call the API to select and order statements
-        response = client.chat.completions.create(
+        response = tracked_call(
+            "create_topic_collections",
+            client.chat.completions.create,
             model="o4-mini",
             messages=[
                 {
@@ -104,6 +106,7 @@ def save_topic_collection(topic, statements, selected_ids, explanation):
         f.write(json.dumps(collection, ensure_ascii=False, indent=2))
     
     print(f"Saved topic collection to: {output_file}")
+    return output_file
 
 def create_topic_collections():
     # Load statements
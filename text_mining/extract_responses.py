@@ -1,8 +1,10 @@
 from pathlib import Path
-from openai import OpenAI
+from openai_client import get_client, tracked_call
 import json
 import re
 
+from text_mining.json_stream import stream_json_array, log_stream_errors
+
 
 def load_topics():
     """Load available topics from topics.json."""
@@ -22,15 +24,19 @@ def create_speech_summary(speeches):
         summary += f"ID: {speech['id']}, Redner: {speech['speaker']} ({speech['party']}), Themen: {', '.join(speech['topics'])}\n"
     return summary
 
-def extract_quotes(speech, all_speeches, available_topics):
-    """Extract meaningful quotes from a speech."""
-    client = OpenAI()
+def extract_quotes(speech, all_speeches, available_topics, stream=False):
+    """Extract meaningful quotes from a speech.
+
+    With `stream=True` the response is streamed and "quotes" is a generator that
+    yields every quote as soon as it is complete.
+    """
+    client = get_client()
     try:
         # Create speech summary for context
         speech_summary = create_speech_summary(all_speeches)
         
         # Call the API with structured output
-        response = client.chat.completions.create(
+        request = dict(
             model="o4-mini",
             messages=[
                 {
@@ -79,6 +85,12 @@ Output-Struktur:
             ],
             response_format={"type": "json_object"}
         )
+        if stream:
+            # Errors of the stream surface while iterating, they are printed there
+            elements = stream_json_array(client, "quotes", stage="extract_responses", **request)
+            return {"quotes": log_stream_errors(elements, "Error extracting quotes")}
+
+        response = tracked_call("extract_responses", client.chat.completions.create, **request)
         
         # Parse the response
         return json.loads(response.choices[0].message.content)
@@ -101,8 +113,12 @@ def extract_text_between_sentences(text, first_sentence, last_sentence):
         return match.group(0)
     return None
 
-def extract_responses():
-    """Process all speeches and extract quotes."""
+def extract_responses(stream=False):
+    """Process all speeches and extract quotes.
+
+    Args:
+        stream (bool): Stream the LLM responses and parse the quotes incrementally
+    """
     # Load available topics
     available_topics = load_topics()
     if not available_topics:
@@ -129,7 +145,7 @@ def extract_responses():
             print(f"Processing speech {speech['id']} by {speech['speaker']} ({speech['party']})")
             
             # Extract quotes
-            quotes_data = extract_quotes(speech, all_speeches, available_topics)
+            quotes_data = extract_quotes(speech, all_speeches, available_topics, stream=stream)
             
             # Save quotes to the combined JSONL file
             with open(output_file, 'a', encoding='utf-8') as out_f:
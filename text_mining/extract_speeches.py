@@ -2,15 +2,21 @@ import json
 import re
 from pathlib import Path
 
-from openai import OpenAI
+from openai_client import get_client, tracked_call
 
+from text_mining.json_stream import stream_json_array, log_stream_errors
 
-def extract_speeches(transcript):
-    """Extract individual speeches from the transcript with speaker, party, and topic information."""
-    client = OpenAI()
+
+def request_speeches(transcript, stream=False):
+    """Ask the LLM to split the transcript into speeches.
+
+    With `stream=True` the response is streamed and "speeches" is a generator that
+    yields every speech as soon as it is complete.
+    """
+    client = get_client()
     try:
         # Call the API with structured output
-        response = client.chat.completions.create(
+        request = dict(
             model="gpt-4.1",
             messages=[
                 {
@@ -44,14 +50,33 @@ def extract_speeches(transcript):
             ],
             response_format={"type": "json_object"}
         )
+        if stream:
+            # Errors of the stream surface while iterating, they are printed there
+            elements = stream_json_array(client, "speeches", stage="extract_speeches", **request)
+            return {"speeches": log_stream_errors(elements, "Error extracting speeches")}
 
-        speeches_data = json.loads(response.choices[0].message.content)
-        save_speeches(transcript, speeches_data)
+        response = tracked_call("extract_speeches", client.chat.completions.create, **request)
+        return json.loads(response.choices[0].message.content)
         
     except Exception as e:
         print(f"Error extracting speeches: {str(e)}")
         raise
 
+def extract_speeches(transcript, stream=False):
+    """Extract individual speeches from the transcript with speaker, party, and topic information."""
+    speeches_data = request_speeches(transcript, stream=stream)
+    save_speeches(transcript, speeches_data)
+
+def iter_speeches(transcript, stream=True):
+    """
+    Extract the speeches and yield every saved speech object as soon as it is complete.
+
+    The speeches are written to speeches.jsonl as well, so later stages that read the
+    file see the same result as with extract_speeches.
+    """
+    speeches_data = request_speeches(transcript, stream=stream)
+    yield from iter_saved_speeches(transcript, speeches_data)
+
 def extract_text_between_sentences(text, first_sentence, last_sentence):
     """Extract text between two sentences, including the sentences themselves."""
     # Escape special characters in the sentences
@@ -68,9 +93,16 @@ def extract_text_between_sentences(text, first_sentence, last_sentence):
 
 def save_speeches(transcript, speeches_data):
     """Save each speech as a JSONL entry with full transcript."""
+    for _ in iter_saved_speeches(transcript, speeches_data):
+        pass
+
+def iter_saved_speeches(transcript, speeches_data):
+    """Save each speech as a JSONL entry and yield the speech object right after it was written."""
     output_file = Path("intermediate") / "speeches.jsonl"
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
+    # Renamed once complete, a failed stream must not leave a partial file that later runs take as done
+    part_file = output_file.with_name(output_file.name + ".part")
+
+    with open(part_file, 'w', encoding='utf-8') as f:
         for i, speech in enumerate(speeches_data["speeches"]):
             # Extract the full transcript for this speech
             speech_text = extract_text_between_sentences(
@@ -91,4 +123,7 @@ def save_speeches(transcript, speeches_data):
                 
                 # Write to JSONL file
                 f.write(json.dumps(speech_object, ensure_ascii=False) + '\n')
+                f.flush()
                 print(f"Saved speech by {speech['speaker']} ({speech['party']})")
+                yield speech_object
+    part_file.replace(output_file)
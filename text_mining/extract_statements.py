@@ -1,8 +1,10 @@
 from pathlib import Path
-from openai import OpenAI
+from openai_client import get_client, tracked_call
 import json
 import re
 
+from text_mining.json_stream import stream_json_array, log_stream_errors
+
 def load_topics():
     """Load available topics from topics.json."""
     topics_file = Path("intermediate") / "topics.json"
@@ -14,12 +16,16 @@ def load_topics():
         data = json.load(f)
         return data.get("themen", [])
 
-def extract_quotes(speech, available_topics):
-    """Extract meaningful quotes from a speech."""
-    client = OpenAI()
+def extract_quotes(speech, available_topics, stream=False):
+    """Extract meaningful quotes from a speech.
+
+    With `stream=True` the response is streamed and "quotes" is a generator that
+    yields every quote as soon as it is complete.
+    """
+    client = get_client()
     try:
         # Call the API with structured output
-        response = client.chat.completions.create(
+        request = dict(
             model="o4-mini",
             messages= [
                 {
@@ -59,6 +65,12 @@ def extract_quotes(speech, available_topics):
             ],
             response_format={"type": "json_object"}
         )
+        if stream:
+            # Errors of the stream surface while iterating, they are printed there
+            elements = stream_json_array(client, "quotes", stage="extract_statements", **request)
+            return {"quotes": log_stream_errors(elements, "Error extracting quotes")}
+
+        response = tracked_call("extract_statements", client.chat.completions.create, **request)
         
         # Parse the response
         return json.loads(response.choices[0].message.content)
@@ -78,24 +90,68 @@ def extract_text_between_sentences(text, first_sentence, last_sentence):
         return match.group(0)
     return None
 
-def extract_statements():
-    """Process all speeches and extract quotes."""
-    # Load available topics
-    available_topics = load_topics()
-    if not available_topics:
-        return
-    
-    # Read the speeches file
+def load_speeches():
+    """Load all speeches from speeches.jsonl."""
     speeches_file = Path("intermediate") / "speeches.jsonl"
     if not speeches_file.exists():
         print(f"Error: Speeches file not found at {speeches_file}")
+        return []
+
+    speeches = []
+    with open(speeches_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            speeches.append(json.loads(line))
+    return speeches
+
+def iter_statements_from_speech(speech, available_topics, stream=False):
+    """Yield the quotes of a single speech as statement objects, as soon as each is available."""
+    quotes_data = extract_quotes(speech, available_topics, stream=stream)
+
+    for quote in quotes_data["quotes"]:
+        # Extract the full quote text
+        quote_text = extract_text_between_sentences(
+            speech["transcript"],
+            quote["first_sentence"],
+            quote["last_sentence"]
+        )
+
+        if quote_text:
+            # Create the complete quote object
+            yield {
+                "id": speech["id"],
+                "quote": quote_text,
+                "topic": quote["topic"],
+                "speaker": speech["speaker"],
+                "party": speech["party"]
+            }
+
+def extract_statements_from_speech(speech, available_topics, stream=False):
+    """Extract quotes from a single speech and return them as statement objects."""
+    return list(iter_statements_from_speech(speech, available_topics, stream=stream))
+
+def save_statements(statements, output_file=None):
+    """Append statement objects to the combined JSONL file."""
+    output_file = output_file or Path("intermediate") / "statements.jsonl"
+    with open(output_file, 'a', encoding='utf-8') as out_f:
+        for statement in statements:
+            out_f.write(json.dumps(statement, ensure_ascii=False) + '\n')
+            print(f"Saved quote about {statement['topic']}")
+
+def extract_statements(stream=False):
+    """Process all speeches and extract quotes.
+
+    Args:
+        stream (bool): Stream the LLM responses and parse the quotes incrementally
+    """
+    # Load available topics
+    available_topics = load_topics()
+    if not available_topics:
         return
     
     # Read all speeches first
-    all_speeches = []
-    with open(speeches_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            all_speeches.append(json.loads(line))
+    all_speeches = load_speeches()
+    if not all_speeches:
+        return
     
     # Create output file for all quotes
     output_file = Path("intermediate") / "statements.jsonl"
@@ -105,36 +161,12 @@ def extract_statements():
         try:
             print(f"Processing speech {speech['id']} by {speech['speaker']} ({speech['party']})")
             
-            # Extract quotes
-            quotes_data = extract_quotes(speech, available_topics)
-            
-            # Save quotes to the combined JSONL file
-            with open(output_file, 'a', encoding='utf-8') as out_f:
-                for quote in quotes_data["quotes"]:
-                    # Extract the full quote text
-                    quote_text = extract_text_between_sentences(
-                        speech["transcript"],
-                        quote["first_sentence"],
-                        quote["last_sentence"]
-                    )
-                    
-                    if quote_text:
-                        # Create the complete quote object
-                        quote_object = {
-                            "id": speech["id"],
-                            "quote": quote_text,
-                            "topic": quote["topic"],
-                            "speaker": speech["speaker"],
-                            "party": speech["party"]
-                        }
-                        
-                        # Write to JSONL file
-                        out_f.write(json.dumps(quote_object, ensure_ascii=False) + '\n')
-                        print(f"Saved quote about {quote['topic']}")
+            # Extract quotes and save them to the combined JSONL file as they arrive
+            for statement in iter_statements_from_speech(speech, available_topics, stream=stream):
+                save_statements([statement], output_file)
             
         except Exception as e:
             print(f"Error processing speech {speech['id']}: {str(e)}")
             continue
     
     print(f"Analysis complete. All quotes saved to: {output_file}")
-
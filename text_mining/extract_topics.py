@@ -1,14 +1,16 @@
 import json
 from pathlib import Path
 
-from openai import OpenAI
+from openai_client import get_client, tracked_call
 
 def extract_topics(transcript):
     """Extract the most relevant topics from the transcript."""
-    client = OpenAI()
+    client = get_client()
     try:
         # Call the API with structured output
-        response = client.chat.completions.create(
+        response = tracked_call(
+            "extract_topics",
+            client.chat.completions.create,
             model="gpt-4.1",
             messages=[
                 {
@@ -0,0 +1,165 @@
+import json
+import re
+import time
+
+from openai_client import metrics
+
+
+class JsonArrayStreamParser:
+    """
+    Incrementally parses the array stored under `key` in a streamed JSON object.
+
+    Feed it the text chunks of a streamed response and it returns every array element
+    as soon as its closing bracket (or separating comma) has arrived.
+    """
+
+    def __init__(self, key):
+        self._key_pattern = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self._buf = ""
+        self._pos = 0
+        self._phase = "seek_key"
+        self._element_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self):
+        """True once the closing bracket of the array was parsed."""
+        return self._phase == "done"
+
+    @property
+    def found(self):
+        """True once the start of the array was found."""
+        return self._phase != "seek_key"
+
+    def feed(self, text):
+        """Add a chunk of text and return the raw JSON of every newly completed element."""
+        if self._phase == "done" or not text:
+            return []
+        self._buf += text
+
+        if self._phase == "seek_key":
+            match = self._key_pattern.search(self._buf)
+            if not match:
+                return []
+            self._pos = match.end()
+            self._phase = "array"
+
+        elements = []
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+                if self._element_start is None:
+                    self._element_start = i
+            elif c in "{[":
+                if self._element_start is None:
+                    self._element_start = i
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the array itself
+                    if self._element_start is not None:
+                        elements.append(buf[self._element_start:i].strip())
+                        self._element_start = None
+                    self._phase = "done"
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    elements.append(buf[self._element_start:i + 1])
+                    self._element_start = None
+            elif c == "," and self._depth == 0:
+                # Separator after a scalar element
+                if self._element_start is not None:
+                    elements.append(buf[self._element_start:i].strip())
+                    self._element_start = None
+            elif not c.isspace() and self._element_start is None:
+                self._element_start = i
+            i += 1
+
+        # Drop everything that was consumed and is not part of a pending element
+        keep_from = i if self._element_start is None else self._element_start
+        self._buf = buf[keep_from:]
+        self._pos = i - keep_from
+        if self._element_start is not None:
+            self._element_start = 0
+        return elements
+
+
+def stream_json_array(client, key, stage="stream", **request):
+    """
+    Call the chat completions API with `stream=True` and yield every element of the
+    array `key` in the JSON response the moment it is complete.
+
+    Args:
+        client: OpenAI client
+        key (str): Name of the array in the JSON response, e.g. "quotes" or "speeches"
+        stage (str): Name of the pipeline stage, used for the metrics
+        **request: Arguments for client.chat.completions.create
+
+    Yields:
+        The parsed array elements
+    """
+    parser = JsonArrayStreamParser(key)
+    start = time.perf_counter()
+    first_element = None
+    usage = None
+    error = None
+    # Recorded also if the consumer stops early or the stream fails
+    try:
+        response = client.chat.completions.create(
+            stream=True,
+            stream_options={"include_usage": True},
+            **request
+        )
+        for chunk in response:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            for element in parser.feed(delta):
+                if first_element is None:
+                    first_element = time.perf_counter() - start
+                yield json.loads(element)
+
+        if not parser.found:
+            raise ValueError(f"Streamed response did not contain a '{key}' array")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        metrics.record(
+            stage,
+            request.get("model"),
+            time.perf_counter() - start,
+            usage,
+            error=error,
+            first_element_latency=round(first_element, 3) if first_element is not None else None
+        )
+
+    if not parser.done:
+        print(f"Warning: Streamed '{key}' array was not closed, response may be truncated")
+
+
+def log_stream_errors(elements, message):
+    """
+    Print the errors of a lazily streamed response like the eager request does and re-raise them.
+    They only occur while the elements are consumed, so the caller has to iterate inside its error handling.
+    """
+    try:
+        yield from elements
+    except Exception as e:
+        print(f"{message}: {str(e)}")
+        raise
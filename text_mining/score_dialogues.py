@@ -1,10 +1,10 @@
 from pathlib import Path
-from openai import OpenAI
+from openai_client import get_client, tracked_call
 import json
 
 
 def evaluate_dialogue(dialogue):
-    client = OpenAI()
+    client = get_client()
     """Evaluate the quality of a dialogue using the LLM."""
     try:
         # Format dialogue for the prompt
@@ -20,7 +20,9 @@ Speaker: {response['speaker']} ({response['party']})
 Quote: {response['quote']}"""
         
         # Call the API with structured output
-        response = client.chat.completions.create(
+        response = tracked_call(
+            "score_dialogues",
+            client.chat.completions.create,
             model="gpt-4.1",
             messages=[
                 {
@@ -1,14 +1,16 @@
 from pathlib import Path
 import json
 
-from openai import OpenAI
+from openai_client import get_client, tracked_call
 
 
 def evaluate_statement(statement):
     """Evaluate the quality of a statement using the LLM."""
-    client = OpenAI()
+    client = get_client()
     try:
-        response = client.chat.completions.create(
+        response = tracked_call(
+            "score_statements",
+            client.chat.completions.create,
             model="gpt-4.1",
             messages=[
                 {
@@ -65,6 +67,23 @@ def evaluate_statement(statement):
         print(f"Error evaluating statement: {str(e)}")
         raise
 
+def score_statement(statement):
+    """Evaluate a statement and return it enriched with its quality scores."""
+    evaluation = evaluate_statement(statement)
+    statement.update({
+        "scores": evaluation["scores"],
+        "average_score": evaluation["average_score"],
+        "evaluation_explanation": evaluation["explanation"]
+    })
+    return statement
+
+def save_scored_statement(statement, output_file=None):
+    """Append a scored statement to the scored statements JSONL file."""
+    output_file = output_file or Path("intermediate") / "scored_statements.jsonl"
+    with open(output_file, 'a', encoding='utf-8') as out_f:
+        out_f.write(json.dumps(statement, ensure_ascii=False) + '\n')
+    print(f"Saved scored statement with average score: {statement['average_score']}")
+
 def score_statements():
     """Process all statements and add quality scores."""
     statements_file = Path("intermediate") / "statements.jsonl"
@@ -82,18 +101,10 @@ def score_statements():
                 statement = json.loads(line)
                 print(f"Processing statement by {statement['speaker']} ({statement['party']})")
 
-                evaluation = evaluate_statement(statement)
-
-                statement.update({
-                    "scores": evaluation["scores"],
-                    "average_score": evaluation["average_score"],
-                    "evaluation_explanation": evaluation["explanation"]
-                })
+                statement = score_statement(statement)
                 
                 # Save to output file
-                with open(output_file, 'a', encoding='utf-8') as out_f:
-                    out_f.write(json.dumps(statement, ensure_ascii=False) + '\n')
-                print(f"Saved scored statement with average score: {evaluation['average_score']}")
+                save_scored_statement(statement, output_file)
                 
             except Exception as e:
                 print(f"Error processing statement: {str(e)}")
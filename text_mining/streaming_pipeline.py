@@ -0,0 +1,214 @@
+import queue
+import threading
+from pathlib import Path
+
+from text_mining.extract_statements import (
+    load_topics,
+    load_speeches,
+    iter_statements_from_speech,
+    save_statements,
+)
+from text_mining.score_statements import score_statement, save_scored_statement
+from text_mining.create_topic_collections import (
+    create_topic_collection,
+    save_topic_collection,
+)
+
+# Sentinel that tells a consumer its producer has finished
+_DONE = object()
+
+
+class TopicPools:
+    """
+    Keeps the scored candidate pool of every topic and decides when a pool is stable.
+
+    A topic is considered stable once it has at least `pool_size` candidates and its
+    top `pool_size` statements did not change for `stable_window` consecutively scored
+    statements. Stable topics are released for curation only once.
+    """
+
+    def __init__(self, pool_size=5, stable_window=20, max_topics=8):
+        self.pool_size = pool_size
+        self.stable_window = stable_window
+        self.max_topics = max_topics
+        self.statements = {}
+        self.unchanged_for = {}
+        self.released = set()
+
+    def best_statements(self, topic):
+        """Get the best statements for a topic, ordered like get_best_statements_for_topic."""
+        statements = self.statements.get(topic, [])
+        return sorted(statements, key=lambda x: x['average_score'], reverse=True)[:self.pool_size]
+
+    def add(self, statement):
+        """Add a scored statement and return the topics that became stable."""
+        topic = statement['topic']
+        before = [id(s) for s in self.best_statements(topic)]
+        self.statements.setdefault(topic, []).append(statement)
+        after = [id(s) for s in self.best_statements(topic)]
+
+        for other in self.unchanged_for:
+            self.unchanged_for[other] += 1
+        if before != after:
+            self.unchanged_for[topic] = 0
+
+        return [t for t in self.statements if self._is_stable(t)]
+
+    def _is_stable(self, topic):
+        return (
+            topic not in self.released
+            and len(self.released) < self.max_topics
+            and len(self.statements[topic]) >= self.pool_size
+            and self.unchanged_for.get(topic, 0) >= self.stable_window
+        )
+
+    def remaining(self):
+        """Get the most frequent topics that were not released yet (used when the stream ends)."""
+        topics = sorted(
+            (t for t in self.statements if t not in self.released),
+            key=lambda t: len(self.statements[t]),
+            reverse=True
+        )
+        return topics[:max(0, self.max_topics - len(self.released))]
+
+
+def _extract_worker(speeches, available_topics, statement_queue, stream_llm):
+    """Producer: extract statements speech by speech and push them downstream."""
+    try:
+        speeches = iter(speeches)
+        while True:
+            # A streamed speech extraction fails while it is iterated, the speeches
+            # received so far are still processed
+            try:
+                speech = next(speeches)
+            except StopIteration:
+                break
+            except Exception as e:
+                print(f"Error extracting speeches, continuing with the speeches received so far: {str(e)}")
+                break
+            try:
+                print(f"Processing speech {speech['id']} by {speech['speaker']} ({speech['party']})")
+                for statement in iter_statements_from_speech(speech, available_topics, stream=stream_llm):
+                    save_statements([statement])
+                    statement_queue.put(statement)
+            except Exception as e:
+                print(f"Error processing speech {speech['id']}: {str(e)}")
+    finally:
+        statement_queue.put(_DONE)
+
+
+def _score_worker(statement_queue, scored_queue):
+    """Consumer/producer: score statements as soon as they arrive."""
+    try:
+        while True:
+            statement = statement_queue.get()
+            if statement is _DONE:
+                # Let the other scoring workers see the sentinel as well
+                statement_queue.put(_DONE)
+                break
+            try:
+                scored_queue.put(score_statement(statement))
+            except Exception as e:
+                print(f"Error processing statement: {str(e)}")
+    finally:
+        scored_queue.put(_DONE)
+
+
+def _collection_worker(collection_queue, on_collection):
+    """Consumer: curate stable topics and hand the saved collection to `on_collection`."""
+    while True:
+        item = collection_queue.get()
+        if item is _DONE:
+            break
+        topic, best_statements = item
+        try:
+            print(f"\nProcessing topic: {topic}")
+            collection = create_topic_collection(topic, best_statements)
+            collection_path = save_topic_collection(
+                topic, best_statements, collection["selected_ids"], collection["explanation"]
+            )
+            if on_collection is not None:
+                on_collection(str(collection_path))
+        except Exception as e:
+            print(f"Error creating collection for topic {topic}: {str(e)}")
+
+
+def run_streaming_pipeline(on_collection=None, speeches=None, scoring_workers=4,
+                           queue_size=32, pool_size=5, stable_window=20, max_topics=8,
+                           stream_llm=True):
+    """
+    Run extract → score → collect → `on_collection` as a streaming pipeline on bounded queues.
+
+    Statements are scored as soon as their speech is processed, and every topic whose
+    candidate pool is stable is curated (and handed to `on_collection`, e.g. the clip
+    cutter) while the remaining speeches are still being mined.
+
+    Args:
+        on_collection (callable): Called with the path of every saved topic collection
+        speeches (iterable): Speeches to process, defaults to intermediate/speeches.jsonl.
+                             May be a generator, e.g. from iter_speeches(..., stream=True)
+        scoring_workers (int): Number of concurrent scoring threads
+        queue_size (int): Capacity of every inter-stage queue
+        pool_size (int): Number of best statements a topic collection is curated from
+        stable_window (int): Scored statements without change before a pool counts as stable
+        max_topics (int): Maximum number of topic collections to create
+        stream_llm (bool): Stream the quote extraction responses so every quote is
+                           scored as soon as it is complete
+    """
+    available_topics = load_topics()
+    if not available_topics:
+        return
+
+    if speeches is None:
+        speeches = load_speeches()
+
+    # Start from fresh files, the stages append to them
+    for name in ("statements.jsonl", "scored_statements.jsonl"):
+        (Path("intermediate") / name).unlink(missing_ok=True)
+
+    statement_queue = queue.Queue(maxsize=queue_size)
+    scored_queue = queue.Queue(maxsize=queue_size)
+    collection_queue = queue.Queue(maxsize=max_topics)
+
+    threads = [threading.Thread(
+        target=_extract_worker,
+        args=(speeches, available_topics, statement_queue, stream_llm),
+        name="extract"
+    )]
+    for i in range(scoring_workers):
+        threads.append(threading.Thread(
+            target=_score_worker,
+            args=(statement_queue, scored_queue),
+            name=f"score-{i}"
+        ))
+    collector = threading.Thread(
+        target=_collection_worker,
+        args=(collection_queue, on_collection),
+        name="collect"
+    )
+    for thread in threads + [collector]:
+        thread.start()
+
+    # Gather scored statements in this thread and release stable topics
+    pools = TopicPools(pool_size=pool_size, stable_window=stable_window, max_topics=max_topics)
+    finished_workers = 0
+    while finished_workers < scoring_workers:
+        statement = scored_queue.get()
+        if statement is _DONE:
+            finished_workers += 1
+            continue
+        save_scored_statement(statement)
+        for topic in pools.add(statement):
+            print(f"Topic pool is stable: {topic}")
+            pools.released.add(topic)
+            collection_queue.put((topic, pools.best_statements(topic)))
+
+    # The stream has ended, so every remaining pool is final
+    for topic in pools.remaining():
+        pools.released.add(topic)
+        collection_queue.put((topic, pools.best_statements(topic)))
+    collection_queue.put(_DONE)
+
+    for thread in threads + [collector]:
+        thread.join()
+    print(f"Streaming pipeline complete. Created {len(pools.released)} topic collections.")
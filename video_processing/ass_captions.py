@@ -0,0 +1,76 @@
+from video_processing.create_captions import caption_font_size
+
+# ASS colours are &HAABBGGRR
+ASS_YELLOW = "&H0000FFFF"
+ASS_BLACK = "&H00000000"
+
+
+def format_ass_time(seconds: float) -> str:
+    """Format seconds as an ASS timestamp (H:MM:SS.cc)."""
+    centiseconds = int(round(max(seconds, 0) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+
+def escape_ass_text(text: str) -> str:
+    """Make spoken text safe for an ASS dialogue line (braces start override tags)."""
+    return text.replace("\\", "/").replace("{", "(").replace("}", ")").replace("\n", " ")
+
+
+def write_ass_captions(words: list, output_path: str, dims: tuple, font: str = "Arial",
+                       font_size: int = None) -> str:
+    """
+    Write single-word highlight captions as an ASS subtitle file that ffmpeg can burn in
+    natively, styled like the moviepy TextClip captions of create_captions.
+
+    Args:
+        words (list): Word dicts with "word", "start" and "end" in seconds
+        output_path (str): Path of the .ass file
+        dims (tuple): (width, height) of the video
+        font (str): Font name
+        font_size (int): Font size in pixels, defaults to the create_captions size
+
+    Returns:
+        str: Path to the written .ass file
+    """
+    width, height = dims
+    font_size = font_size or caption_font_size(height)
+    outline = max(1, int(font_size * 0.05))
+    # create_captions places the top of the text at height - 1.5 * font_size
+    margin_v = int(font_size * 0.5)
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+        "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,{font},{font_size},{ASS_YELLOW},{ASS_YELLOW},{ASS_BLACK},{ASS_BLACK},"
+        f"0,0,0,0,100,100,0,0,1,{outline},0,2,10,10,{margin_v},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for word_info in words:
+        word_text = word_info["word"].strip()
+        if not word_text:
+            continue
+        start = word_info["start"]
+        # Same minimum duration as the TextClips
+        end = start + max(0.05, word_info["end"] - start)
+        lines.append(
+            f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},Default,,0,0,0,,"
+            f"{escape_ass_text(word_text)}"
+        )
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return output_path
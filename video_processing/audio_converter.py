@@ -1,5 +1,21 @@
+import csv
+import json
 import os
 import subprocess
+import threading
+
+# Transcription only needs mono 16 kHz speech
+ASR_SAMPLE_RATE = 16000
+ASR_FORMATS = {
+    # extension, encoder arguments, chunk duration in seconds (the transcription API takes at most 25 MB per file)
+    "opus": (".ogg", ["-c:a", "libopus", "-b:a", "24k", "-application", "voip"], 1400),
+    "flac": (".flac", ["-c:a", "flac", "-compression_level", "5"], 900),
+    "wav": (".wav", ["-c:a", "pcm_s16le"], 600),
+}
+DEFAULT_ASR_FORMAT = os.getenv("ASR_AUDIO_FORMAT", "opus")
+ASR_AUDIO_DIR = os.path.join("intermediate", "asr_audio")
+
+_extraction_lock = threading.Lock()
 
 
 def convert_to_mp3(input_path: str) -> str:
@@ -30,4 +46,107 @@ def convert_to_mp3(input_path: str) -> str:
     ]
     subprocess.run(cmd, check=True)
     
-    return mp3_path 
\ No newline at end of file
+    return mp3_path
+
+
+def source_signature(path: str) -> dict:
+    """Size and modification time of a file, a changed source invalidates the derived files."""
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def asr_extraction_command(input_path: str, audio_path: str, chunk_pattern: str, chunk_list_path: str,
+                           fmt: str, chunk_duration: int, pcm_path: str) -> list:
+    """
+    ffmpeg command that decodes the soundtrack once, downmixes and resamples it to mono 16 kHz
+    and writes the session file, its chunks and the raw PCM cache (see pcm_cache).
+    """
+    _, codec_args, _ = ASR_FORMATS[fmt]
+    return [
+        "ffmpeg", "-y", "-v", "error",
+        "-i", input_path,
+        "-filter_complex",
+        f"[0:a:0]aformat=sample_rates={ASR_SAMPLE_RATE}:channel_layouts=mono,asplit=3[session][chunks][pcm]",
+        "-map", "[session]", *codec_args, audio_path,
+        "-map", "[pcm]", "-c:a", "pcm_s16le", "-f", "s16le", pcm_path,
+        "-map", "[chunks]", *codec_args,
+        "-f", "segment", "-segment_time", str(chunk_duration),
+        "-segment_list", chunk_list_path, "-segment_list_type", "csv",
+        "-reset_timestamps", "1",
+        chunk_pattern,
+    ]
+
+
+def extract_asr_audio(input_path: str, fmt: str = DEFAULT_ASR_FORMAT, output_dir: str = ASR_AUDIO_DIR,
+                      chunk_duration: int = None) -> dict:
+    """
+    Extract the soundtrack of a session for transcription: mono 16 kHz Opus, FLAC or PCM WAV,
+    written as one session file, as upload-sized chunks and as raw 16 bit PCM for
+    pcm_cache.SessionAudio in a single ffmpeg pass.
+    The result is reused as long as size and mtime of the source are unchanged.
+
+    Args:
+        input_path (str): Path to the session video (or audio) file
+        fmt (str): "opus", "flac" or "wav"
+        output_dir (str): Directory of the extracted audio
+        chunk_duration (int): Chunk length in seconds, defaults to the size limit of the format
+
+    Returns:
+        dict: "audio_path" (session file), "chunks" (list of (path, start offset in seconds)),
+              "pcm_path" (raw signed 16 bit little endian samples)
+    """
+    if fmt not in ASR_FORMATS:
+        raise ValueError(f"Unknown ASR audio format: {fmt} (available: {', '.join(ASR_FORMATS)})")
+    with _extraction_lock:
+        return _extract_asr_audio(input_path, fmt, output_dir, chunk_duration)
+
+
+def _extract_asr_audio(input_path: str, fmt: str, output_dir: str, chunk_duration: int) -> dict:
+    extension, _, default_chunk_duration = ASR_FORMATS[fmt]
+    chunk_duration = chunk_duration or default_chunk_duration
+
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    session_dir = os.path.join(output_dir, name)
+    os.makedirs(session_dir, exist_ok=True)
+    audio_path = os.path.join(session_dir, f"{name}_{ASR_SAMPLE_RATE // 1000}k{extension}")
+    pcm_path = os.path.join(session_dir, f"{name}_{ASR_SAMPLE_RATE // 1000}k.s16le")
+    chunk_list_path = os.path.join(session_dir, "chunks.csv")
+    manifest_path = os.path.join(session_dir, "manifest.json")
+    manifest = {
+        "source": source_signature(input_path),
+        "format": fmt,
+        "sample_rate": ASR_SAMPLE_RATE,
+        "chunk_duration": chunk_duration,
+    }
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        outputs = [cached.get("audio_path"), cached.get("pcm_path")] + [path for path, _ in cached.get("chunks", [])]
+        if {k: cached.get(k) for k in manifest} == manifest and all(p and os.path.exists(p) for p in outputs):
+            print(f"ASR audio of {input_path} is up to date at {cached['audio_path']}, skipping extraction")
+            return {"audio_path": cached["audio_path"], "chunks": [tuple(c) for c in cached["chunks"]],
+                    "pcm_path": cached["pcm_path"]}
+
+    # Chunks of an earlier extraction with other settings must not be picked up
+    for filename in os.listdir(session_dir):
+        if filename.startswith("chunk_"):
+            os.remove(os.path.join(session_dir, filename))
+
+    chunk_pattern = os.path.join(session_dir, f"chunk_%03d{extension}")
+    subprocess.run(asr_extraction_command(input_path, audio_path, chunk_pattern, chunk_list_path,
+                                          fmt, chunk_duration, pcm_path), check=True)
+
+    # The segment list has the exact start of every chunk, cuts happen at packet boundaries
+    chunks = []
+    with open(chunk_list_path, "r", newline="") as f:
+        for row in csv.reader(f):
+            if row:
+                chunks.append((os.path.join(session_dir, row[0]), float(row[1])))
+
+    manifest.update({"audio_path": audio_path, "chunks": chunks, "pcm_path": pcm_path})
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    size_mb = sum(os.path.getsize(path) for path, _ in chunks) / 1024 / 1024
+    print(f"Extracted {len(chunks)} {fmt} chunks ({size_mb:.1f} MB) from {input_path}")
+    return {"audio_path": audio_path, "chunks": chunks, "pcm_path": pcm_path}
@@ -0,0 +1,84 @@
+import argparse
+import os
+import tempfile
+import time
+
+from moviepy import ColorClip, CompositeVideoClip
+
+from video_processing.caption_renderer import CaptionOverlay
+from video_processing.create_captions import build_caption_clips, caption_font_size
+
+SAMPLE_WORDS = (
+    "Die Bundesregierung hat heute im Deutschen Bundestag einen Gesetzentwurf zur "
+    "Energiewende vorgestellt und die Opposition kritisiert die Kosten für Bürgerinnen "
+    "und Bürger scharf während die Koalition auf Klimaschutz und Versorgungssicherheit verweist"
+).split()
+
+
+def synthetic_words(duration: float, words_per_minute: int = 150) -> list:
+    """Word timings of a speaker talking for the whole duration."""
+    step = 60.0 / words_per_minute
+    words = []
+    t = 0.0
+    idx = 0
+    while t + step <= duration:
+        words.append({"word": SAMPLE_WORDS[idx % len(SAMPLE_WORDS)], "start": t, "end": t + step * 0.9})
+        t += step
+        idx += 1
+    return words
+
+
+def captioned_clip(renderer: str, video, words: list):
+    if renderer == "textclip":
+        caption_clips = build_caption_clips(words, video.h)
+        return CompositeVideoClip([video, *caption_clips]), caption_clips
+    overlay = CaptionOverlay(words, video.size, caption_font_size(video.h))
+    return overlay.apply(video), []
+
+
+def run_benchmark(duration: float = 60.0, fps: int = 50, size: tuple = (600, 944), encode: bool = False) -> dict:
+    """
+    Render the captions of a synthetic short with both caption renderers.
+
+    Args:
+        duration (float): Length of the short in seconds
+        fps (int): Frame rate
+        size (tuple): Frame size (width, height)
+        encode (bool): Also encode the result with libx264 (ultrafast), otherwise
+                       only the frames are generated
+
+    Returns:
+        dict: Seconds per renderer
+    """
+    words = synthetic_words(duration)
+    video = ColorClip(size=size, color=(40, 40, 40), duration=duration).with_fps(fps)
+    timings = {}
+    for renderer in ("textclip", "glyph"):
+        start = time.perf_counter()
+        clip, caption_clips = captioned_clip(renderer, video, words)
+        if encode:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                clip.write_videofile(os.path.join(tmp_dir, f"{renderer}.mp4"), fps=fps,
+                                     codec="libx264", preset="ultrafast", logger=None)
+        else:
+            for _ in clip.iter_frames(fps=fps):
+                pass
+        timings[renderer] = time.perf_counter() - start
+        for caption_clip in caption_clips:
+            caption_clip.close()
+    return {"words": len(words), "frames": int(duration * fps), "seconds": timings}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the caption renderers on a synthetic short.")
+    parser.add_argument("--duration", type=float, default=60.0, help="Length of the short in seconds (default: %(default)s)")
+    parser.add_argument("--fps", type=int, default=50, help="Frame rate (default: %(default)s)")
+    parser.add_argument("--encode", action="store_true", help="Include libx264 encoding in the measurement")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.duration, args.fps, encode=args.encode)
+    print(f"{result['words']} words, {result['frames']} frames")
+    for renderer, seconds in result["seconds"].items():
+        print(f"- {renderer}: {seconds:.1f}s ({result['frames'] / seconds:.1f} frames/s)")
+    speedup = result["seconds"]["textclip"] / result["seconds"]["glyph"]
+    print(f"Glyph cache renderer is {speedup:.1f}x faster")
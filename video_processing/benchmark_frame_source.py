@@ -0,0 +1,68 @@
+import argparse
+import time
+
+import cv2
+
+from video_processing.frame_source import FrameSource
+
+
+def videocapture_frames(video_path: str, fps: float = None, height: int = None):
+    """The previous way of reading analysis frames: full resolution decode, then convert and resize in Python."""
+    cap = cv2.VideoCapture(video_path)
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    step = source_fps / fps if fps else 1.0
+    next_frame = 0.0
+    idx = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if idx >= next_frame:
+                next_frame += step
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                if height and height != rgb.shape[0]:
+                    rgb = cv2.resize(rgb, (int(rgb.shape[1] * height / rgb.shape[0]), height))
+                yield idx / source_fps, rgb
+            idx += 1
+    finally:
+        cap.release()
+
+
+def run_benchmark(video_path: str, fps: float = None, height: int = None) -> dict:
+    """
+    Read the same frames with cv2.VideoCapture and with FrameSource.
+
+    Args:
+        video_path (str): Path to the video
+        fps (float): Analysis frame rate, None for every frame
+        height (int): Analysis height, None for the source resolution
+
+    Returns:
+        dict: Frames and seconds per reader
+    """
+    results = {}
+    start = time.perf_counter()
+    frames = sum(1 for _ in videocapture_frames(video_path, fps, height))
+    results["videocapture"] = {"frames": frames, "seconds": time.perf_counter() - start}
+
+    start = time.perf_counter()
+    with FrameSource(video_path, fps=fps, height=height) as source:
+        frames = sum(1 for _ in source)
+    results["frame_source"] = {"frames": frames, "seconds": time.perf_counter() - start}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the throughput of cv2.VideoCapture and the ffmpeg FrameSource.")
+    parser.add_argument("video_path", help="Path to a video")
+    parser.add_argument("--fps", type=float, default=None, help="Analysis frame rate (default: every frame)")
+    parser.add_argument("--height", type=int, default=None, help="Analysis height (default: source resolution)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.video_path, args.fps, args.height)
+    for reader, result in results.items():
+        print(f"- {reader}: {result['frames']} frames in {result['seconds']:.1f}s "
+              f"({result['frames'] / result['seconds']:.1f} frames/s)")
+    speedup = results["videocapture"]["seconds"] / results["frame_source"]["seconds"]
+    print(f"FrameSource is {speedup:.1f}x faster")
@@ -1,24 +1,48 @@
-from openai import OpenAI
-import openai
 import json
 # from create_captions import create_captions
 import requests
 from moviepy import *
 import dotenv
+# The modules read their settings (OPENAI_*, RENDER_PROFILE, REFRAME, ...) from the
+# environment when they are imported, so .env has to be loaded before them
+dotenv.load_dotenv()
 import base64
 import os
-from video_processing.create_captions import create_captions
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from video_processing.create_captions import (
+    create_captions,
+    caption_output_path,
+    CAPTION_RENDERER,
+    transcribe_words,
+    transcribe_clip_audio,
+    write_captioned_video,
+)
+from video_processing.ass_captions import write_ass_captions
+from video_processing.caption_timing import build_caption_words
 import cv2
-from video_processing.create_thumbnail_from_video_add_quote import extract_frame
+from openai_client import get_client, tracked_call
+from video_processing.create_thumbnail_from_video_add_quote import create_thumbnails
+from video_processing.tts_cache import get_narration, evict_cache, TTS_CACHE_DIR
+from video_processing.ffmpeg_renderer import render_timeline, render_timeline_audio, output_dimensions
+from video_processing.render_profiles import get_render_profile, scale_dimensions
+from video_processing.reframe import crop_trajectory, tracked_crop, REFRAME_MODE
+from video_processing.stream_assembly import assemble_timeline
+from video_processing.shot_index import timeline_shots, write_video_shots
 
-if not os.path.exists("./intermediate/image_gen"):
-    os.makedirs("./intermediate/image_gen",exist_ok=True)
 if not os.path.exists("./intermediate/tiktok"):
         os.makedirs("./intermediate/tiktok",exist_ok=True)
 
-def image_generator(client, prompt, idx):
+# Number of image generation and speech synthesis requests running at the same time
+MAX_ASSET_WORKERS = 8
+# Per-topic scratch files (generated images, scripts), so topics can be rendered concurrently
+SCRATCH_DIR = "./intermediate/scratch"
+
+def image_generator(client, prompt, idx, output_dir="./intermediate/image_gen"):
     
-    result = client.images.generate(
+    result = tracked_call(
+        "image_generator",
+        client.images.generate,
         model="gpt-image-1",
         size = "1024x1536",
         prompt=prompt
@@ -27,7 +51,8 @@ def image_generator(client, prompt, idx):
     image_base64 = result.data[0].b64_json
     image_bytes = base64.b64decode(image_base64)
     
-    with open(f"./intermediate/image_gen/{idx}.png", "wb") as f:
+    os.makedirs(output_dir, exist_ok=True)
+    with open(f"{output_dir}/{idx}.png", "wb") as f:
         f.write(image_bytes)
 
 def crop_video(clip):  
@@ -58,7 +83,7 @@ def crop_video(clip):
     clip = cc.resized((target_width, target_height))
     return clip
 
-def crop_video(clip, smallest_dims):
+def crop_video(clip, smallest_dims, trajectory=None):
     height = clip.h
     width = clip.w
 
@@ -68,18 +93,22 @@ def crop_video(clip, smallest_dims):
 
     center_y = clip.h / 2
 
-    cc=clip.cropped(x_center=center_x,
-                    y_center=center_y,
-                    width=new_width,
-                    height=height
-                    )
+    if trajectory:
+        # Follow the speaker instead of cutting them off at the side
+        cc = tracked_crop(clip, trajectory, new_width)
+    else:
+        cc=clip.cropped(x_center=center_x,
+                        y_center=center_y,
+                        width=new_width,
+                        height=height
+                        )
     #clip = cc.resized((target_width, target_height))
     if smallest_dims[0] > new_width:
         smallest_dims = (new_width, height)
     return cc, smallest_dims
 
 
-def script_generator(client, system_text, clips, summary):
+def script_generator(client, system_text, clips, summary, output_dir="./intermediate/tiktokscript"):
     output_list = []
     # Initialize the conversation
     messages = [{"role": "system", "content": system_text}]
@@ -98,7 +127,9 @@ def script_generator(client, system_text, clips, summary):
         messages.append({"role": "user", "content": prompt})
         
         # Get assistant response
-        response = client.chat.completions.create(
+        response = tracked_call(
+            "script_generator",
+            client.chat.completions.create,
             model="o4-mini",
             messages=messages,
         )
@@ -110,33 +141,135 @@ def script_generator(client, system_text, clips, summary):
         
         data = json.loads(assistant_reply)
         output_list.append(data)
-        if not os.path.exists("./intermediate/tiktokscript"):
-            os.makedirs("./intermediate/tiktokscript")
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
        
-        with open(f'./intermediate/tiktokscript/output_{idx}.json', 'w') as json_file:
+        with open(f'{output_dir}/output_{idx}.json', 'w') as json_file:
             json.dump(data, json_file, indent=4)
     return output_list
 
-def vid2croppedclip(clips, path, smallest_dims) -> list[VideoFileClip]:
+def load_script(output_dir):
+    """Load the script and image descriptions written by script_generator, None if they are missing."""
+    output_list = []
+    for idx in range(2):
+        script_path = f'{output_dir}/output_{idx}.json'
+        if not os.path.exists(script_path):
+            return None
+        with open(script_path, 'r') as json_file:
+            output_list.append(json.load(json_file))
+    return output_list
+
+def generate_image(client, prompt, idx, output_dir, reuse=False):
+    """Generate the image of a script section, or keep the one of an earlier run."""
+    if reuse and os.path.exists(f"{output_dir}/{idx}.png"):
+        return
+    image_generator(client, prompt, idx, output_dir)
+
+def resolve_clip_path(path, index):
+    """Path of a statement clip, the rough cut is used if there is no precise cut."""
+    filepath = path + '/' + f"statement_{index}_final.mp4"
+    if not os.path.exists(filepath):
+        filepath = path + '/' + f"statement_{index}_rough.mp4"
+    return filepath
+
+def face_trajectory(clip_path, source=None):
+    """Face-tracked crop trajectory of a clip (from the session proxy if known), None (center crop) if the analysis fails."""
+    try:
+        return crop_trajectory(clip_path, source=source)
+    except Exception as e:
+        print(f"Warning: Reframing analysis of {clip_path} failed, using the center crop: {e}")
+        return None
+
+def vid2croppedclip(clips, path, smallest_dims, trajectories=None) -> list[VideoFileClip]:
+    trajectories = trajectories or {}
     clips_out = []
     for c in clips:
         if c["index"]!=-1:
-            try:
-                filename = f"statement_{c['index']}_final.mp4"
-                filepath = path +'/'+filename
-                clip = VideoFileClip(filepath)
-            except:
-                filename = f"statement_{c['index']}_rough.mp4"
-                filepath = path +'/'+filename
-                clip = VideoFileClip(filepath)              
-            clip_final_sub, smallest_dims = crop_video(clip, smallest_dims)
+            clip = VideoFileClip(resolve_clip_path(path, c["index"]))
+            clip_final_sub, smallest_dims = crop_video(clip, smallest_dims, trajectories.get(c["index"]))
             # clip_final_sub = clip_final_sub.subclipped(start, end) 
             clips_out.append(clip_final_sub)
     return clips_out, smallest_dims 
 
+def pair_narrator_sections(script, descriptions):
+    """
+    Pair the narrator sections of the script with the image descriptions by index.
+    The model does not always return one description per section: extra descriptions
+    are dropped, and so are the narrator sections without an image.
+
+    Returns:
+        tuple: (script, descriptions) with one description per narrator section
+    """
+    sections = sum(1 for entry in script if entry["index"] == -1)
+    if sections == len(descriptions):
+        return script, descriptions
+    count = min(sections, len(descriptions))
+    print(f"Warning: The script has {sections} narrator sections but {len(descriptions)} image descriptions, "
+          f"using the first {count} of each")
+    paired = []
+    narration_idx = 0
+    for entry in script:
+        if entry["index"] == -1:
+            if narration_idx >= count:
+                continue
+            narration_idx += 1
+        paired.append(entry)
+    return paired, descriptions[:count]
+
+def build_timeline(script, path, narrations, narrator_texts=None, statements=None, fade_out=2,
+                   image_dir="./intermediate/image_gen", trajectories=None):
+    """
+    Describe the short as a list of segments in playback order: real clips and
+    generated images with their narration (see ffmpeg_renderer.build_render_command).
+    Known word timings of the quotes and the narration texts are attached for the captions,
+    face-tracked crop trajectories (by statement index) to the clips.
+    """
+    trajectories = trajectories or {}
+    words_by_id = {s["id"]: s.get("words") for s in statements or []}
+    sources = {s["id"]: s.get("source") for s in statements or []}
+    timeline = []
+    narration_idx = 0
+    for entry in script:
+        if entry["index"] != -1:
+            clip_path = resolve_clip_path(path, entry["index"])
+            timeline.append({
+                "type": "clip",
+                "path": clip_path,
+                # Word timings only match the precise cut
+                "words": words_by_id.get(entry["index"]) if clip_path.endswith("_final.mp4") else None,
+                "trajectory": trajectories.get(entry["index"]),
+                # Range of the clip in the session, its shots come from the session shot index
+                "source": sources.get(entry["index"])
+            })
+        else:
+            if narration_idx >= len(narrations):
+                raise ValueError(f"The script has more narrator sections than narrations ({len(narrations)}), "
+                                 f"see pair_narrator_sections")
+            audio_path, duration = narrations[narration_idx]
+            timeline.append({
+                "type": "image",
+                "image": f"{image_dir}/{narration_idx}.png",
+                "audio": audio_path,
+                "duration": duration,
+                "text": narrator_texts[narration_idx] if narrator_texts else None,
+                "fade_out": fade_out
+            })
+            narration_idx += 1
+    return timeline
+
 from  moviepy.video.fx import FadeOut
 
-def concatenate_videos(clip_list, nameout, lenny_indices ,smallest_dims):
+def concatenate_videos(clip_list, nameout, lenny_indices ,smallest_dims, captions_output=None, caption_words=None,
+                       threads=None, profile=None):
+    """
+    Concatenate the clips and write them to nameout. With captions_output the captions
+    are burned in by the same (and only) encode and the result is written to
+    captions_output instead. The caption timings come from caption_words, the
+    soundtrack is only transcribed if they are missing.
+    Resolution, frame rate and encoder settings come from the render profile.
+    """
+    profile = profile or get_render_profile()
+    smallest_dims = scale_dimensions(smallest_dims, profile["max_height"])
 
     effect= FadeOut(2)
     for idx, clip in enumerate(clip_list):
@@ -144,44 +277,72 @@ def concatenate_videos(clip_list, nameout, lenny_indices ,smallest_dims):
     for index in lenny_indices:
         clip_list[index] = effect.copy().apply(clip_list[index]) 
     clipfinal = concatenate_videoclips(clip_list)
-    if ".mp4" in nameout:
+    if captions_output:
+        words = caption_words if caption_words is not None else transcribe_clip_audio(clipfinal)
+        write_captioned_video(clipfinal, words, captions_output, fps=profile["fps"], preset=profile["preset"],
+                              renderer=profile["caption_renderer"] or CAPTION_RENDERER,
+                              threads=threads, crf=profile["crf"])
+    elif ".mp4" in nameout:
         clipfinal.write_videofile(nameout,
                                    codec="libx264",
-                                     fps=50,
-                                     audio_codec="aac")
+                                     fps=profile["fps"],
+                                     preset=profile["preset"],
+                                     ffmpeg_params=["-crf", str(profile["crf"])],
+                                     audio_codec="aac",
+                                     threads=threads)
     else:
         print("Error, missing extension.")
     for c in clip_list:
         c.close()
     clipfinal.close()
 
-def img2vid(image_path, duration, text, smallest_dims):
-    if os.path.exists("tmp.mp3"):
-        os.remove("tmp.mp3")
-    text_to_speech(text)
-    audio = AudioFileClip("tmp.mp3")
-    # Get the duration in seconds
-    duration = audio.duration
+def img2vid(image_path, audio_path, duration, smallest_dims):
+    # The duration comes from the narration cache metadata, no need to decode the audio
+    audio = AudioFileClip(audio_path)
     clip = ImageClip(image_path)
     zoom_clip = clip.with_duration(duration)
     zoom_clip, smallest_dims = crop_video(zoom_clip, smallest_dims)
     zoom_clip = zoom_clip.with_audio(audio)
     return zoom_clip, smallest_dims
 
-def text_to_speech(text, voice="nova", model="tts-1"):
-    response = openai.audio.speech.create(
+def text_to_speech(text, voice="nova", model="tts-1", output_path=None):
+    response = tracked_call(
+        "text_to_speech",
+        get_client().audio.speech.create,
         model=model,
         voice=voice,
         input=text  # ← Just pass German text here
     )
     
-    with open("tmp.mp3", "wb") as f:
-        f.write(response.content)
+    if output_path:
+        with open(output_path, "wb") as f:
+            f.write(response.content)
     
 
     return response.content
 
-def create_video_Topic(client,topic_path,topic_name):
+def create_video_Topic(client,topic_path,topic_name, render_backend="moviepy", captions="combined",
+                       scratch_dir=None, threads=None, profile=None, reuse_assets=False, reframe=REFRAME_MODE):
+    """
+    Generate the script, assets and video of one topic short.
+
+    All scratch files go to scratch_dir (default: intermediate/scratch/<topic>) and the
+    encoders use at most `threads` threads, so several topics can render at once.
+
+    profile selects the render settings (see render_profiles): "preview" renders a small,
+    fast version for the editorial review, "publish" the final short.
+    With reuse_assets the script and images of an earlier run in scratch_dir are used
+    instead of requesting new ones, so publishing an approved preview makes no API calls
+    (the narrations come from the TTS cache).
+
+    reframe="face" crops the clips around the speaker (see reframe), "center" keeps the center crop.
+
+    render_backend selects how the timeline is assembled: "moviepy" decodes and
+    composes every clip in Python, "ffmpeg" compiles it into one filter_complex,
+    "stream" streams the segments one by one into the encoder with bounded memory.
+    captions="combined" burns the captions in during the only encode of the short,
+    "separate" encodes the short first and lets create_captions encode it again.
+    """
 
     with open('./text_mining/tiktok_script_generation_prompt.txt', 'r') as f:
         system_text = f.read()
@@ -189,52 +350,141 @@ def create_video_Topic(client,topic_path,topic_name):
     with open(topic_path+topic_name+"/"+topic_name+".jsonl", 'r') as f:
         clips = json.load(f)
     summary=f"{clips['topic']}: {clips['explanation']}"
-    output_lists = script_generator(client, system_text, clips["statements"], summary)
-
-
-    #TODO: HERE ADD PAUL'S FUNCTION
-    for idx, vids2gen in enumerate(output_lists[1]):
-         image_generator(client, vids2gen["description"], idx) # Replace with Paul
-        # image_generator(client, summary, idx) # Replace with Paul
+    profile = get_render_profile(profile)
+    scratch_dir = scratch_dir or os.path.join(SCRATCH_DIR, topic_name)
+    image_dir = os.path.join(scratch_dir, "image_gen")
+    script_dir = os.path.join(scratch_dir, "tiktokscript")
+    output_lists = load_script(script_dir) if reuse_assets else None
+    if output_lists is None:
+        if reuse_assets:
+            print(f"No script of an earlier run found in {script_dir}, generating a new one.")
+        output_lists = script_generator(client, system_text, clips["statements"], summary,
+                                        output_dir=script_dir)
+
+
+    script, descriptions = pair_narrator_sections(output_lists[0], output_lists[1])
+    # Narrator text for every generated image, in script order
+    narrator_texts = [texts["narrator"] for texts in script if texts["index"] == -1]
 
     smallest_dims = (float("inf"), float("inf"))
 
-    re_vids, smallest_dims = vid2croppedclip(output_lists[0], topic_path+topic_name, smallest_dims)
+    clip_indices = [entry["index"] for entry in script if entry["index"] != -1]
+
+    # Start all slow API calls and the reframing analysis of the clips at once,
+    # assembly only has to wait for the slowest of them
+    with ThreadPoolExecutor(max_workers=MAX_ASSET_WORKERS) as executor:
+        image_futures = [
+            executor.submit(generate_image, client, vids2gen["description"], idx, image_dir, reuse_assets)
+            for idx, vids2gen in enumerate(descriptions)
+        ]
+        speech_futures = [executor.submit(get_narration, text, text_to_speech) for text in narrator_texts]
+        trajectory_futures = {}
+        if reframe == "face":
+            sources = {s["id"]: s.get("source") for s in clips["statements"]}
+            trajectory_futures = {
+                idx: executor.submit(face_trajectory, resolve_clip_path(topic_path+topic_name, idx), sources.get(idx))
+                for idx in clip_indices
+            }
+
+        for future in image_futures:
+            future.result()
+        narrations = [future.result() for future in speech_futures]
+        trajectories = {idx: future.result() for idx, future in trajectory_futures.items()}
+
+    video_path = f"./intermediate/tiktok/{topic_name}{profile['suffix']}.mp4"
+    captioned_video_path = caption_output_path(video_path, profile["output_dir"])
+    combined = captions == "combined"
+    timeline = build_timeline(script, topic_path+topic_name, narrations,
+                              narrator_texts=narrator_texts, statements=clips["statements"],
+                              image_dir=image_dir, trajectories=trajectories)
+    # Caption timings from the quote word timestamps and the narration texts, aligned once
+    # against their cached TTS audio; Whisper transcribes only segments without a text
+    caption_words = build_caption_words(timeline)
+    if render_backend == "ffmpeg":
+        if combined:
+            render_captioned_timeline(timeline, captioned_video_path, words=caption_words, threads=threads,
+                                      profile=profile)
+        else:
+            render_timeline(timeline, video_path, fps=profile["fps"], preset=profile["preset"], threads=threads,
+                            crf=profile["crf"], max_height=profile["max_height"])
+    elif render_backend == "stream":
+        assemble_timeline(timeline, captioned_video_path if combined else video_path,
+                          words=caption_words if combined else None, profile=profile, threads=threads)
+    else:
+        # Opened only now, so an earlier error cannot leave the readers open
+        re_vids, smallest_dims = vid2croppedclip(script, topic_path+topic_name, smallest_dims, trajectories)
+        render_moviepy(script, re_vids, narrations, smallest_dims, video_path,
+                       captions_output=captioned_video_path if combined else None,
+                       caption_words=caption_words, image_dir=image_dir, threads=threads, profile=profile)
+
+    if not combined:
+        captioned_video_path = create_captions(video_path, profile["output_dir"], words=caption_words,
+                                               threads=threads, preset=profile["preset"], crf=profile["crf"],
+                                               renderer=profile["caption_renderer"] or CAPTION_RENDERER)
+    print("--- Caption Generation Successful ---")
+    print(f"Output video saved to: {captioned_video_path}")
+    # For the thumbnail search, which then needs no shot detection on the short
+    try:
+        write_video_shots(captioned_video_path, timeline_shots(timeline))
+    except Exception as e:
+        print(f"Warning: Could not store the shots of {captioned_video_path}: {e}")
+    # The thumbnails of all topics are created afterwards in one batch, see create_thumbnails
+    return captioned_video_path
+
+
+def render_captioned_timeline(timeline, output_path, words=None, threads=None, profile=None):
+    """
+    Render a timeline with ffmpeg and burn in the captions during the same encode.
+    Without known word timings only the soundtrack is rendered beforehand, to transcribe it.
+    """
+    profile = profile or get_render_profile()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if words is None:
+            audio_path = render_timeline_audio(timeline, os.path.join(tmp_dir, "soundtrack.wav"))
+            words = transcribe_words(audio_path)
+        subtitles_path = None
+        if words:
+            subtitles_path = write_ass_captions(
+                words, os.path.join(tmp_dir, "captions.ass"), output_dimensions(timeline, profile["max_height"])
+            )
+        else:
+            print("Warning: No words with timestamps found in transcription. Rendering without captions.")
+        render_timeline(timeline, output_path, fps=profile["fps"], preset=profile["preset"], threads=threads,
+                        subtitles_path=subtitles_path, crf=profile["crf"], max_height=profile["max_height"])
+    return output_path
+
 
+def render_moviepy(script, re_vids, narrations, smallest_dims, video_path, captions_output=None, caption_words=None,
+                   image_dir="./intermediate/image_gen", threads=None, profile=None):
     # get_aiids(output_lists)
     ai_vids = []
     vids = []
     c_ai = 0
     c_re = 0
-    for idx, dct in enumerate(output_lists[1]):
-        counter = 0
-        for texts in output_lists[0]:
-            if texts["index"] ==-1:
-                if idx == counter:
-                    break
-                counter+=1
-        # ai_vid = img2vid(f"./intermediate/image_gen/{idx}.png", dct["duration"], texts["narrator"])
-        ai_vid, smallest_dims = img2vid(f"./intermediate/image_gen/{idx}.png", dct["duration"], texts["narrator"],smallest_dims)
-        ai_vids.append(ai_vid)
-
-    lenny_indices = []
-    for idx, dct in enumerate(output_lists[0]):
-        if dct["index"] != -1:
-            vid = re_vids[c_re]
-            c_re+=1
-        else:
-            vid = ai_vids[c_ai]
-            c_ai+=1
-            lenny_indices.append(idx)
-        vids.append(vid)
+    try:
+        for idx, (audio_path, duration) in enumerate(narrations):
+            ai_vid, smallest_dims = img2vid(f"{image_dir}/{idx}.png", audio_path, duration, smallest_dims)
+            ai_vids.append(ai_vid)
 
+        lenny_indices = []
+        for idx, dct in enumerate(script):
+            if dct["index"] != -1:
+                vid = re_vids[c_re]
+                c_re+=1
+            else:
+                vid = ai_vids[c_ai]
+                c_ai+=1
+                lenny_indices.append(idx)
+            vids.append(vid)
 
-    concatenate_videos(vids,f"./intermediate/tiktok/{topic_name}.mp4", lenny_indices,smallest_dims)
-    captioned_video_path = create_captions(f"./intermediate/tiktok/{topic_name}.mp4", "./output/tiktok/")
-    print("--- Caption Generation Successful ---")
-    print(f"Output video saved to: {captioned_video_path}")
 
-    extract_frame(topic_name,captioned_video_path, topic_path+topic_name+"/"+topic_name+".jsonl",client)
+        concatenate_videos(vids, video_path, lenny_indices,smallest_dims,
+                           captions_output=captions_output, caption_words=caption_words, threads=threads,
+                           profile=profile)
+    finally:
+        # All sources are open at once here, release them also if the render fails
+        for clip in [*re_vids, *ai_vids]:
+            clip.close()
 
 
 
@@ -247,13 +497,16 @@ def create_all_videos(client,path: str, topics):
 
 
 if __name__ == "__main__":
-    dotenv.load_dotenv()
-
-    client = OpenAI()
+    client = get_client()
 
     topics_dir = "./intermediate/shorts_draft/"
 
+    thumbnail_topics = []
     for topic_name in os.listdir(topics_dir):
         if topic_name == '.DS_Store':
             continue
-        create_video_Topic(client, topics_dir, topic_name)
+        video_path = create_video_Topic(client, topics_dir, topic_name)
+        thumbnail_topics.append((topic_name, video_path, topics_dir+topic_name+"/"+topic_name+".jsonl"))
+    create_thumbnails(client, thumbnail_topics)
+    if os.path.isdir(TTS_CACHE_DIR):
+        evict_cache()
@@ -0,0 +1,124 @@
+import bisect
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Fonts tried in order for the captions, CAPTION_FONT_PATH overrides them
+CAPTION_FONT_PATHS = [
+    os.getenv("CAPTION_FONT_PATH", ""),
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "/usr/share/fonts/truetype/msttcorefonts/Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+]
+HIGHLIGHT_RGB = (255, 255, 0)
+STROKE_RGB = (0, 0, 0)
+
+
+def load_caption_font(font_size: int):
+    """Load the first available caption font in the given size."""
+    for font_path in CAPTION_FONT_PATHS:
+        if not font_path:
+            continue
+        try:
+            return ImageFont.truetype(font_path, font_size)
+        except OSError:
+            continue
+    print("Warning: No caption font found, using Pillow's default font.")
+    return ImageFont.load_default(font_size)
+
+
+class GlyphCache:
+    """Rasterizes every distinct word once into a premultiplied RGBA sprite."""
+
+    def __init__(self, font_size: int, color=HIGHLIGHT_RGB, stroke_color=STROKE_RGB, stroke_width: int = None):
+        self.font = load_caption_font(font_size)
+        self.color = color
+        self.stroke_color = stroke_color
+        self.stroke_width = stroke_width if stroke_width is not None else max(1, int(font_size * 0.05))
+        self._sprites = {}
+
+    def sprite(self, word: str) -> tuple:
+        """
+        Get the sprite of a word.
+
+        Returns:
+            tuple: (rgb, alpha) float32 arrays of shape (h, w, 3) and (h, w, 1),
+                   rgb is premultiplied with alpha
+        """
+        sprite = self._sprites.get(word)
+        if sprite is None:
+            left, top, right, bottom = self.font.getbbox(word, stroke_width=self.stroke_width)
+            image = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+            ImageDraw.Draw(image).text(
+                (-left, -top), word, font=self.font, fill=self.color,
+                stroke_width=self.stroke_width, stroke_fill=self.stroke_color
+            )
+            pixels = np.asarray(image, dtype=np.float32)
+            alpha = pixels[..., 3:4] / 255.0
+            sprite = (pixels[..., :3] * alpha, alpha)
+            self._sprites[word] = sprite
+        return sprite
+
+    def __len__(self):
+        return len(self._sprites)
+
+
+class CaptionOverlay:
+    """
+    Single-word highlight captions drawn as one overlay per frame.
+
+    The active word of a frame is found by binary search over the sorted word start
+    times, so the cost per frame does not grow with the number of words.
+    """
+
+    def __init__(self, words: list, frame_size: tuple, font_size: int):
+        words = sorted(
+            (w for w in words if w["word"].strip()),
+            key=lambda w: w["start"]
+        )
+        self.words = [w["word"].strip() for w in words]
+        self.starts = [w["start"] for w in words]
+        # Same minimum duration as the TextClips of create_captions
+        self.ends = [w["start"] + max(0.05, w["end"] - w["start"]) for w in words]
+        self.width, self.height = frame_size
+        self.font_size = font_size
+        self.glyphs = GlyphCache(font_size)
+
+    def active_word(self, t: float):
+        """Get the word spoken at time t, or None."""
+        idx = bisect.bisect_right(self.starts, t) - 1
+        if idx >= 0 and t < self.ends[idx]:
+            return self.words[idx]
+        return None
+
+    def blend(self, frame: np.ndarray, t: float) -> np.ndarray:
+        """Blend the active word onto a frame, near the bottom center like create_captions."""
+        word = self.active_word(t)
+        if word is None:
+            return frame
+        rgb, alpha = self.glyphs.sprite(word)
+        sprite_h, sprite_w = alpha.shape[:2]
+        frame_h, frame_w = frame.shape[:2]
+
+        x = (frame_w - sprite_w) // 2
+        y = int(frame_h - self.font_size * 1.5)
+        # Clip the sprite to the frame
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sprite_w, frame_w), min(y + sprite_h, frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return frame
+        sx0, sy0 = x0 - x, y0 - y
+        sx1, sy1 = sx0 + (x1 - x0), sy0 + (y1 - y0)
+
+        out = frame.copy()
+        region = out[y0:y1, x0:x1].astype(np.float32)
+        region = rgb[sy0:sy1, sx0:sx1] + region * (1.0 - alpha[sy0:sy1, sx0:sx1])
+        out[y0:y1, x0:x1] = region.astype(np.uint8)
+        return out
+
+    def apply(self, clip):
+        """Return the moviepy clip with the captions drawn onto every frame."""
+        return clip.transform(lambda get_frame, t: self.blend(get_frame(t), t))
@@ -0,0 +1,205 @@
+import difflib
+import re
+
+from video_processing.create_captions import transcribe_words_batch
+from video_processing.ffmpeg_renderer import probe_duration
+from video_processing.tts_cache import load_narration_words, store_narration_words
+
+# Relative pause after punctuation, in characters of speaking time
+PAUSE_WEIGHTS = {",": 2, ";": 3, ":": 3, ".": 5, "!": 5, "?": 5}
+# Share of the narration words Whisper has to recognize for its timings to be used
+MIN_MATCH_RATIO = 0.5
+
+
+def align_narration(text: str, duration: float) -> list:
+    """
+    Estimate the word timings of narration text in its TTS audio, the fallback when
+    there is no Whisper alignment (see align_narrations).
+
+    The TTS voice speaks at an even pace, so every word gets a share of the audio duration
+    proportional to its length, plus a pause after punctuation.
+
+    Args:
+        text (str): The exact text that was sent to the TTS model
+        duration (float): Duration of the synthesized audio in seconds
+
+    Returns:
+        list: Word dicts with "word", "start" and "end" relative to the start of the audio
+    """
+    words = text.split()
+    if not words or duration <= 0:
+        return []
+
+    speech_weights = [len(re.sub(r"\W", "", word)) or 1 for word in words]
+    pause_weights = [PAUSE_WEIGHTS.get(word[-1], 0) for word in words]
+    seconds_per_weight = duration / (sum(speech_weights) + sum(pause_weights[:-1]))
+
+    aligned = []
+    position = 0.0
+    for word, speech_weight, pause_weight in zip(words, speech_weights, pause_weights):
+        start = position
+        end = start + speech_weight * seconds_per_weight
+        aligned.append({"word": word, "start": start, "end": end})
+        position = end + pause_weight * seconds_per_weight
+    return aligned
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"\W", "", word).lower()
+
+
+def match_known_words(text: str, recognized: list, duration: float, min_match: float = MIN_MATCH_RATIO):
+    """
+    Put the timings of the words Whisper recognized in a narration onto the known text.
+
+    The words of the text are matched to the recognized words in order. Matched words take
+    the recognized timings. Runs of unmatched words, such as misrecognized names or numbers,
+    share the time between their matched neighbours by length.
+
+    Args:
+        text (str): The exact text that was sent to the TTS model
+        recognized (list): Whisper word dicts of the narration audio
+        duration (float): Duration of the audio in seconds
+
+    Returns:
+        list: Word dicts of the text relative to the start of the audio, None if fewer
+              than min_match of the words were recognized
+    """
+    known = text.split()
+    if not known:
+        return []
+    matcher = difflib.SequenceMatcher(None, [_normalize(w) for w in known],
+                                      [_normalize(w["word"]) for w in recognized], autojunk=False)
+    anchors = {}
+    for a, b, size in matcher.get_matching_blocks():
+        for k in range(size):
+            anchors[a + k] = recognized[b + k]
+    if len(anchors) < min_match * len(known):
+        return None
+
+    aligned = []
+    i = 0
+    while i < len(known):
+        if i in anchors:
+            aligned.append({"word": known[i], "start": float(anchors[i]["start"]), "end": float(anchors[i]["end"])})
+            i += 1
+            continue
+        j = i
+        while j < len(known) and j not in anchors:
+            j += 1
+        gap_start = aligned[-1]["end"] if aligned else 0.0
+        gap_end = max(float(anchors[j]["start"]) if j < len(known) else duration, gap_start)
+        gap_words = align_narration(" ".join(known[i:j]), gap_end - gap_start) or [
+            {"word": word, "start": 0.0, "end": 0.0} for word in known[i:j]]
+        aligned += [{"word": w["word"], "start": gap_start + w["start"], "end": gap_start + w["end"]}
+                    for w in gap_words]
+        i = j
+    return aligned
+
+
+def align_narrations(timeline: list) -> dict:
+    """
+    Align the narration texts of a timeline against their TTS audio with Whisper.
+
+    Each narration is transcribed only once: the timings are stored next to it in the
+    TTS cache, and all uncached narrations go to the shared Whisper service in one batch.
+    Narrations that cannot be aligned are left out, they fall back to align_narration.
+
+    Args:
+        timeline (list): Timeline segments in playback order
+
+    Returns:
+        dict: Segment index -> word dicts relative to the start of the narration
+    """
+    aligned = {}
+    pending = []
+    for idx, segment in enumerate(timeline):
+        if segment["type"] != "image" or not segment.get("text") or not segment.get("audio"):
+            continue
+        words = load_narration_words(segment["audio"])
+        if words is None:
+            pending.append(idx)
+        else:
+            aligned[idx] = words
+    if not pending:
+        return aligned
+
+    try:
+        recognized = transcribe_words_batch([timeline[idx]["audio"] for idx in pending])
+    except Exception as e:
+        print(f"Warning: Whisper alignment of {len(pending)} narrations failed, splitting them by length: {e}")
+        return aligned
+    for idx, words in zip(pending, recognized):
+        segment = timeline[idx]
+        matched = match_known_words(segment["text"], words, segment["duration"])
+        if matched is None:
+            print(f"Warning: Whisper did not recognize the narration {segment['audio']}, splitting it by length")
+            continue
+        store_narration_words(segment["audio"], matched)
+        aligned[idx] = matched
+    return aligned
+
+
+def known_segment_words(segment: dict) -> list:
+    """
+    Get the caption words of a single timeline segment relative to its start.
+
+    Args:
+        segment (dict): Timeline segment, see build_timeline in blue_box
+
+    Returns:
+        list: Word dicts relative to the start of the segment, None if the timings are unknown
+    """
+    if segment["type"] == "image":
+        if segment.get("text"):
+            return align_narration(segment["text"], segment["duration"])
+        return None
+    return segment.get("words") or None
+
+
+def build_caption_words(timeline: list) -> list:
+    """
+    Build the caption word timings of a whole short from data the pipeline already has:
+    quote word timestamps shifted by their offset in the timeline and narration text
+    aligned to its TTS audio (cached, see align_narrations). Segments without known
+    timings are transcribed with Whisper as a fallback, in a single batched request.
+
+    Args:
+        timeline (list): Timeline segments in playback order
+
+    Returns:
+        list: Word dicts with "word", "start" and "end" relative to the start of the short
+    """
+    narration_words = align_narrations(timeline)
+    segment_words = [
+        narration_words[idx] if idx in narration_words else known_segment_words(segment)
+        for idx, segment in enumerate(timeline)
+    ]
+
+    fallback = [idx for idx, words in enumerate(segment_words) if words is None]
+    if fallback:
+        paths = [
+            timeline[idx]["path"] if timeline[idx]["type"] == "clip" else timeline[idx]["audio"]
+            for idx in fallback
+        ]
+        print(f"No known word timings for {len(paths)} segments, falling back to Whisper.")
+        for idx, words in zip(fallback, transcribe_words_batch(paths)):
+            segment_words[idx] = words
+
+    words = []
+    offset = 0.0
+    for segment, known_words in zip(timeline, segment_words):
+        duration = segment.get("duration")
+        if duration is None:
+            duration = probe_duration(segment["path"])
+        for word in known_words:
+            # Drop words outside of the segment, e.g. from a rough cut buffer
+            if word["start"] >= duration or word["end"] <= 0:
+                continue
+            words.append({
+                "word": word["word"],
+                "start": offset + max(word["start"], 0.0),
+                "end": offset + min(word["end"], duration)
+            })
+        offset += duration
+    return words
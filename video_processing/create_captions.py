@@ -1,154 +1,205 @@
 # import moviepy.editor as mp
 from moviepy import *
-import whisper
+from video_processing.whisper_service import get_whisper_service
+from video_processing.caption_renderer import CaptionOverlay
 import os
 import tempfile
 import math # Import math for ceiling function if needed for positioning
 import argparse
 
-# Ensure ffmpeg is installed and accessible in the system PATH.
-# You might need to install it separately (e.g., `brew install ffmpeg` on macOS, `sudo apt update && sudo apt install ffmpeg` on Debian/Ubuntu).
-def create_captions(video_path: str, output_directory: str = None) -> str:
+# Caption style, shared by the moviepy TextClips and the ASS subtitles of the ffmpeg backend
+HIGHLIGHT_COLOR = 'yellow'
+FONT = 'Arial'
+STROKE_COLOR = 'black'
+# "glyph" draws one cached sprite per frame (caption_renderer), "textclip" composites one TextClip per word
+CAPTION_RENDERER = os.getenv("CAPTION_RENDERER", "glyph")
+
+
+def caption_font_size(video_height: int) -> int:
+    """Dynamic caption font size for a video height."""
+    return int(max(24, int(video_height * 0.04)))
+
+
+def transcribe_words(audio_path: str) -> list:
     """
-    Generates captions for a video, highlighting the currently spoken word,
-    and returns the path to the new video file.
+    Transcribe an audio file with Whisper and return its words with timestamps.
+    The model is loaded once and shared (see whisper_service).
 
     Args:
-        video_path: Path to the input MP4 video file.
-        output_directory: Optional directory to save the output video. 
-                          Defaults to the same directory as the input video.
+        audio_path: Path to the audio file.
 
     Returns:
-        The path to the newly created video file with captions.
+        List of dicts with "word", "start" and "end", empty if nothing was recognized.
+    """
+    print("Starting transcription (this may take a while)...")
+    # Absolute, a relative path would resolve against the cwd of the Whisper worker
+    result = get_whisper_service().transcribe(os.path.abspath(audio_path), word_timestamps=True)
+    print("Transcription complete.")
+    return result_words(result)
 
-    Raises:
-        FileNotFoundError: If the input video file does not exist.
-        Exception: If any error occurs during transcription or video processing.
+
+def transcribe_words_batch(audio_paths: list) -> list:
+    """Transcribe several files with one request to the Whisper service, see transcribe_words."""
+    if not audio_paths:
+        return []
+    results = get_whisper_service().transcribe_batch([os.path.abspath(p) for p in audio_paths], word_timestamps=True)
+    return [result_words(result) for result in results]
+
+
+def result_words(result: dict) -> list:
+    """Get the valid words with timestamps of a Whisper result."""
+    if not result or "segments" not in result or not result["segments"]:
+        print("Warning: No segments found in transcription.")
+        return []
+
+    all_words = []
+    for segment in result["segments"]:
+        segment_words = segment.get('words')
+        if segment_words and isinstance(segment_words, list):
+            all_words.extend(segment_words)
+
+    valid_words = []
+    for word_info in all_words:
+        # Basic validation for word_info structure
+        if not isinstance(word_info, dict) or not all(k in word_info for k in ["word", "start", "end"]):
+            print(f"Warning: Skipping invalid word data: {word_info}")
+            continue
+        valid_words.append(word_info)
+    return valid_words
+
+
+def transcribe_clip_audio(clip) -> list:
     """
-    if not os.path.isfile(video_path):
-        raise FileNotFoundError(f"Video file not found: {video_path}")
+    Transcribe the audio track of a (possibly composed, not yet rendered) moviepy clip.
+    Only the audio is rendered, the video frames are never decoded.
 
-    print(f"Loading video: {video_path}")
-    video = VideoFileClip(video_path)
-    audio_path = None
-    final_clip = None
-    caption_clips = []
+    Args:
+        clip: moviepy clip with audio.
 
+    Returns:
+        List of word dicts, see transcribe_words.
+    """
+    audio_path = None
     try:
-        # 1. Extract Audio
         print("Extracting audio...")
         # Create a temporary file for the audio
         with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_audio:
             audio_path = tmp_audio.name
-        video.audio.write_audiofile(audio_path, codec='mp3')
+        clip.audio.write_audiofile(audio_path, codec='mp3')
         print(f"Audio extracted to: {audio_path}")
+        return transcribe_words(audio_path)
+    finally:
+        # Remove temporary audio file
+        if audio_path and os.path.exists(audio_path):
+            try:
+                os.remove(audio_path)
+                print(f"Removed temporary audio file: {audio_path}")
+            except OSError as ose:
+                print(f"Warning: Could not remove temporary audio file {audio_path}: {ose}")
 
-        # 2. Transcribe using Whisper
-        print("Loading Whisper model (base)...")
-        # Using the 'base' model for speed. Options: tiny, base, small, medium, large
-        model = whisper.load_model("base")
-        print("Starting transcription (this may take a while)...")
-        result = model.transcribe(audio_path, word_timestamps=True)
-        print("Transcription complete.")
-
-        # 3. Create TextClips for each word
-        print("Generating caption clips (single word highlight)...")
-        highlight_color = 'yellow'
-        fontsize = int(max(24, int(video.h * 0.04))) # Dynamic fontsize
-        font = 'Arial' 
-        stroke_color = 'black'
-        stroke_width = max(1, int(fontsize * 0.05))
-        
-        # Position near bottom center
-        text_position = ('center', video.h - fontsize * 1.5) 
-
-        if "segments" not in result or not result["segments"]:
-             print("Warning: No segments found in transcription. Skipping caption generation.")
-             return video_path
-
-        all_words = []
-        for segment in result["segments"]:
-            segment_words = segment.get('words')
-            if segment_words and isinstance(segment_words, list):
-                 all_words.extend(segment_words)
-
-        if not all_words:
-            print("Warning: No words with timestamps found in transcription. Skipping caption generation.")
-            return video_path
 
-        total_words_processed = 0
-        for word_info in all_words:
-            # Basic validation for word_info structure
-            if not isinstance(word_info, dict) or not all(k in word_info for k in ["word", "start", "end"]):
-                print(f"Warning: Skipping invalid word data: {word_info}")
-                continue
-            
-            word_text = word_info["word"].strip()
-            if not word_text:
-                 continue # Skip empty words
-
-            start_time = word_info["start"]
-            end_time = word_info["end"]
-            # Ensure duration is positive, minimum 0.05s
-            duration = max(0.05, end_time - start_time)
-
-            # Create the text clip for the highlighted word
-            # Using method='caption' which is generally more reliable than pango
-            try:
-                 txt_clip = TextClip(
-                    #  text=word_text,
-                    #  fontsize=fontsize,
-                     text=word_text,
-                     font_size=fontsize,
-                     color=highlight_color, 
-                     font=font,
-                     stroke_color=stroke_color,
-                     stroke_width=stroke_width,
-                     method='caption',
-                     size=(600, None)
-                    #  method='pillow',
-                    #  align='center'
-                 )
-            except Exception as clip_err:
-                 print(f"\\n** ERROR creating TextClip for word '{word_text}': {clip_err} **")
-                 # Decide if you want to skip the word or raise the error
-                 # raise clip_err 
-                 continue # Skip this word if clip creation fails
-
-            # Set timing and position
-            txt_clip = (txt_clip
-                        .with_start(start_time)
-                        .with_duration(duration)
-                        .with_position(text_position))
-
-            caption_clips.append(txt_clip)
-            total_words_processed += 1
-
-        # Check if any clips were generated
-        if not caption_clips:
-             print("Warning: No caption clips were generated.")
-             return video_path
-
-        print(f"Generated {len(caption_clips)} caption clips for {total_words_processed} words.")
-
-        # 4. Composite captions onto the original video
-        print("Compositing video and captions...")
-        final_clip = CompositeVideoClip([video, *caption_clips])
+def build_caption_clips(words: list, video_height: int) -> list:
+    """
+    Create a highlighted TextClip for each spoken word.
 
-        # 5. Define output path
-        base, ext = os.path.splitext(os.path.basename(video_path))
-        output_filename = f"{base}_captioned.mp4" # Use .mp4 extension
+    Args:
+        words: Word dicts with "word", "start" and "end".
+        video_height: Height of the video the captions are placed on.
 
-        if output_directory:
-            if not os.path.isdir(output_directory):
-                os.makedirs(output_directory)
-            output_path = os.path.join(output_directory, output_filename)
-        else:
-             print(output_directory)
-             output_path = os.path.join(os.path.dirname(video_path), output_filename)
+    Returns:
+        List of positioned and timed TextClips.
+    """
+    print("Generating caption clips (single word highlight)...")
+    fontsize = caption_font_size(video_height)
+    stroke_width = max(1, int(fontsize * 0.05))
+    
+    # Position near bottom center
+    text_position = ('center', video_height - fontsize * 1.5) 
+
+    caption_clips = []
+    for word_info in words:
+        word_text = word_info["word"].strip()
+        if not word_text:
+             continue # Skip empty words
+
+        start_time = word_info["start"]
+        end_time = word_info["end"]
+        # Ensure duration is positive, minimum 0.05s
+        duration = max(0.05, end_time - start_time)
+
+        # Create the text clip for the highlighted word
+        # Using method='caption' which is generally more reliable than pango
+        try:
+             txt_clip = TextClip(
+                #  text=word_text,
+                #  fontsize=fontsize,
+                 text=word_text,
+                 font_size=fontsize,
+                 color=HIGHLIGHT_COLOR, 
+                 font=FONT,
+                 stroke_color=STROKE_COLOR,
+                 stroke_width=stroke_width,
+                 method='caption',
+                 size=(600, None)
+                #  method='pillow',
+                #  align='center'
+             )
+        except Exception as clip_err:
+             print(f"\\n** ERROR creating TextClip for word '{word_text}': {clip_err} **")
+             # Decide if you want to skip the word or raise the error
+             # raise clip_err 
+             continue # Skip this word if clip creation fails
+
+        # Set timing and position
+        txt_clip = (txt_clip
+                    .with_start(start_time)
+                    .with_duration(duration)
+                    .with_position(text_position))
+
+        caption_clips.append(txt_clip)
+
+    print(f"Generated {len(caption_clips)} caption clips for {len(words)} words.")
+    return caption_clips
 
 
-        # 6. Write the final video
+def caption_output_path(video_path: str, output_directory: str = None) -> str:
+    """Path of the captioned version of a video, creating the output directory if needed."""
+    base, ext = os.path.splitext(os.path.basename(video_path))
+    output_filename = f"{base}_captioned.mp4" # Use .mp4 extension
+
+    if output_directory:
+        if not os.path.isdir(output_directory):
+            os.makedirs(output_directory)
+        return os.path.join(output_directory, output_filename)
+    return os.path.join(os.path.dirname(video_path), output_filename)
+
+
+def write_captioned_video(video, words: list, output_path: str, fps: float, preset: str = 'medium',
+                          renderer: str = CAPTION_RENDERER, threads: int = None, crf: int = None):
+    """
+    Draw the captions onto a video and write it in a single encode.
+
+    Args:
+        video: moviepy clip to put the captions on.
+        words: Word dicts with "word", "start" and "end".
+        output_path: Path of the output video.
+        fps: Output frame rate.
+        preset: libx264 preset.
+        renderer: "glyph" for the cached sprite overlay, "textclip" for one TextClip per word.
+        threads: Encoder threads, defaults to all cores.
+        crf: libx264 constant rate factor, defaults to ffmpeg's choice.
+    """
+    final_clip = None
+    caption_clips = []
+    try:
+        print("Compositing video and captions...")
+        if renderer == "textclip":
+            caption_clips = build_caption_clips(words, video.h)
+            final_clip = CompositeVideoClip([video, *caption_clips])
+        else:
+            overlay = CaptionOverlay(words, video.size, caption_font_size(video.h))
+            final_clip = overlay.apply(video)
+
         print(f"Writing final video to: {output_path}...")
         final_clip.write_videofile(
             output_path,
@@ -156,14 +207,66 @@ def create_captions(video_path: str, output_directory: str = None) -> str:
             audio_codec='aac',    # Common audio codec
             temp_audiofile=f'{os.path.splitext(output_path)[0]}-temp-audio.m4a', # Explicit temp audio file
             remove_temp=True,
-            threads=os.cpu_count() or 4, # Use available cores
-            fps=video.fps,        # Maintain original FPS
-            preset='medium',      # Balance between speed and quality/size ('ultrafast', 'medium', 'slow')
+            threads=threads or os.cpu_count() or 4, # Use available cores
+            fps=fps,              # Maintain original FPS
+            preset=preset,        # Balance between speed and quality/size ('ultrafast', 'medium', 'slow')
+            ffmpeg_params=["-crf", str(crf)] if crf is not None else None,
             logger='bar'          # Show progress bar
         )
         print("Video writing complete.")
+    finally:
+        if final_clip is not None and final_clip is not video:
+            final_clip.close()
+        for clip in caption_clips:
+            if clip:
+                clip.close()
+
+
+# Ensure ffmpeg is installed and accessible in the system PATH.
+# You might need to install it separately (e.g., `brew install ffmpeg` on macOS, `sudo apt update && sudo apt install ffmpeg` on Debian/Ubuntu).
+def create_captions(video_path: str, output_directory: str = None, words: list = None, threads: int = None,
+                    preset: str = 'medium', crf: int = None, renderer: str = CAPTION_RENDERER) -> str:
+    """
+    Generates captions for a video, highlighting the currently spoken word,
+    and returns the path to the new video file.
+
+    Args:
+        video_path: Path to the input MP4 video file.
+        output_directory: Optional directory to save the output video. 
+                          Defaults to the same directory as the input video.
+        words: Optional known word timings ("word", "start", "end"). The video
+               is only transcribed with Whisper if they are missing.
+        threads: Encoder threads, defaults to all cores.
+        preset, crf: libx264 settings of the encode, see render_profiles.
+        renderer: Caption renderer, "glyph" or "textclip".
 
-        # 7. Return the output path
+    Returns:
+        The path to the newly created video file with captions.
+
+    Raises:
+        FileNotFoundError: If the input video file does not exist.
+        Exception: If any error occurs during transcription or video processing.
+    """
+    if not os.path.isfile(video_path):
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+
+    print(f"Loading video: {video_path}")
+    video = VideoFileClip(video_path)
+
+    try:
+        # 1. Extract audio and transcribe using Whisper, unless the timings are known
+        if words is None:
+            words = transcribe_clip_audio(video)
+        if not words:
+            print("Warning: No words with timestamps found in transcription. Skipping caption generation.")
+            return video_path
+
+        # 2. Draw captions onto the original video and write it
+        output_path = caption_output_path(video_path, output_directory)
+        write_captioned_video(video, words, output_path, fps=video.fps, preset=preset,
+                              renderer=renderer, threads=threads, crf=crf)
+
+        # 3. Return the output path
         return output_path
 
     except Exception as e:
@@ -172,23 +275,11 @@ def create_captions(video_path: str, output_directory: str = None) -> str:
         raise e
 
     finally:
-        # 8. Cleanup
+        # 4. Cleanup
         print("Cleaning up resources...")
         # Close clips to release resources
         if video:
             video.close()
-        if final_clip:
-            final_clip.close()
-        for clip in caption_clips:
-            if clip:
-                clip.close()
-        # Remove temporary audio file
-        if audio_path and os.path.exists(audio_path):
-            try:
-                os.remove(audio_path)
-                print(f"Removed temporary audio file: {audio_path}")
-            except OSError as ose:
-                print(f"Warning: Could not remove temporary audio file {audio_path}: {ose}")
         print("Cleanup finished.")
 
 # Example usage (optional, for testing - uncomment and provide a real path)
@@ -1,51 +1,19 @@
 import argparse
 import cv2
 import os
-import mediapipe as mp
 import numpy as np
-import math
 import datetime
+from video_processing.frame_selector import select_best_frame
 
 # --- Constants for Eye Aspect Ratio ---
 # Threshold: Adjust this value based on testing; higher means eyes must be wider open.
+# The landmarks and calculate_ear are shared in frame_analysis.
 EAR_THRESHOLD = 0.20
-# Indices for facial landmarks for left and right eyes based on Mediapipe Face Mesh
-# https://github.com/google/mediapipe/blob/master/mediapipe/modules/face_geometry/data/canonical_face_model_uv_visualization.png
-LEFT_EYE_INDICES = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
-RIGHT_EYE_INDICES = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
-# Points for EAR calculation (top, bottom, left, right corners)
-# Left eye: top, bottom, left_corner, right_corner
-LEFT_EAR_POINTS = [386, 374, 263, 362]
-# Right eye: top, bottom, left_corner, right_corner
-RIGHT_EAR_POINTS = [159, 145, 133, 33]
 # --------------------------------------
 
-def calculate_ear(eye_landmarks, frame_shape):
-    """Calculates the Eye Aspect Ratio (EAR) for a single eye."""
-    try:
-        # Get pixel coordinates from normalized landmarks
-        p1 = (eye_landmarks[0].x * frame_shape[1], eye_landmarks[0].y * frame_shape[0]) # Vertical point 1 (Top)
-        p2 = (eye_landmarks[1].x * frame_shape[1], eye_landmarks[1].y * frame_shape[0]) # Vertical point 2 (Bottom)
-        p3 = (eye_landmarks[2].x * frame_shape[1], eye_landmarks[2].y * frame_shape[0]) # Horizontal point 1 (Left corner)
-        p4 = (eye_landmarks[3].x * frame_shape[1], eye_landmarks[3].y * frame_shape[0]) # Horizontal point 2 (Right corner)
-
-        # Euclidean distance
-        vertical_dist = math.dist(p1, p2)
-        horizontal_dist = math.dist(p3, p4)
-
-        if horizontal_dist == 0:
-            return 0.0
-
-        ear = vertical_dist / horizontal_dist
-        return ear
-    except Exception as e:
-        print(f"Error calculating EAR: {e}")
-        return 0.0
-
-
 def extract_frame(video_path, quote):
     """
-    Loads a video, finds the first frame with open eyes, adds quote text.
+    Loads a video, finds the best frame with open eyes, adds quote text.
 
     Args:
         video_path (str): Path to the video file.
@@ -58,80 +26,11 @@ def extract_frame(video_path, quote):
         print(f"Error: Video file not found at {video_path}")
         return None
 
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print(f"Error: Could not open video file {video_path}")
-        return None
-
-    # Initialize Mediapipe Face Mesh
-    mp_face_mesh = mp.solutions.face_mesh
-    face_mesh = mp_face_mesh.FaceMesh(
-        max_num_faces=1, # Assume one primary face
-        refine_landmarks=True, # Get finer landmarks for eyes
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    )
-
-    selected_frame = None
-    frame_count = 0
-    max_frames_to_check = 1500 # Limit frames to check to avoid long processing
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            print("Reached end of video or cannot read frame.")
-            break
-
-        frame_count += 1
-        if frame_count > max_frames_to_check:
-            print(f"Stopped processing after checking {max_frames_to_check} frames.")
-            break
-
-        # Convert BGR frame to RGB for Mediapipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        # Process the frame
-        results = face_mesh.process(rgb_frame)
-
-        eyes_open = False
-        if results.multi_face_landmarks:
-            # Assume only one face detected (max_num_faces=1)
-            face_landmarks = results.multi_face_landmarks[0]
-            landmarks = face_landmarks.landmark
-            frame_shape = frame.shape # (h, w, c)
-
-            # Extract specific eye landmark points for EAR calculation
-            try:
-                left_eye_lm = [landmarks[i] for i in LEFT_EAR_POINTS]
-                right_eye_lm = [landmarks[i] for i in RIGHT_EAR_POINTS]
-
-                # Calculate EAR for both eyes
-                left_ear = calculate_ear(left_eye_lm, frame_shape)
-                right_ear = calculate_ear(right_eye_lm, frame_shape)
-
-                # Average EAR or check both eyes
-                avg_ear = (left_ear + right_ear) / 2.0
-
-                # Check if eyes are open based on threshold
-                if avg_ear > EAR_THRESHOLD:
-                    eyes_open = True
-                    print(f"Frame {frame_count}: Eyes detected as open (EAR: {avg_ear:.2f})")
-
-            except IndexError:
-                 print(f"Frame {frame_count}: Could not extract all required landmarks.")
-            except Exception as e:
-                 print(f"Frame {frame_count}: Error processing landmarks: {e}")
-
-
-        if eyes_open:
-            selected_frame = frame.copy() # Keep a copy of the selected frame
-            break # Exit loop once a suitable frame is found
-
-    # Release resources
-    cap.release()
-    face_mesh.close()
+    # Sparse search over downscaled candidates instead of decoding every frame
+    selected_frame, selected_time = select_best_frame(video_path, EAR_THRESHOLD)
 
     if selected_frame is None:
-        print("Could not find a frame with open eyes within the checked range.")
+        print("Could not find a frame with open eyes among the candidates.")
         return None
 
     # --- Add quote text to the selected frame ---
@@ -159,7 +58,7 @@ def extract_frame(video_path, quote):
     cv2.putText(selected_frame, quote, text_position, font, font_scale, color, thickness, line_type)
     # -------------------------------------------
 
-    print(f"Successfully extracted frame {frame_count} with open eyes and added quote.")
+    print(f"Successfully extracted frame at {selected_time:.2f}s with open eyes and added quote.")
     return selected_frame
 
 if __name__ == "__main__":
@@ -1,12 +1,15 @@
 import argparse
 import cv2
 import os
-import mediapipe as mp
 import numpy as np
-import math
-import datetime
+import hashlib
 import json
-import openai
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from openai_client import get_client, tracked_call
+from video_processing.frame_selector import select_best_frame
+from video_processing.shot_index import load_video_shots
+from video_processing.text_layout import get_text_measurer
 from PIL import Image, ImageDraw, ImageFont
 import base64
 from io import BytesIO
@@ -21,60 +24,26 @@ FONT_SIZE = 25 # Reduced font size from 40
 # -----------------------------------------------------------
 
 # --- Helper function for text wrapping by pixel width ---
-def wrap_text_by_width(text, font, max_width, draw):
-    """Wraps text to fit within a specific pixel width."""
-    lines = []
-    if not text:
-        return lines
-
-    words = text.split()
-    current_line = ""
-
-    for word in words:
-        # Check width of potential new line
-        test_line = f"{current_line} {word}".strip()
-        # Use textbbox for more accurate width calculation
-        bbox = draw.textbbox((0, 0), test_line, font=font)
-        line_width = bbox[2] - bbox[0]
-
-        if line_width <= max_width:
-            current_line = test_line
-        else:
-            # Add the previous line if it wasn't empty
-            if current_line:
-                lines.append(current_line)
-            # Start new line with the current word
-            current_line = word
-            # Check if the single word itself is too long (optional: could split the word)
-            bbox = draw.textbbox((0, 0), current_line, font=font)
-            word_width = bbox[2] - bbox[0]
-            if word_width > max_width:
-                # Handle very long words if necessary (e.g., hyphenate or just let it overflow)
-                print(f"Warning: Word '{word}' is wider than max_width.")
-
-    # Add the last line
-    if current_line:
-        lines.append(current_line)
-
-    return lines
+def wrap_text_by_width(text, font, max_width, draw=None):
+    """Wraps text to fit within a specific pixel width (measurements are cached per font, see text_layout)."""
+    return get_text_measurer(font).wrap(text, max_width)
 # ---------------------------------------------------------
 
 # --- Constants for Eye Aspect Ratio ---
 # Threshold: Adjust this value based on testing; higher means eyes must be wider open.
+# The landmarks and calculate_ear are shared in frame_analysis.
 EAR_THRESHOLD = 0.32
-# Indices for facial landmarks for left and right eyes based on Mediapipe Face Mesh
-# https://github.com/google/mediapipe/blob/master/mediapipe/modules/face_geometry/data/canonical_face_model_uv_visualization.png
-LEFT_EYE_INDICES = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
-RIGHT_EYE_INDICES = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
-# Points for EAR calculation (top, bottom, left, right corners)
-# Left eye: top, bottom, left_corner, right_corner
-LEFT_EAR_POINTS = [386, 374, 263, 362]
-# Right eye: top, bottom, left_corner, right_corner
-RIGHT_EAR_POINTS = [159, 145, 133, 33]
 # --------------------------------------
 
+TITLE_MODEL = "gpt-3.5-turbo"
+IMAGE_EDIT_MODEL = "gpt-image-1"
+THUMBNAIL_DIR = "./output/tiktok/"
+# Titles and edited images by (frame hash, model, prompt), reruns make no requests
+THUMBNAIL_CACHE_DIR = os.path.join("intermediate", "thumbnail_cache")
+# Concurrent title and image edit requests of the thumbnail batch
+MAX_THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "8"))
+
 # NOTE: Ensure OPENAI_API_KEY environment variable is set.
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 def find_quotes_recursively(data):
     """Recursively searches for 'quote' keys in nested JSON data (dicts/lists)."""
@@ -90,44 +59,17 @@ def find_quotes_recursively(data):
             quotes.extend(find_quotes_recursively(item))
     return quotes
 
-def calculate_ear(eye_landmarks, frame_shape):
-    """Calculates the Eye Aspect Ratio (EAR) for a single eye."""
-    try:
-        # Get pixel coordinates from normalized landmarks
-        p1 = (eye_landmarks[0].x * frame_shape[1], eye_landmarks[0].y * frame_shape[0]) # Vertical point 1 (Top)
-        p2 = (eye_landmarks[1].x * frame_shape[1], eye_landmarks[1].y * frame_shape[0]) # Vertical point 2 (Bottom)
-        p3 = (eye_landmarks[2].x * frame_shape[1], eye_landmarks[2].y * frame_shape[0]) # Horizontal point 1 (Left corner)
-        p4 = (eye_landmarks[3].x * frame_shape[1], eye_landmarks[3].y * frame_shape[0]) # Horizontal point 2 (Right corner)
-
-        # Euclidean distance
-        vertical_dist = math.dist(p1, p2)
-        horizontal_dist = math.dist(p3, p4)
-
-        if horizontal_dist == 0:
-            return 0.0
-
-        ear = vertical_dist / horizontal_dist
-        return ear
-    except Exception as e:
-        print(f"Error calculating EAR: {e}")
-        return 0.0
-
-
-def extract_frame(t_name,video_path, json_path,client):
+def load_spoken_text(json_path):
     """
-    Loads a video, finds the first frame with open eyes, reads spoken text from
-    a potentially nested JSON file by finding all 'quote' keys, generates a catchy
-    quote using OpenAI, and adds it to the frame.
+    Reads the spoken text of a topic from a potentially nested JSON file by
+    concatenating all 'quote' keys.
 
     Args:
-        video_path (str): Path to the video file.
         json_path (str): Path to the .json file containing potentially nested quotes.
 
     Returns:
-        numpy.ndarray: The extracted video frame with quote, or None if not found/error.
+        str: The spoken text, or None if not found/error.
     """
-    # --- Read spoken text from JSON file (recursive search) ---
-    spoken_text = ""
     try:
         with open(json_path, 'r') as f:
             # Load the entire file as a single JSON object
@@ -135,157 +77,238 @@ def extract_frame(t_name,video_path, json_path,client):
             # Recursively find all quotes
             all_quotes = find_quotes_recursively(data)
             if all_quotes:
-                spoken_text = " ".join(all_quotes) # Concatenate quotes
-            else:
-                print(f"Warning: No 'quote' keys found in {json_path}")
-                return None # Or handle differently if needed
+                return " ".join(all_quotes) # Concatenate quotes
+            print(f"Warning: No 'quote' keys found in {json_path}")
+            return None # Or handle differently if needed
 
     except FileNotFoundError:
         print(f"Error: JSON file not found at {json_path}")
-        return None
     except json.JSONDecodeError:
         print(f"Error: Could not decode JSON from {json_path}. Is it valid JSON?")
-        return None
     except Exception as e:
         print(f"Error reading or processing JSON file {json_path}: {e}")
-        return None
-    # --- Generate catchy quote using OpenAI ---
-    catchy_quote = "Video Thumbnail" # Default fallback
-    if spoken_text and openai.api_key:
-        try:
-            # prompt = f"Gib mir einen eingängigen und polarisierenden Satz auf Deutsch (max. 10 Wörter), der sich aus diesem Text ergibt: {spoken_text}." # Old German prompt
-            prompt = f"Gib mir einen eingängigen und polarisierenden Satz auf Deutsch (max. 8 Wörter), der sich aus diesem Text ergibt: {spoken_text}." # New German prompt (max 8 words)
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo", # Or another suitable model like gpt-4
-                messages=[
-                    {"role": "system", "content": "Du bist ein Assistent, der eingängige und polarisierende Video-Thumbnail-Titel auf Deutsch mit maximal 8 Wörtern erstellt." }, # Updated German system message
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=20, # Reduced max_tokens slightly for shorter output
-                temperature=0.8,
-                n=1,
-                stop=None,
-            )
-            if response.choices:
-                catchy_quote = response.choices[0].message.content.strip().strip('"')
-                print(f"Generated catchy quote: {catchy_quote}")
-            else:
-                 print("Warning: OpenAI did not return a quote.")
+    return None
+
+def cache_key(frame_hash, model, prompt):
+    """Key of a cached API result: hash of the input frame (empty for text only requests), model and prompt."""
+    payload = json.dumps([frame_hash, model, prompt], ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+def frame_hash(frame):
+    """Hash of the pixels of a frame, the same frame of a re-rendered short hits the cache."""
+    digest = hashlib.sha256(str(frame.shape).encode())
+    digest.update(np.ascontiguousarray(frame).tobytes())
+    return digest.hexdigest()
+
+def _write_file(path, data):
+    """Write to a temporary file and rename it, so readers never see partial files."""
+    tmp_path = f"{path}.{threading.get_ident()}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def generate_title(client, spoken_text, cache_dir=THUMBNAIL_CACHE_DIR):
+    """
+    Generates a catchy German title for the thumbnail from the spoken text, cached by prompt.
+    Only the disabled text overlay of extract_frame draws it.
 
-        except Exception as e:
-            print(f"Error calling OpenAI API: {e}")
-            print("Using default quote.")
-    elif not openai.api_key:
-        print("Warning: OPENAI_API_KEY not set. Using default quote.")
-    else:
+    Returns:
+        str: The title, "Video Thumbnail" if none could be generated
+    """
+    catchy_quote = "Video Thumbnail" # Default fallback
+    if not spoken_text:
         print("Using default quote as no spoken text was found.")
+        return catchy_quote
+    if not os.getenv("OPENAI_API_KEY"):
+        print("Warning: OPENAI_API_KEY not set. Using default quote.")
+        return catchy_quote
+
+    # prompt = f"Gib mir einen eingängigen und polarisierenden Satz auf Deutsch (max. 10 Wörter), der sich aus diesem Text ergibt: {spoken_text}." # Old German prompt
+    prompt = f"Gib mir einen eingängigen und polarisierenden Satz auf Deutsch (max. 8 Wörter), der sich aus diesem Text ergibt: {spoken_text}." # New German prompt (max 8 words)
+    path = os.path.join(cache_dir, cache_key("", TITLE_MODEL, prompt) + ".json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            catchy_quote = json.load(f)["title"]
+        print(f"Using cached catchy quote: {catchy_quote}")
+        return catchy_quote
+    try:
+        response = tracked_call(
+            "thumbnail_title",
+            client.chat.completions.create,
+            model=TITLE_MODEL, # Or another suitable model like gpt-4
+            messages=[
+                {"role": "system", "content": "Du bist ein Assistent, der eingängige und polarisierende Video-Thumbnail-Titel auf Deutsch mit maximal 8 Wörtern erstellt." }, # Updated German system message
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=20, # Reduced max_tokens slightly for shorter output
+            temperature=0.8,
+            n=1,
+            stop=None,
+        )
+        if response.choices:
+            catchy_quote = response.choices[0].message.content.strip().strip('"')
+            print(f"Generated catchy quote: {catchy_quote}")
+            os.makedirs(cache_dir, exist_ok=True)
+            _write_file(path, json.dumps({"title": catchy_quote}, ensure_ascii=False).encode("utf-8"))
+        else:
+             print("Warning: OpenAI did not return a quote.")
 
+    except Exception as e:
+        print(f"Error calling OpenAI API: {e}")
+        print("Using default quote.")
+    return catchy_quote
 
-    if not os.path.exists(video_path):
-        print(f"Error: Video file not found at {video_path}")
-        return None
-
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print(f"Error: Could not open video file {video_path}")
-        return None
+def edit_frame(client, frame, spoken_text, cache_dir=THUMBNAIL_CACHE_DIR):
+    """
+    Turns a BGR video frame into a thumbnail with the image edit API, cached by (frame hash, prompt).
 
-    # Initialize Mediapipe Face Mesh
-    mp_face_mesh = mp.solutions.face_mesh
-    face_mesh = mp_face_mesh.FaceMesh(
-        max_num_faces=1, # Assume one primary face
-        refine_landmarks=True, # Get finer landmarks for eyes
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
+    Returns:
+        bytes: The PNG of the thumbnail
+    """
+    prompt = f"Out of the following text, return up to five words that describe the content, are catchy and can be used to be placed on top of the image we provide you in order to generate a thumbnail for a youtube shorts about a discussion in the german parliament.: {spoken_text}." # New German prompt (max 8 words)
+    path = os.path.join(cache_dir, cache_key(frame_hash(frame), IMAGE_EDIT_MODEL, prompt) + ".png")
+    if os.path.exists(path):
+        print(f"Using cached thumbnail {os.path.basename(path)[:12]}")
+        with open(path, "rb") as f:
+            return f.read()
+
+    # Convert OpenCV BGR image to Pillow RGB image
+    pil_image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    pil_buffer = BytesIO()
+    pil_image.save(pil_buffer, format="PNG")  # Save in memory as PNG
+    pil_buffer.seek(0)  # Important! Move to the start of the BytesIO buffer
+    pil_buffer.name = "image.png"
+    result = tracked_call(
+        "thumbnail_image_edit",
+        client.images.edit,
+        model=IMAGE_EDIT_MODEL,
+        image=[
+            pil_buffer
+        ],
+        prompt=prompt
     )
+    image_bytes = base64.b64decode(result.data[0].b64_json)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_file(path, image_bytes)
+    return image_bytes
 
-    selected_frame = None
-    frame_count = 0
-    max_frames_to_check = 1500 # Limit frames to check to avoid long processing
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            print("Reached end of video or cannot read frame.")
-            break
-
-        frame_count += 1
-        if frame_count > max_frames_to_check:
-            print(f"Stopped processing after checking {max_frames_to_check} frames.")
-            break
-
-        # Convert BGR frame to RGB for Mediapipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        # Process the frame
-        results = face_mesh.process(rgb_frame)
-
-        eyes_open = False
-        if results.multi_face_landmarks:
-            # Assume only one face detected (max_num_faces=1)
-            face_landmarks = results.multi_face_landmarks[0]
-            landmarks = face_landmarks.landmark
-            frame_shape = frame.shape # (h, w, c)
-
-            # Extract specific eye landmark points for EAR calculation
-            try:
-                left_eye_lm = [landmarks[i] for i in LEFT_EAR_POINTS]
-                right_eye_lm = [landmarks[i] for i in RIGHT_EAR_POINTS]
-
-                # Calculate EAR for both eyes
-                left_ear = calculate_ear(left_eye_lm, frame_shape)
-                right_ear = calculate_ear(right_eye_lm, frame_shape)
+def short_shots(video_path):
+    """
+    Shots of a rendered short, the thumbnail candidates are taken inside them.
+    They are mapped from the session shot index when the short is rendered (see
+    shot_index.timeline_shots), the short itself is never decoded for them.
+    None (search the whole video) if the short has no stored shots.
+    """
+    try:
+        shots = load_video_shots(video_path)
+    except Exception as e:
+        print(f"Warning: Could not read the shots of {video_path}: {e}")
+        return None
+    if shots is None:
+        print(f"No stored shots of {video_path}, searching the whole video")
+    return shots
+
+def thumbnail_path(t_name, output_dir=THUMBNAIL_DIR):
+    return os.path.join(output_dir, f"thumbnail_{t_name}.png")
+
+def write_thumbnail(client, t_name, frame, spoken_text, output_dir=THUMBNAIL_DIR, cache_dir=THUMBNAIL_CACHE_DIR):
+    """Edits the frame of a topic and writes its thumbnail, returns the path."""
+    image_bytes = edit_frame(client, frame, spoken_text, cache_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    fn = thumbnail_path(t_name, output_dir)
+    _write_file(fn, image_bytes)
+    print(fn)
+    return fn
+
+def create_thumbnails(client, topics, output_dir=THUMBNAIL_DIR, max_workers=MAX_THUMBNAIL_WORKERS,
+                      cache_dir=THUMBNAIL_CACHE_DIR):
+    """
+    Creates the thumbnails of many rendered shorts at once.
 
-                # Average EAR or check both eyes
-                avg_ear = (left_ear + right_ear) / 2.0
+    Every image edit request starts as soon as the frame of its topic is selected (in this
+    thread, with warm detectors). Each thumbnail is written when its request completes;
+    results are cached, so a rerun makes no requests. No title is requested, the text
+    overlay it was drawn with is disabled (see extract_frame and generate_title).
 
-                # Check if eyes are open based on threshold
-                if avg_ear > EAR_THRESHOLD:
-                    eyes_open = True
-                    print(f"Frame {frame_count}: Eyes detected as open (EAR: {avg_ear:.2f})")
+    Args:
+        client: OpenAI client
+        topics (list): (t_name, video_path, json_path) per topic
+        output_dir (str): Directory of the thumbnails
+        max_workers (int): Maximum number of concurrent API requests
+        cache_dir (str): Directory of the image edit cache
 
-            except IndexError:
-                 print(f"Frame {frame_count}: Could not extract all required landmarks.")
+    Returns:
+        dict: t_name -> {"thumbnail": path or None}
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for t_name, video_path, json_path in topics:
+            spoken_text = load_spoken_text(json_path)
+            if spoken_text is None:
+                continue
+            results[t_name] = {"thumbnail": None}
+            if not os.path.exists(video_path):
+                print(f"Error: Video file not found at {video_path}")
+                continue
+            # Sparse search over downscaled candidates instead of decoding every frame
+            selected_frame, selected_time = select_best_frame(video_path, EAR_THRESHOLD, shots=short_shots(video_path))
+            if selected_frame is None:
+                print(f"Could not find a frame with open eyes among the candidates of {t_name}.")
+                continue
+            print(f"Selected frame of {t_name} at {selected_time:.2f}s")
+            future = executor.submit(write_thumbnail, client, t_name, selected_frame, spoken_text,
+                                     output_dir, cache_dir)
+            futures[future] = ("thumbnail", t_name)
+
+        for future in as_completed(futures):
+            kind, t_name = futures[future]
+            try:
+                results[t_name][kind] = future.result()
             except Exception as e:
-                 print(f"Frame {frame_count}: Error processing landmarks: {e}")
+                print(f"Error creating the {kind} of {t_name}: {e}")
+    return results
 
+def extract_frame(t_name,video_path, json_path,client):
+    """
+    Loads a video, finds the best frame with open eyes, reads spoken text from
+    a potentially nested JSON file by finding all 'quote' keys and turns the frame
+    into a thumbnail. The catchy quote overlay is disabled.
 
-        if eyes_open:
-            selected_frame = frame.copy() # Keep a copy of the selected frame
-            break # Exit loop once a suitable frame is found
+    Single topic version of create_thumbnails, the requests are cached the same way.
 
-    # Release resources
-    cap.release()
-    face_mesh.close()
+    Args:
+        video_path (str): Path to the video file.
+        json_path (str): Path to the .json file containing potentially nested quotes.
+
+    Returns:
+        numpy.ndarray: The extracted video frame with quote, or None if not found/error.
+    """
+    # --- Read spoken text from JSON file (recursive search) ---
+    spoken_text = load_spoken_text(json_path)
+    if spoken_text is None:
+        return None
+    if not os.path.exists(video_path):
+        print(f"Error: Video file not found at {video_path}")
+        return None
+
+    # Sparse search over downscaled candidates instead of decoding every frame
+    selected_frame, selected_time = select_best_frame(video_path, EAR_THRESHOLD, shots=short_shots(video_path))
 
     if selected_frame is None:
-        print("Could not find a frame with open eyes within the checked range.")
+        print("Could not find a frame with open eyes among the candidates.")
         return None
 
     # --- Add quote text to the selected frame using Pillow ---
     try:
         # Convert OpenCV BGR image to Pillow RGB image
         pil_image = Image.fromarray(cv2.cvtColor(selected_frame, cv2.COLOR_BGR2RGB))
-        pil_buffer = BytesIO()
-        pil_image.save(pil_buffer, format="PNG")  # Save in memory as PNG
-        pil_buffer.seek(0)  # Important! Move to the start of the BytesIO buffer
-        pil_buffer.name = "image.png"
-        prompt = f"Out of the following text, return up to five words that describe the content, are catchy and can be used to be placed on top of the image we provide you in order to generate a thumbnail for a youtube shorts about a discussion in the german parliament.: {spoken_text}." # New German prompt (max 8 words)
-        result = client.images.edit(
-            model="gpt-image-1",
-            image=[
-                pil_buffer
-            ],
-            prompt=prompt
-        )
-        image_base64 = result.data[0].b64_json
-        image_bytes = base64.b64decode(image_base64)
-
-        # Save the image to a file
-        fn ="./output/tiktok/thumbnail_" +t_name+".png"
-        print(fn)
-        with open(fn, "wb") as f:
-            f.write(image_bytes)
+        write_thumbnail(client, t_name, selected_frame, spoken_text)
+        # The text overlay below is disabled, the image edit model places the words on the thumbnail
         '''
+        # --- Generate catchy quote using OpenAI, only needed for the overlay ---
+        catchy_quote = generate_title(client, spoken_text)
+
         draw = ImageDraw.Draw(pil_image)
 
         # Load the TrueType font
@@ -320,19 +343,15 @@ def extract_frame(t_name,video_path, json_path,client):
                  return selected_frame # Or handle error
 
             # Calculate line height and total text block height
-            # Use a sample character or the first line for line height
-            line_bbox = draw.textbbox((0,0), wrapped_lines[0], font=font)
-            line_height = line_bbox[3] - line_bbox[1]
+            # Use the first line for line height
+            measurer = get_text_measurer(font)
+            line_height = measurer.line_height(wrapped_lines[0])
             line_spacing_factor = 1.2 # Add a little space between lines
             total_text_height = len(wrapped_lines) * line_height * line_spacing_factor - (line_height * (line_spacing_factor - 1)) # Subtract extra spacing after last line
 
             # Calculate dimensions of the widest line for the background
-            max_line_width = 0
-            for line in wrapped_lines:
-                line_bbox = draw.textbbox((0, 0), line, font=font)
-                line_width = line_bbox[2] - line_bbox[0]
-                if line_width > max_line_width:
-                    max_line_width = line_width
+            # Cached from the wrapping
+            max_line_width = max(measurer.text_width(line) for line in wrapped_lines)
 
             # Position text block at bottom-left with padding
             text_x = int(w * 0.05)
@@ -378,37 +397,22 @@ def extract_frame(t_name,video_path, json_path,client):
         print(f"Error during text drawing with Pillow: {e}")
         # Decide how to handle this - skip text? return None?
 
-    # print(f"Successfully extracted frame {frame_count} with open eyes and added quote.")
+    # print(f"Successfully extracted frame at {selected_time:.2f}s with open eyes and added quote.")
     # return selected_frame
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='Extract a frame from a video.')
+    parser = argparse.ArgumentParser(description='Create the thumbnails of rendered shorts.')
     parser.add_argument('video_path', type=str, help='Path to the video file.')
     parser.add_argument('json_path', type=str, help='Path to the .json file containing potentially nested quotes.')
-    parser.add_argument('--output_dir', type=str, default='img/output', help='Directory to save the extracted frame (default: img/output).')
+    parser.add_argument('--name', type=str, default=None, help='Topic name used in the thumbnail filename (default: video filename).')
+    parser.add_argument('--output_dir', type=str, default=THUMBNAIL_DIR, help='Directory to save the thumbnail (default: %(default)s).')
 
     args = parser.parse_args()
 
-    # Call the function to extract the frame
-    extracted_frame = extract_frame(args.video_path, args.json_path)
-
-    if extracted_frame is not None:
-        # Ensure the output directory exists
-        os.makedirs(args.output_dir, exist_ok=True)
+    t_name = args.name or os.path.splitext(os.path.basename(args.video_path))[0]
+    results = create_thumbnails(get_client(), [(t_name, args.video_path, args.json_path)], output_dir=args.output_dir)
 
-        # Create a timestamp string
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        # Get base video filename without extension
-        video_basename = os.path.splitext(os.path.basename(args.video_path))[0]
-        # Construct filename: videoname_timestamp_frame.jpg
-        output_filename = os.path.join(args.output_dir, f"{video_basename}_{timestamp}_frame.jpg")
-
-        # Save the frame
-        try:
-            cv2.imwrite(output_filename, extracted_frame)
-            print(f"Frame successfully saved as {output_filename}")
-        except Exception as e:
-            print(f"Error saving frame: {e}")
-            print("Failed to save frame.")
+    if results.get(t_name, {}).get("thumbnail"):
+        print(f"Thumbnail successfully saved as {results[t_name]['thumbnail']}")
     else:
-        print("Failed to extract frame.")
+        print("Failed to create thumbnail.")
@@ -0,0 +1,346 @@
+import json
+import re
+import subprocess
+import time
+
+import numpy as np
+
+from video_processing.render_profiles import scale_dimensions
+
+# Aspect ratio of the shorts, same as crop_video in blue_box
+TARGET_WIDTH = 600
+TARGET_HEIGHT = 945
+FPS = 50
+AUDIO_RATE = 44100
+# Keyframes per second of the face-tracked crop expression, the trajectory is already smooth
+KEYFRAMES_PER_SECOND = 2
+
+
+def probe_dimensions(path: str) -> tuple:
+    """
+    Get the width and height of the first video stream of a video or image file.
+
+    Args:
+        path (str): Path to the media file
+
+    Returns:
+        tuple: (width, height)
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height",
+        "-of", "json",
+        path
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    stream = json.loads(result.stdout)["streams"][0]
+    return stream["width"], stream["height"]
+
+
+def probe_duration(path: str) -> float:
+    """
+    Get the duration of a media file in seconds.
+
+    Args:
+        path (str): Path to the media file
+
+    Returns:
+        float: Duration in seconds
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "json",
+        path
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return float(json.loads(result.stdout)["format"]["duration"])
+
+
+def probe_has_audio(path: str) -> bool:
+    """Check if a media file has an audio stream."""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "a",
+        "-show_entries", "stream=index",
+        "-of", "json",
+        path
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return bool(json.loads(result.stdout).get("streams"))
+
+
+def _silence_input(segment: dict) -> list:
+    """
+    Input arguments of a silent track as long as a clip without audio, so the clip still
+    has an audio stream for the concat filter (moviepy fills such clips with silence too).
+    """
+    duration = segment.get("duration") or probe_duration(segment["path"])
+    return ["-f", "lavfi", "-t", f"{duration:.3f}", "-i", f"anullsrc=r={AUDIO_RATE}:cl=stereo"]
+
+
+def output_dimensions(timeline: list, max_height: int = None) -> tuple:
+    """
+    Compute the output size of a timeline the same way blue_box does: every segment is
+    center-cropped to the 600:945 aspect ratio at full height and the narrowest crop wins.
+    The size is rounded down to even numbers, which libx264 with yuv420p requires.
+
+    Args:
+        timeline (list): Timeline segments
+        max_height (int): Optional height limit of the render profile
+
+    Returns:
+        tuple: (width, height)
+    """
+    smallest_dims = (float("inf"), float("inf"))
+    for segment in timeline:
+        _, height = probe_dimensions(segment["path"] if segment["type"] == "clip" else segment["image"])
+        new_width = int(height * TARGET_WIDTH / TARGET_HEIGHT)
+        if smallest_dims[0] > new_width:
+            smallest_dims = (new_width, height)
+    return scale_dimensions(smallest_dims, max_height)
+
+
+def _filter_path(path: str) -> str:
+    """File path for a quoted filter option value (quoted values need forward slashes)."""
+    if "'" in path:
+        raise ValueError(f"Path cannot be used in a filtergraph: {path}")
+    return path.replace("\\", "/")
+
+
+def crop_x_expression(trajectory: dict, keyframes_per_second: float = KEYFRAMES_PER_SECOND) -> str:
+    """
+    Turn a trajectory into an x expression for ffmpeg's crop filter: a piecewise linear
+    function of t between keyframes, clamped to the frame.
+
+    Args:
+        trajectory (dict): Crop centers over time, see reframe.crop_trajectory
+        keyframes_per_second (float): Keyframe rate, the trajectory is already smooth
+
+    Returns:
+        str: Expression using t, iw and ow (contains commas, needs quoting in a filtergraph)
+    """
+    times = np.asarray(trajectory["times"], dtype=np.float64)
+    centers = np.asarray(trajectory["centers"], dtype=np.float64)
+    if len(times) == 0:
+        return "(iw-ow)/2"
+    if len(times) > 1:
+        key_times = np.arange(0.0, times[-1], 1.0 / keyframes_per_second)
+        key_times = np.append(key_times, times[-1])
+        centers = np.interp(key_times, times, centers)
+        times = key_times
+
+    # Constant before the first and after the last keyframe
+    terms = [f"lt(t,{times[0]:.3f})*{centers[0]:.4f}", f"gte(t,{times[-1]:.3f})*{centers[-1]:.4f}"]
+    for t0, t1, c0, c1 in zip(times[:-1], times[1:], centers[:-1], centers[1:]):
+        slope = (c1 - c0) / (t1 - t0)
+        terms.append(f"gte(t,{t0:.3f})*lt(t,{t1:.3f})*({c0:.4f}+(t-{t0:.3f})*{slope:.5f})")
+    center = "+".join(terms)
+    return f"clip(({center})*iw-ow/2,0,iw-ow)"
+
+
+
+def _crop_filter(segment: dict) -> str:
+    """Crop to the 600:945 aspect ratio at full height, following the face trajectory of the segment if it has one."""
+    crop_width = f"trunc(ih*{TARGET_WIDTH}/{TARGET_HEIGHT})"
+    if not segment.get("trajectory"):
+        return f"crop={crop_width}:ih"
+    return f"crop=w={crop_width}:h=ih:x='{crop_x_expression(segment['trajectory'])}':y=0"
+
+
+def _audio_chain(segment: dict, audio_in: str, label: str) -> str:
+    """Filter that brings the audio of a segment to the common format (and length)."""
+    audio_filter = "anull"
+    if segment["type"] == "image":
+        duration = segment["duration"]
+        audio_filter = f"atrim=0:{duration:.3f},apad=whole_dur={duration:.3f}"
+    return (
+        f"[{audio_in}]{audio_filter},aresample={AUDIO_RATE},"
+        f"aformat=sample_fmts=fltp:channel_layouts=stereo[{label}]"
+    )
+
+
+def build_render_command(timeline: list, output_path: str, dims: tuple, fps: int = FPS,
+                         preset: str = "medium", threads: int = None,
+                         subtitles_path: str = None, crf: int = None) -> list:
+    """
+    Compile a timeline into a single ffmpeg command with one filter_complex.
+
+    Timeline segments are dicts of one of the types:
+        {"type": "clip", "path": str, "trajectory": dict or None}
+        {"type": "image", "image": str, "audio": str, "duration": float, "fade_out": float}
+
+    Args:
+        timeline (list): Timeline segments in playback order
+        output_path (str): Path of the rendered video
+        dims (tuple): Output (width, height)
+        fps (int): Output frame rate
+        preset (str): libx264 preset
+        threads (int): Number of encoder threads, defaults to ffmpeg's choice
+        subtitles_path (str): Optional .ass file that is burned in during the same encode
+        crf (int): libx264 constant rate factor, defaults to ffmpeg's choice
+
+    Returns:
+        list: The ffmpeg command
+    """
+    width, height = dims
+    inputs = []
+    filters = []
+    concat_inputs = ""
+    input_idx = 0
+
+    for n, segment in enumerate(timeline):
+        crop = f"{_crop_filter(segment)},scale={width}:{height},setsar=1,fps={fps}"
+        if segment["type"] == "clip":
+            inputs += ["-i", segment["path"]]
+            video_in, audio_in = f"{input_idx}:v", f"{input_idx}:a"
+            input_idx += 1
+            if not probe_has_audio(segment["path"]):
+                inputs += _silence_input(segment)
+                audio_in = f"{input_idx}:a"
+                input_idx += 1
+            video_filter = crop
+        else:
+            duration = segment["duration"]
+            inputs += ["-loop", "1", "-framerate", str(fps), "-t", f"{duration:.3f}", "-i", segment["image"]]
+            inputs += ["-i", segment["audio"]]
+            video_in, audio_in = f"{input_idx}:v", f"{input_idx + 1}:a"
+            input_idx += 2
+            video_filter = crop
+            fade_out = segment.get("fade_out")
+            if fade_out:
+                video_filter += f",fade=t=out:st={max(duration - fade_out, 0):.3f}:d={fade_out}"
+
+        filters.append(f"[{video_in}]{video_filter},format=yuv420p[v{n}]")
+        filters.append(_audio_chain(segment, audio_in, f"a{n}"))
+        concat_inputs += f"[v{n}][a{n}]"
+
+    if subtitles_path:
+        filters.append(f"{concat_inputs}concat=n={len(timeline)}:v=1:a=1[catv][outa]")
+        filters.append(f"[catv]ass=filename='{_filter_path(subtitles_path)}'[outv]")
+    else:
+        filters.append(f"{concat_inputs}concat=n={len(timeline)}:v=1:a=1[outv][outa]")
+
+    cmd = ["ffmpeg", "-y", *inputs, "-filter_complex", ";".join(filters),
+           "-map", "[outv]", "-map", "[outa]",
+           "-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p",
+           "-c:a", "aac"]
+    if crf is not None:
+        cmd += ["-crf", str(crf)]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd.append(output_path)
+    return cmd
+
+
+def render_timeline_audio(timeline: list, output_path: str) -> str:
+    """
+    Render only the soundtrack of a timeline, e.g. to transcribe it before the video is encoded.
+
+    Args:
+        timeline (list): Timeline segments, see build_render_command
+        output_path (str): Path of the audio file (.wav)
+
+    Returns:
+        str: Path to the rendered audio
+    """
+    inputs = []
+    filters = []
+    concat_inputs = ""
+    for n, segment in enumerate(timeline):
+        if segment["type"] == "clip" and not probe_has_audio(segment["path"]):
+            inputs += _silence_input(segment)
+        else:
+            inputs += ["-i", segment["path"] if segment["type"] == "clip" else segment["audio"]]
+        filters.append(_audio_chain(segment, f"{n}:a", f"a{n}"))
+        concat_inputs += f"[a{n}]"
+    filters.append(f"{concat_inputs}concat=n={len(timeline)}:v=0:a=1[outa]")
+
+    cmd = ["ffmpeg", "-y", *inputs, "-filter_complex", ";".join(filters),
+           "-map", "[outa]", "-c:a", "pcm_s16le", output_path]
+    subprocess.run(cmd, check=True)
+    return output_path
+
+
+def render_timeline(timeline: list, output_path: str, fps: int = FPS, preset: str = "medium",
+                    threads: int = None, subtitles_path: str = None, crf: int = None,
+                    max_height: int = None) -> str:
+    """
+    Render a timeline with a single ffmpeg process instead of decoding every clip through moviepy.
+
+    Args:
+        timeline (list): Timeline segments, see build_render_command
+        output_path (str): Path of the rendered video
+        fps (int): Output frame rate
+        preset (str): libx264 preset
+        threads (int): Number of encoder threads
+        subtitles_path (str): Optional .ass captions to burn in during the same encode
+        crf (int): libx264 constant rate factor
+        max_height (int): Output height limit, e.g. of the preview profile
+
+    Returns:
+        str: Path to the rendered video
+    """
+    if not output_path.endswith(".mp4"):
+        raise ValueError(f"Output path must be an .mp4 file: {output_path}")
+    if not timeline:
+        raise ValueError("Cannot render an empty timeline")
+
+    dims = output_dimensions(timeline, max_height)
+    cmd = build_render_command(timeline, output_path, dims, fps=fps, preset=preset, threads=threads,
+                               subtitles_path=subtitles_path, crf=crf)
+
+    print(f"Rendering {len(timeline)} segments at {dims[0]}x{dims[1]} with ffmpeg into {output_path}")
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True)
+    print(f"ffmpeg render finished in {time.perf_counter() - start:.1f}s")
+    return output_path
+
+
+def compare_renders(reference_path: str, candidate_path: str) -> dict:
+    """
+    Compare two renders frame by frame with ffmpeg's PSNR filter, e.g. the moviepy
+    and the ffmpeg backend output of the same timeline.
+
+    Args:
+        reference_path (str): Path to the reference video
+        candidate_path (str): Path to the video to compare
+
+    Returns:
+        dict: Average and minimum PSNR over all frames in dB
+    """
+    cmd = [
+        "ffmpeg",
+        "-i", reference_path,
+        "-i", candidate_path,
+        "-lavfi", "[1:v][0:v]scale2ref[cand][ref];[ref][cand]psnr=stats_file=-",
+        "-f", "null", "-"
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+    frame_values = [
+        float(value) for value in re.findall(r"psnr_avg:(\S+)", result.stdout)
+        if value != "inf"
+    ]
+    average = re.search(r"PSNR .*average:(\S+)", result.stderr)
+    return {
+        "frames": len(re.findall(r"psnr_avg:", result.stdout)),
+        "average": float(average.group(1)) if average and average.group(1) != "inf" else float("inf"),
+        "minimum": min(frame_values) if frame_values else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare a moviepy and an ffmpeg render of the same short frame by frame.")
+    parser.add_argument("reference", help="Path to the reference render (e.g. moviepy backend)")
+    parser.add_argument("candidate", help="Path to the render to compare (e.g. ffmpeg backend)")
+    args = parser.parse_args()
+
+    psnr = compare_renders(args.reference, args.candidate)
+    print(f"Compared {psnr['frames']} frames: average PSNR {psnr['average']:.2f} dB, minimum {psnr['minimum']:.2f} dB")
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import math
+import os
+import subprocess
+import threading
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from video_processing.ffmpeg_renderer import probe_dimensions
+
+# --- Constants for Eye Aspect Ratio ---
+# Indices for facial landmarks for left and right eyes based on Mediapipe Face Mesh
+# https://github.com/google/mediapipe/blob/master/mediapipe/modules/face_geometry/data/canonical_face_model_uv_visualization.png
+LEFT_EYE_INDICES = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
+RIGHT_EYE_INDICES = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
+# Points for EAR calculation
+# Left eye: top, bottom, left_corner, right_corner
+LEFT_EAR_POINTS = [386, 374, 263, 362]
+# Right eye: top, bottom, left_corner, right_corner
+RIGHT_EAR_POINTS = [159, 145, 133, 33]
+# --------------------------------------
+
+# Frame analysis height used by the thumbnail search
+ANALYSIS_HEIGHT = 480
+FRAME_ANALYSIS_CACHE_DIR = os.path.join("intermediate", "frame_analysis_cache")
+# Bytes from the start and the end of a video that go into its hash
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# One FaceMesh and one FaceDetection per worker thread, created on first use and kept warm
+_detectors = threading.local()
+_cache = {}
+_cache_lock = threading.Lock()
+_video_hashes = {}
+
+
+def get_face_mesh():
+    """FaceMesh with refined eye landmarks of the current thread, for independent frames."""
+    face_mesh = getattr(_detectors, "face_mesh", None)
+    if face_mesh is None:
+        face_mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=True,  # Frames are not consecutive, no tracking
+            max_num_faces=1,  # Assume one primary face
+            refine_landmarks=True,  # Get finer landmarks for eyes
+            min_detection_confidence=0.5
+        )
+        _detectors.face_mesh = face_mesh
+    return face_mesh
+
+
+def get_face_detector():
+    """Full range face detector of the current thread, the speakers are small in the wide parliament shots."""
+    detector = getattr(_detectors, "face_detection", None)
+    if detector is None:
+        detector = mp.solutions.face_detection.FaceDetection(model_selection=1, min_detection_confidence=0.5)
+        _detectors.face_detection = detector
+    return detector
+
+
+def close_detectors():
+    """Release the detectors of the current thread."""
+    for name in ("face_mesh", "face_detection"):
+        detector = getattr(_detectors, name, None)
+        if detector is not None:
+            detector.close()
+            setattr(_detectors, name, None)
+
+
+def calculate_ear(eye_landmarks, frame_shape):
+    """Calculates the Eye Aspect Ratio (EAR) for a single eye."""
+    try:
+        # Get pixel coordinates from normalized landmarks
+        p1 = (eye_landmarks[0].x * frame_shape[1], eye_landmarks[0].y * frame_shape[0]) # Vertical point 1 (Top)
+        p2 = (eye_landmarks[1].x * frame_shape[1], eye_landmarks[1].y * frame_shape[0]) # Vertical point 2 (Bottom)
+        p3 = (eye_landmarks[2].x * frame_shape[1], eye_landmarks[2].y * frame_shape[0]) # Horizontal point 1 (Left corner)
+        p4 = (eye_landmarks[3].x * frame_shape[1], eye_landmarks[3].y * frame_shape[0]) # Horizontal point 2 (Right corner)
+
+        # Euclidean distance
+        vertical_dist = math.dist(p1, p2)
+        horizontal_dist = math.dist(p3, p4)
+
+        if horizontal_dist == 0:
+            return 0.0
+
+        ear = vertical_dist / horizontal_dist
+        return ear
+    except Exception as e:
+        print(f"Error calculating EAR: {e}")
+        return 0.0
+
+
+def average_ear(landmarks, frame_shape) -> float:
+    """Average EAR of both eyes from the FaceMesh landmarks of a face."""
+    left_ear = calculate_ear([landmarks[i] for i in LEFT_EAR_POINTS], frame_shape)
+    right_ear = calculate_ear([landmarks[i] for i in RIGHT_EAR_POINTS], frame_shape)
+    return (left_ear + right_ear) / 2.0
+
+
+def analyze_face(frame: np.ndarray) -> dict:
+    """
+    Analyze the main face of a BGR frame with the FaceMesh of this worker.
+
+    Returns:
+        dict: "found", "ear" (average of both eyes), "box" (x0, y0, x1, y1 relative to
+              the frame) and "sharpness" (variance of the Laplacian of the face region)
+    """
+    result = {"found": False, "ear": 0.0, "box": [0.0, 0.0, 0.0, 0.0], "sharpness": 0.0}
+    if frame is None:
+        return result
+    h, w = frame.shape[:2]
+    results = get_face_mesh().process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    if not results.multi_face_landmarks:
+        return result
+
+    landmarks = results.multi_face_landmarks[0].landmark
+    points = np.array([(lm.x, lm.y) for lm in landmarks])
+    x0, y0 = np.clip(points.min(axis=0), 0.0, 1.0)
+    x1, y1 = np.clip(points.max(axis=0), 0.0, 1.0)
+    face = frame[int(y0 * h):max(int(y1 * h), int(y0 * h) + 1), int(x0 * w):max(int(x1 * w), int(x0 * w) + 1)]
+    sharpness = cv2.Laplacian(cv2.cvtColor(face, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var() if face.size else 0.0
+    return {
+        "found": True,
+        "ear": average_ear(landmarks, frame.shape),
+        "box": [float(x0), float(y0), float(x1), float(y1)],
+        "sharpness": float(sharpness),
+    }
+
+
+def analyze_frames(frames: list) -> list:
+    """Analyze many frames with the warm FaceMesh of this worker, see analyze_face."""
+    return [analyze_face(frame) for frame in frames]
+
+
+def detect_face_boxes(frames) -> list:
+    """
+    Detect the largest face of every RGB frame with the warm face detector of this worker.
+
+    Args:
+        frames: Iterable of RGB frames
+
+    Returns:
+        list: Relative (xmin, ymin, width, height) per frame, None where no face was found
+    """
+    detector = get_face_detector()
+    boxes = []
+    for frame in frames:
+        results = detector.process(frame)
+        box = None
+        if results.detections:
+            b = max(
+                (d.location_data.relative_bounding_box for d in results.detections),
+                key=lambda b: b.width * b.height
+            )
+            box = (b.xmin, b.ymin, b.width, b.height)
+        boxes.append(box)
+    return boxes
+
+
+def video_hash(video_path: str) -> str:
+    """
+    Fingerprint of a video file from its size and its first and last megabyte,
+    so renamed or copied files share their cached analysis without hashing everything.
+    """
+    stat = os.stat(video_path)
+    memo_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime)
+    if memo_key in _video_hashes:
+        return _video_hashes[memo_key]
+    digest = hashlib.sha256(str(stat.st_size).encode())
+    with open(video_path, "rb") as f:
+        digest.update(f.read(HASH_CHUNK_BYTES))
+        if stat.st_size > HASH_CHUNK_BYTES:
+            f.seek(max(stat.st_size - HASH_CHUNK_BYTES, HASH_CHUNK_BYTES))
+            digest.update(f.read(HASH_CHUNK_BYTES))
+    _video_hashes[memo_key] = digest.hexdigest()
+    return _video_hashes[memo_key]
+
+
+def read_frame(video_path: str, t: float, height: int = None, dims: tuple = None) -> np.ndarray:
+    """
+    Decode a single BGR frame at timestamp t by seeking, optionally downscaled to height.
+
+    Args:
+        video_path (str): Path to the video
+        t (float): Timestamp in seconds
+        height (int): Optional output height, the width keeps the aspect ratio
+        dims (tuple): Size of the video, probed if not given
+
+    Returns:
+        np.ndarray: The frame, None if nothing could be decoded at t
+    """
+    width, src_height = dims or probe_dimensions(video_path)
+    cmd = ["ffmpeg", "-v", "error", "-ss", f"{t:.3f}", "-i", video_path, "-frames:v", "1"]
+    if height and height < src_height:
+        width = int(width * height / src_height)
+        width -= width % 2
+        cmd += ["-vf", f"scale={width}:{height}"]
+    else:
+        height = src_height
+    cmd += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+    data = subprocess.run(cmd, capture_output=True).stdout
+    if len(data) < width * height * 3:
+        return None
+    # Copy, the buffer of the pipe is read-only and callers draw on the frame
+    return np.frombuffer(data[:width * height * 3], dtype=np.uint8).reshape(height, width, 3).copy()
+
+
+def _cache_path(key: str, height: int, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{key}_{height}.json")
+
+
+def _load_cached(key: str, height: int, cache_dir: str) -> dict:
+    """Cached results of a video, from memory or disk."""
+    with _cache_lock:
+        if (key, height) in _cache:
+            return _cache[(key, height)]
+    results = {}
+    path = _cache_path(key, height, cache_dir)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            results = json.load(f)
+    with _cache_lock:
+        return _cache.setdefault((key, height), results)
+
+
+def _store_cached(key: str, height: int, cache_dir: str, results: dict):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(key, height, cache_dir)
+    with _cache_lock:
+        snapshot = dict(results)
+    tmp_path = f"{path}.{threading.get_ident()}.part"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def analyze_video_frames(video_path: str, timestamps, height: int = ANALYSIS_HEIGHT,
+                         cache_dir: str = FRAME_ANALYSIS_CACHE_DIR) -> list:
+    """
+    Analyze the frames of a video at the given timestamps. Results are cached by
+    (video hash, timestamp), only frames that were never analyzed are decoded.
+
+    Args:
+        video_path (str): Path to the video
+        timestamps: Timestamps in seconds
+        height (int): Height the frames are analyzed at
+        cache_dir (str): Directory of the on-disk cache
+
+    Returns:
+        list: One result per timestamp, see analyze_face
+    """
+    key = video_hash(video_path)
+    cached = _load_cached(key, height, cache_dir)
+    ts_keys = [f"{t:.3f}" for t in timestamps]
+    missing = [ts for ts in dict.fromkeys(ts_keys) if ts not in cached]
+    if missing:
+        dims = probe_dimensions(video_path)
+        for ts in missing:
+            result = analyze_face(read_frame(video_path, float(ts), height, dims))
+            with _cache_lock:
+                cached[ts] = result
+        _store_cached(key, height, cache_dir, cached)
+    return [cached[ts] for ts in ts_keys]
+
+
+def analyze_videos(requests: dict, height: int = ANALYSIS_HEIGHT, cache_dir: str = FRAME_ANALYSIS_CACHE_DIR) -> dict:
+    """
+    Batch version of analyze_video_frames for many videos in one warm process.
+
+    Args:
+        requests (dict): Video path -> timestamps
+        height (int): Height the frames are analyzed at
+        cache_dir (str): Directory of the on-disk cache
+
+    Returns:
+        dict: Video path -> list of results
+    """
+    return {
+        video_path: analyze_video_frames(video_path, timestamps, height, cache_dir)
+        for video_path, timestamps in requests.items()
+    }
@@ -0,0 +1,176 @@
+import argparse
+import subprocess
+import time
+
+import cv2
+import numpy as np
+
+from video_processing.ffmpeg_renderer import probe_duration
+from video_processing.frame_analysis import analyze_video_frames, read_frame, ANALYSIS_HEIGHT
+
+# Number of candidate frames
+CANDIDATE_COUNT = 24
+# Skip the first and last part of the video (fades, cut-offs)
+EDGE_MARGIN = 0.05
+# Skip candidates this close to a shot boundary (transitions, motion blur of the switch)
+SHOT_EDGE_SECONDS = 0.3
+# Weights of the normalized features in the score of a candidate
+SCORE_WEIGHTS = {"ear": 1.0, "sharpness": 1.0, "face_size": 0.5, "centering": 0.5}
+
+
+def keyframe_times(video_path: str) -> np.ndarray:
+    """
+    Timestamps of the keyframes of a video. Only the packet headers are read, nothing is decoded.
+
+    Returns:
+        np.ndarray: Sorted keyframe timestamps in seconds
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        video_path
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    times = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            times.append(float(pts_time))
+    return np.sort(np.asarray(times, dtype=np.float64))
+
+
+def inside_shots(timestamps: np.ndarray, shots: list, margin: float = SHOT_EDGE_SECONDS) -> np.ndarray:
+    """Mask of the timestamps that lie inside a shot and at least margin away from its edges."""
+    if not shots:
+        return np.ones(len(timestamps), dtype=bool)
+    starts = np.array([s for s, _ in shots], dtype=np.float64)
+    ends = np.array([e for _, e in shots], dtype=np.float64)
+    idx = np.searchsorted(starts, timestamps, side="right") - 1
+    valid = idx >= 0
+    idx = np.clip(idx, 0, len(shots) - 1)
+    return valid & (timestamps >= starts[idx] + margin) & (timestamps <= ends[idx] - margin)
+
+
+def candidate_timestamps(video_path: str, count: int = CANDIDATE_COUNT, margin: float = EDGE_MARGIN,
+                         shots: list = None) -> np.ndarray:
+    """
+    Pick a sparse set of timestamps to look at. Keyframes are preferred, they can be
+    decoded on their own; evenly spaced timestamps are used if the video has too few.
+    With shots (sorted (start, end) pairs, see shot_index) only timestamps well inside
+    a shot are used.
+
+    Returns:
+        np.ndarray: Candidate timestamps in seconds
+    """
+    duration = probe_duration(video_path)
+    start, end = duration * margin, duration * (1 - margin)
+    keyframes = keyframe_times(video_path)
+    keyframes = keyframes[(keyframes >= start) & (keyframes <= end)]
+    keyframes = keyframes[inside_shots(keyframes, shots)]
+    if len(keyframes) >= count // 2:
+        picks = np.unique(np.linspace(0, len(keyframes) - 1, min(count, len(keyframes))).round().astype(int))
+        return keyframes[picks]
+    timestamps = np.linspace(start, end, count)
+    inside = inside_shots(timestamps, shots)
+    # Too short shots for the margin, better a transition frame than none
+    return timestamps[inside] if inside.any() else timestamps
+
+
+def face_features(results: list) -> dict:
+    """
+    Turn the frame analysis results of the candidates into feature arrays.
+
+    Args:
+        results (list): Results of frame_analysis.analyze_face
+
+    Returns:
+        dict: Arrays with one value per candidate: "found", "ear", "sharpness",
+              "face_size" (share of the frame area) and "centering" (1 at the center)
+    """
+    found = np.array([r["found"] for r in results], dtype=bool)
+    boxes = np.array([r["box"] for r in results], dtype=np.float64).reshape(-1, 4)
+    size = boxes[:, 2:] - boxes[:, :2]
+    center = (boxes[:, :2] + boxes[:, 2:]) / 2
+    return {
+        "found": found,
+        "ear": np.array([r["ear"] for r in results], dtype=np.float64),
+        "sharpness": np.array([r["sharpness"] for r in results], dtype=np.float64),
+        "face_size": np.prod(size, axis=1),
+        "centering": np.where(found, 1.0 - np.linalg.norm(center - 0.5, axis=1) / np.sqrt(0.5), 0.0),
+    }
+
+
+def score_candidates(features: dict, ear_threshold: float, weights: dict = SCORE_WEIGHTS) -> np.ndarray:
+    """
+    Score all candidates at once. Every feature is normalized to [0, 1] over the
+    candidates, frames without a face or with closed eyes get -inf.
+
+    Returns:
+        np.ndarray: One score per candidate
+    """
+    def normalized(values):
+        top = values.max() if len(values) else 0
+        return values / top if top > 0 else np.zeros_like(values)
+
+    score = sum(weight * normalized(features[name].astype(np.float64)) for name, weight in weights.items())
+    eligible = features["found"] & (features["ear"] > ear_threshold)
+    return np.where(eligible, score, -np.inf)
+
+
+def select_best_frame(video_path: str, ear_threshold: float, count: int = CANDIDATE_COUNT,
+                      height: int = ANALYSIS_HEIGHT, shots: list = None) -> tuple:
+    """
+    Find the best thumbnail frame: a sharp, large, centered face with open eyes.
+    Only a sparse set of candidates is decoded (at keyframes if possible) and analyzed
+    downscaled by the warm detector of this worker, results are cached per video;
+    only the winner is decoded again at full resolution.
+
+    Args:
+        video_path (str): Path to the video
+        ear_threshold (float): Minimum eye aspect ratio for open eyes
+        count (int): Number of candidates
+        height (int): Analysis height
+        shots (list): Optional (start, end) of the shots, candidates are taken inside them
+
+    Returns:
+        tuple: (full resolution BGR frame, timestamp), (None, None) if no candidate has open eyes
+    """
+    start = time.perf_counter()
+    timestamps = candidate_timestamps(video_path, count, shots=shots)
+    features = face_features(analyze_video_frames(video_path, timestamps, height))
+    scores = score_candidates(features, ear_threshold)
+
+    if not len(scores) or np.isneginf(scores.max()):
+        print(f"No frame with open eyes among {len(timestamps)} candidates.")
+        return None, None
+    best = int(np.argmax(scores))
+    t = float(timestamps[best])
+    print(f"Selected frame at {t:.2f}s out of {len(timestamps)} candidates "
+          f"(EAR: {features['ear'][best]:.2f}) in {time.perf_counter() - start:.1f}s")
+    return read_frame(video_path, t), t
+
+
+def select_best_frames(video_paths: list, ear_threshold: float, count: int = CANDIDATE_COUNT) -> dict:
+    """
+    Select the thumbnail frames of many videos in one process, the detector stays warm.
+
+    Returns:
+        dict: Video path -> (frame, timestamp), see select_best_frame
+    """
+    return {video_path: select_best_frame(video_path, ear_threshold, count) for video_path in video_paths}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Select the best thumbnail frame of a video.")
+    parser.add_argument("video_path", help="Path to the video")
+    parser.add_argument("output_path", help="Path of the extracted frame (.jpg or .png)")
+    parser.add_argument("--ear-threshold", type=float, default=0.20, help="Minimum eye aspect ratio (default: %(default)s)")
+    parser.add_argument("--candidates", type=int, default=CANDIDATE_COUNT, help="Number of candidates (default: %(default)s)")
+    args = parser.parse_args()
+
+    frame, t = select_best_frame(args.video_path, args.ear_threshold, args.candidates)
+    if frame is not None:
+        cv2.imwrite(args.output_path, frame)
+        print(f"Frame at {t:.2f}s saved as {args.output_path}")
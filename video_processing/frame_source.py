@@ -0,0 +1,136 @@
+import subprocess
+import tempfile
+
+import numpy as np
+
+from video_processing.ffmpeg_renderer import probe_dimensions
+
+# Number of preallocated frame buffers, a yielded frame stays valid until this many more frames were read
+RING_SIZE = 4
+# Characters of the ffmpeg error output included in the exception of a failed decode
+STDERR_TAIL = 2000
+CHANNELS = {"rgb24": 3, "bgr24": 3, "gray": 1}
+
+
+class FrameSource:
+    """
+    Decodes a video with ffmpeg into a ring of preallocated NumPy buffers.
+
+    Scaling, frame rate decimation and the pixel format conversion happen inside ffmpeg,
+    the raw frames are read with readinto straight into the buffers, so iterating
+    allocates no arrays per frame. A yielded frame is overwritten after RING_SIZE more
+    frames: copy it if it is needed longer.
+
+    Usage:
+        with FrameSource(path, fps=3, height=360) as frames:
+            for t, frame in frames:
+                ...
+    """
+
+    def __init__(self, video_path: str, fps: float = None, height: int = None, pix_fmt: str = "rgb24",
+                 start: float = None, duration: float = None, ring_size: int = RING_SIZE):
+        if pix_fmt not in CHANNELS:
+            raise ValueError(f"Unsupported pixel format: {pix_fmt} (available: {', '.join(CHANNELS)})")
+        self.video_path = video_path
+        self.fps = fps
+        self.start = start or 0.0
+        self.duration = duration
+        self.pix_fmt = pix_fmt
+
+        src_width, src_height = probe_dimensions(video_path)
+        if height and height != src_height:
+            width = int(src_width * height / src_height)
+            self.width, self.height = width - width % 2, height
+        else:
+            self.width, self.height = src_width, src_height
+        channels = CHANNELS[pix_fmt]
+        shape = (self.height, self.width, channels) if channels > 1 else (self.height, self.width)
+        self.frame_bytes = self.width * self.height * channels
+        self._ring = [np.empty(shape, dtype=np.uint8) for _ in range(max(1, ring_size))]
+        self._process = None
+        self._stderr = None
+        self._source_fps = None
+
+    def command(self) -> list:
+        cmd = ["ffmpeg", "-v", "error"]
+        if self.start:
+            cmd += ["-ss", f"{self.start:.3f}"]
+        if self.duration:
+            cmd += ["-t", f"{self.duration:.3f}"]
+        cmd += ["-i", self.video_path]
+        filters = []
+        if self.fps:
+            filters.append(f"fps={self.fps}")
+        filters.append(f"scale={self.width}:{self.height}")
+        cmd += ["-vf", ",".join(filters), "-f", "rawvideo", "-pix_fmt", self.pix_fmt, "-"]
+        return cmd
+
+    def _read_into(self, buffer: np.ndarray) -> bool:
+        """Fill a buffer with the next frame, False at the end of the stream."""
+        view = memoryview(buffer.reshape(-1))
+        filled = 0
+        while filled < self.frame_bytes:
+            # A pipe returns partial reads
+            n = self._process.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    def __iter__(self):
+        """
+        Yields:
+            tuple: (timestamp in seconds, frame view into the ring)
+
+        Raises:
+            RuntimeError: If ffmpeg fails, with the end of its error output
+        """
+        if self._process is None:
+            # A file instead of a pipe, ffmpeg cannot block on a full stderr pipe nobody reads
+            self._stderr = tempfile.TemporaryFile()
+            self._process = subprocess.Popen(self.command(), stdout=subprocess.PIPE, stderr=self._stderr,
+                                             bufsize=self.frame_bytes)
+        idx = 0
+        while True:
+            buffer = self._ring[idx % len(self._ring)]
+            if not self._read_into(buffer):
+                break
+            # Without decimation the timestamps are only exact for constant frame rate videos
+            t = self.start + (idx / self.fps if self.fps else idx / self.source_fps())
+            yield t, buffer
+            idx += 1
+
+        # End of the stream, a truncated or failed decode must not pass for a short video
+        returncode = self._process.wait()
+        if returncode != 0:
+            self._stderr.seek(0)
+            error = self._stderr.read().decode("utf-8", errors="replace").strip()[-STDERR_TAIL:]
+            self.close()
+            raise RuntimeError(f"ffmpeg failed with exit code {returncode} after {idx} frames "
+                               f"of {self.video_path}: {error}")
+        self.close()
+
+    def source_fps(self) -> float:
+        """Average frame rate of the video, for the timestamps without decimation."""
+        if self._source_fps is None:
+            cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0",
+                   "-show_entries", "stream=avg_frame_rate", "-of", "csv=p=0", self.video_path]
+            num, _, den = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip().partition("/")
+            self._source_fps = float(num) / float(den) if den and float(den) else float(num)
+        return self._source_fps
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdout.close()
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,38 +1,197 @@
-from moviepy.editor import VideoFileClip, concatenate_videoclips
 from typing import List
 import os
 import argparse
+import json
+import subprocess
+import tempfile
+import time
+from collections import Counter
 from datetime import datetime
 
+# Encoders for transcoding incompatible inputs to the format of the others
+VIDEO_ENCODERS = {"h264": "libx264", "hevc": "libx265", "mpeg4": "mpeg4", "vp9": "libvpx-vp9"}
+AUDIO_ENCODERS = {"aac": "aac", "mp3": "libmp3lame", "opus": "libopus"}
+# Format used when the most common input format cannot be encoded
+FALLBACK_VIDEO_CODEC = "h264"
+# ffprobe profile names -> encoder profiles, the decoder setup of a concat copy depends on them
+ENCODER_PROFILES = {
+    "h264": {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+             "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444"},
+    "hevc": {"Main": "main", "Main 10": "main10", "Main Still Picture": "mainstillpicture"},
+}
+FALLBACK_AUDIO_CODEC = "aac"
+TRANSCODE_PRESET = "medium"
+TRANSCODE_CRF = 20
+
+
+def probe_format(file_path: str) -> dict:
+    """
+    Get the stream parameters of a video file that have to match for a stream copy concatenation.
+
+    Args:
+        file_path (str): Path to the video file
+
+    Returns:
+        dict: "video" and "audio" parameters, "audio" is None if the file has no audio stream
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries",
+        "stream=codec_type,codec_name,profile,level,width,height,pix_fmt,r_frame_rate,time_base,sample_rate,channels",
+        "-of", "json",
+        file_path
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    streams = json.loads(result.stdout)["streams"]
+    video = next((s for s in streams if s["codec_type"] == "video"), None)
+    audio = next((s for s in streams if s["codec_type"] == "audio"), None)
+    if video is None:
+        raise ValueError(f"No video stream in {file_path}")
+    return {
+        # Profile and level are only compared for the codecs whose decoder configuration depends on them
+        "video": (video["codec_name"], video["width"], video["height"], video.get("pix_fmt"),
+                  video.get("profile") if video["codec_name"] in ENCODER_PROFILES else None,
+                  video.get("level") if video["codec_name"] in ENCODER_PROFILES else None,
+                  video["r_frame_rate"], video["time_base"]),
+        "audio": (audio["codec_name"], int(audio["sample_rate"]), audio["channels"]) if audio else None,
+    }
+
+
+def target_format(formats: list) -> dict:
+    """The most common format of the inputs, with an encodable fallback so every input can be converted to it."""
+    counts = Counter((f["video"], f["audio"]) for f in formats)
+    video, audio = counts.most_common(1)[0][0]
+    has_audio = any(f["audio"] for f in formats)
+    if video[0] not in VIDEO_ENCODERS:
+        # Profile and level of another codec mean nothing to the fallback encoder
+        video = (FALLBACK_VIDEO_CODEC, video[1], video[2], "yuv420p", None, None) + video[6:]
+    if has_audio and (audio is None or audio[0] not in AUDIO_ENCODERS):
+        # Keep the sample rate and channels of the inputs that have audio
+        _, rate, channels = next(f["audio"] for f in formats if f["audio"])
+        audio = (FALLBACK_AUDIO_CODEC, rate, channels)
+    return {"video": video, "audio": audio}
+
+
+def transcode_command(file_path: str, output_path: str, target: dict, has_audio: bool) -> list:
+    """
+    ffmpeg command converting a video to the target format: codec, profile and level, size
+    (letterboxed), pixel format, frame rate, timebase and audio layout.
+    """
+    codec, width, height, pix_fmt, profile, level, frame_rate, time_base = target["video"]
+    cmd = ["ffmpeg", "-y", "-v", "error", "-i", file_path]
+    audio = target["audio"]
+    if audio and not has_audio:
+        # Silent track, so the output has the same streams as the other inputs
+        cmd += ["-f", "lavfi", "-i", f"anullsrc=r={audio[1]}:cl={'mono' if audio[2] == 1 else 'stereo'}"]
+    vf = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+          f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={frame_rate}")
+    cmd += ["-map", "0:v:0", "-vf", vf, "-c:v", VIDEO_ENCODERS[codec],
+            "-preset", TRANSCODE_PRESET, "-crf", str(TRANSCODE_CRF),
+            "-video_track_timescale", time_base.split("/")[1]]
+    if pix_fmt:
+        cmd += ["-pix_fmt", pix_fmt]
+    encoder_profile = ENCODER_PROFILES.get(codec, {}).get(profile)
+    if encoder_profile:
+        cmd += ["-profile:v", encoder_profile]
+    if level and level > 0:
+        # ffprobe reports h264 levels times 10 and hevc levels times 30
+        if codec == "h264":
+            cmd += ["-level", f"{level / 10:.1f}"]
+        elif codec == "hevc":
+            cmd += ["-x265-params", f"level-idc={level / 30:.1f}"]
+    if audio:
+        cmd += ["-map", "0:a:0" if has_audio else "1:a:0", "-c:a", AUDIO_ENCODERS[audio[0]],
+                "-ar", str(audio[1]), "-ac", str(audio[2])]
+        if not has_audio:
+            cmd += ["-shortest"]
+    else:
+        cmd += ["-an"]
+    return cmd + [output_path]
+
+
+def concat_copy(video_files: List[str], output_path: str, work_dir: str):
+    """Concatenate files of the same format with the concat demuxer, without decoding."""
+    list_path = os.path.join(work_dir, "inputs.txt")
+    with open(list_path, "w") as f:
+        for file_path in video_files:
+            escaped = os.path.abspath(file_path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+           "-c", "copy", "-movflags", "+faststart", output_path]
+    subprocess.run(cmd, check=True)
+
+
+def concatenate(video_files: List[str], output_path: str) -> dict:
+    """
+    Concatenate videos by stream copy if all inputs share one format, otherwise transcode
+    every input to the most common format first.
+
+    The probed parameters do not cover the codec headers (H.264/HEVC SPS/PPS): a copy keeps
+    the headers of the first input, so a re-encoded part joined to untouched originals may
+    not decode. Encoding all parts with the same settings gives them the same headers.
+
+    Args:
+        video_files (list): Paths to the video files
+        output_path (str): Path of the concatenated video
+
+    Returns:
+        dict: "mode" ("copy" or "transcode"), "transcoded" (input paths),
+              "transcode_seconds" and "seconds" (total)
+    """
+    start = time.perf_counter()
+    formats = [probe_format(file_path) for file_path in video_files]
+    target = target_format(formats)
+
+    transcoded = []
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output_path) or None) as work_dir:
+        parts = []
+        copy = all(fmt == target for fmt in formats)
+        for idx, (file_path, fmt) in enumerate(zip(video_files, formats)):
+            if copy:
+                parts.append(file_path)
+                continue
+            part_path = os.path.join(work_dir, f"part_{idx:03d}.mp4")
+            subprocess.run(transcode_command(file_path, part_path, target, fmt["audio"] is not None), check=True)
+            parts.append(part_path)
+            transcoded.append(file_path)
+        transcode_seconds = time.perf_counter() - start
+        concat_copy(parts, output_path, work_dir)
+
+    return {
+        "mode": "transcode" if transcoded else "copy",
+        "transcoded": transcoded,
+        "transcode_seconds": transcode_seconds,
+        "seconds": time.perf_counter() - start,
+    }
+
+
 def concat_video_files(*video_files: str, output_path_override: str = None) -> str:
     """
     Concatenates multiple MP4 video files into a single video file.
-    
+
+    Inputs that share codec, resolution, frame rate and timebase are joined losslessly
+    with the concat demuxer at I/O speed; if any input differs, all are transcoded first.
+
     Args:
         *video_files: Variable number of paths to MP4 video files
-        output_path_override: Optional path to save the output video file. 
+        output_path_override: Optional path to save the output video file.
                               If None, defaults to 'img/videos/concatenated_YYYYMMDD_HHMMSS.mp4'.
-        
+
     Returns:
         str: Path to the concatenated output video file
-        
+
     Raises:
         ValueError: If no video files are provided or if any file doesn't exist
     """
     if not video_files:
         raise ValueError("At least one video file must be provided")
-    
+
     # Check if all files exist
     for file_path in video_files:
         if not os.path.exists(file_path):
             raise ValueError(f"File not found: {file_path}")
-    
-    # Load all video clips
-    video_clips = [VideoFileClip(file_path) for file_path in video_files]
-    
-    # Concatenate the clips
-    final_clip = concatenate_videoclips(video_clips)
-    
+
     # Determine output path
     if output_path_override:
         output_path = output_path_override
@@ -41,31 +200,29 @@ def concat_video_files(*video_files: str, output_path_override: str = None) -> s
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_dir = "img/videos"
         output_path = os.path.join(output_dir, f"concatenated_{timestamp}.mp4")
-    
+
     # Ensure output directory exists
     if output_dir: # Check if output_dir is not empty (protects against saving in root)
         os.makedirs(output_dir, exist_ok=True)
-    
-    # Write the result to a file
-    final_clip.write_videofile(output_path)
-    
-    # Close all clips to free up resources
-    for clip in video_clips:
-        clip.close()
-    final_clip.close()
-    
+
+    stats = concatenate(list(video_files), output_path)
+    if stats["transcoded"]:
+        print(f"Transcoded {len(stats['transcoded'])} of {len(video_files)} inputs in "
+              f"{stats['transcode_seconds']:.1f}s: {', '.join(stats['transcoded'])}")
+    print(f"Concatenated {len(video_files)} files ({stats['mode']}) in {stats['seconds']:.1f}s")
+
     return output_path
 
 # Added main execution block for command-line usage
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Concatenate multiple MP4 video files.")
-    parser.add_argument("video_files", 
-                        metavar="VIDEO_FILE", 
-                        type=str, 
-                        nargs='+', 
+    parser.add_argument("video_files",
+                        metavar="VIDEO_FILE",
+                        type=str,
+                        nargs='+',
                         help="Paths to the input MP4 video files")
-    parser.add_argument("-o", "--output", 
-                        type=str, 
+    parser.add_argument("-o", "--output",
+                        type=str,
                         help="Path for the output concatenated MP4 file (defaults to img/videos/concatenated_TIMESTAMP.mp4)")
 
     args = parser.parse_args()
@@ -75,5 +232,7 @@ if __name__ == "__main__":
         print(f"Successfully concatenated videos to: {output_file}")
     except ValueError as e:
         print(f"Error: {e}")
+    except subprocess.CalledProcessError as e:
+        print(f"Error: ffmpeg failed: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
@@ -0,0 +1,196 @@
+import argparse
+import os
+import wave
+
+import numpy as np
+
+from video_processing.audio_converter import ASR_SAMPLE_RATE, extract_asr_audio
+
+# Analysis window of the energy based helpers
+FRAME_SECONDS = 0.02
+# Frames quieter than this (dB relative to full scale) count as silence
+SILENCE_THRESHOLD_DB = -40.0
+MIN_SILENCE_SECONDS = 0.3
+MIN_SPEECH_SECONDS = 0.2
+
+
+class SessionAudio:
+    """
+    The mono 16 kHz soundtrack of a session as a memory-mapped array of 16 bit samples.
+
+    The session is decoded once by extract_asr_audio, afterwards any time range is a
+    constant time view into the page cache: alignment excerpts, chunk exports, loudness
+    and silence analysis read only the samples they need.
+
+    Usage:
+        audio = open_session_audio("session.mp4")
+        audio.write_wav("excerpt.wav", 120.0, 150.0)
+        segments = audio.speech_segments(120.0, 150.0)
+    """
+
+    def __init__(self, pcm_path: str, sample_rate: int = ASR_SAMPLE_RATE):
+        self.pcm_path = pcm_path
+        self.sample_rate = sample_rate
+        if os.path.getsize(pcm_path):
+            self.samples = np.memmap(pcm_path, dtype="<i2", mode="r")
+        else:
+            # numpy cannot map an empty file
+            self.samples = np.zeros(0, dtype="<i2")
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def index(self, t: float) -> int:
+        """Sample index of a time in seconds, clamped to the session."""
+        return min(max(int(round(t * self.sample_rate)), 0), len(self.samples))
+
+    def slice(self, start: float, end: float) -> np.ndarray:
+        """Read-only int16 view of the samples between start and end (seconds), no copy."""
+        return self.samples[self.index(start):self.index(end)]
+
+    def float_slice(self, start: float, end: float) -> np.ndarray:
+        """Samples between start and end as float32 in [-1, 1], e.g. for Whisper."""
+        return self.slice(start, end).astype(np.float32) / 32768.0
+
+    def write_wav(self, output_path: str, start: float, end: float) -> float:
+        """
+        Write a time range as 16 bit mono WAV without decoding anything.
+
+        Returns:
+            float: Start of the written range in the session, add it to times within the file
+        """
+        start = self.index(start) / self.sample_rate
+        with wave.open(output_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.sample_rate)
+            f.writeframes(np.ascontiguousarray(self.slice(start, end)).tobytes())
+        return start
+
+    def export_chunks(self, output_dir: str, chunk_duration: float) -> list:
+        """
+        Write the session as WAV chunks of chunk_duration seconds.
+
+        Returns:
+            list: (path, start offset in seconds) per chunk, see transcriber.transcribe_audio
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        chunks = []
+        start = 0.0
+        while start < self.duration:
+            path = os.path.join(output_dir, f"chunk_{len(chunks) + 1:03d}.wav")
+            chunks.append((path, self.write_wav(path, start, start + chunk_duration)))
+            start += chunk_duration
+        return chunks
+
+    def frame_energy(self, start: float = 0.0, end: float = None, frame_seconds: float = FRAME_SECONDS) -> tuple:
+        """
+        RMS level of consecutive frames of a time range.
+
+        Returns:
+            tuple: (frame start times in seconds, levels in dBFS), both numpy arrays
+        """
+        end = self.duration if end is None else end
+        first = self.index(start)
+        samples = self.slice(start, end)
+        frame_length = max(1, int(frame_seconds * self.sample_rate))
+        count = len(samples) // frame_length
+        frames = samples[:count * frame_length].reshape(count, frame_length).astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        levels = 20.0 * np.log10(np.maximum(rms, 1e-6))
+        times = (first + np.arange(count) * frame_length) / self.sample_rate
+        return times, levels
+
+    def loudness(self, start: float = 0.0, end: float = None) -> float:
+        """RMS level of a time range in dBFS."""
+        end = self.duration if end is None else end
+        samples = self.slice(start, end)
+        if not len(samples):
+            return -120.0
+        # In blocks, a float copy of hours of audio would not fit into memory
+        block = self.sample_rate * 60
+        total = sum(
+            float(np.sum(np.square(samples[i:i + block].astype(np.float64))))
+            for i in range(0, len(samples), block)
+        )
+        rms = np.sqrt(total / len(samples)) / 32768.0
+        return float(20.0 * np.log10(max(rms, 1e-6)))
+
+    def speech_segments(self, start: float = 0.0, end: float = None, threshold_db: float = SILENCE_THRESHOLD_DB,
+                        min_silence: float = MIN_SILENCE_SECONDS, min_speech: float = MIN_SPEECH_SECONDS) -> list:
+        """
+        Energy based voice activity detection: ranges louder than threshold_db, with pauses
+        shorter than min_silence bridged and bursts shorter than min_speech dropped.
+
+        Returns:
+            list: (start, end) in seconds per speech segment
+        """
+        times, levels = self.frame_energy(start, end)
+        if not len(times):
+            return []
+        frame_seconds = times[1] - times[0] if len(times) > 1 else FRAME_SECONDS
+        voiced = np.concatenate(([False], levels > threshold_db, [False]))
+        edges = np.flatnonzero(np.diff(voiced.astype(np.int8)))
+        segments = []
+        for on, off in zip(edges[::2], edges[1::2]):
+            seg_start, seg_end = float(times[on]), float(times[off - 1] + frame_seconds)
+            if segments and seg_start - segments[-1][1] < min_silence:
+                segments[-1] = (segments[-1][0], seg_end)
+            else:
+                segments.append((seg_start, seg_end))
+        return [(s, e) for s, e in segments if e - s >= min_speech]
+
+
+def open_session_audio(input_path: str) -> SessionAudio:
+    """The memory-mapped soundtrack of a session video, decoded on first use (cached with the ASR audio)."""
+    return SessionAudio(extract_asr_audio(input_path)["pcm_path"])
+
+
+def self_check(seconds: float = 60.0, sample_rate: int = ASR_SAMPLE_RATE):
+    """Check slicing, WAV export and the silence detection on a synthetic tone with pauses."""
+    import tempfile
+
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    # 1 s tone, 1 s silence
+    signal = np.where((t % 2.0) < 1.0, 0.5 * np.sin(2 * np.pi * 220.0 * t), 0.0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pcm_path = os.path.join(tmp_dir, "session.s16le")
+        (signal * 32767).astype("<i2").tofile(pcm_path)
+        audio = SessionAudio(pcm_path, sample_rate)
+        assert abs(audio.duration - seconds) < 1e-6
+        assert len(audio.slice(10.0, 12.5)) == int(2.5 * sample_rate)
+        assert not audio.slice(10.0, 12.5).flags.owndata
+
+        wav_path = os.path.join(tmp_dir, "excerpt.wav")
+        assert audio.write_wav(wav_path, 4.0, 6.0) == 4.0
+        with wave.open(wav_path, "rb") as f:
+            assert f.getnframes() == 2 * sample_rate
+
+        segments = audio.speech_segments(0.0, 10.0)
+        assert len(segments) == 5, segments
+        assert all(abs(s - 2 * i) < 0.05 and abs(e - s - 1.0) < 0.05 for i, (s, e) in enumerate(segments)), segments
+        assert audio.loudness(1.0, 2.0) < -100.0
+        assert abs(audio.loudness(0.0, 1.0) - 20 * np.log10(0.5 / np.sqrt(2))) < 0.1
+
+        chunks = audio.export_chunks(os.path.join(tmp_dir, "chunks"), 25.0)
+        assert [offset for _, offset in chunks] == [0.0, 25.0, 50.0]
+    print("SessionAudio self check passed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the PCM cache of a session and report its speech segments.")
+    parser.add_argument("input_path", nargs="?", help="Session video or audio file")
+    parser.add_argument("--start", type=float, default=0.0, help="Start of the analyzed range in seconds")
+    parser.add_argument("--end", type=float, default=None, help="End of the analyzed range in seconds")
+    parser.add_argument("--self-check", action="store_true", help="Run the self check on synthetic audio")
+    args = parser.parse_args()
+
+    if args.self_check or not args.input_path:
+        self_check()
+    else:
+        audio = open_session_audio(args.input_path)
+        segments = audio.speech_segments(args.start, args.end)
+        speech = sum(e - s for s, e in segments)
+        print(f"{audio.duration:.1f}s of audio, {len(segments)} speech segments ({speech:.1f}s), "
+              f"loudness {audio.loudness(args.start, args.end):.1f} dBFS")
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import subprocess
+import threading
+import time
+
+from video_processing.audio_converter import source_signature
+from video_processing.ffmpeg_renderer import probe_duration
+
+# The analysis stages (reframing, shot detection) never need more than this
+PROXY_HEIGHT = 360
+PROXY_FPS = int(os.getenv("PROXY_FPS", "10"))
+# Keyframe interval in seconds, seeking into the proxy decodes at most this much
+PROXY_GOP_SECONDS = 1
+PROXY_DIR = os.path.join("intermediate", "proxy")
+
+_proxy_lock = threading.Lock()
+
+
+def proxy_command(video_path: str, proxy_path: str, height: int = PROXY_HEIGHT, fps: int = PROXY_FPS) -> list:
+    """
+    ffmpeg command for the analysis proxy: video only, downscaled, on a constant frame rate
+    grid with short GOPs. Frame i of the proxy shows the source at i / fps seconds, both
+    timelines start at 0 like every other ffmpeg read of the source.
+    """
+    gop = max(1, int(fps * PROXY_GOP_SECONDS))
+    return [
+        "ffmpeg", "-y", "-v", "error",
+        "-i", video_path,
+        "-map", "0:v:0", "-an", "-sn",
+        "-vf", f"fps={fps},scale=-2:{height}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "28",
+        "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+        "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart",
+        proxy_path
+    ]
+
+
+def build_proxy(video_path: str, output_dir: str = PROXY_DIR, height: int = PROXY_HEIGHT, fps: int = PROXY_FPS) -> str:
+    """
+    Get the low resolution proxy of a session video, encoding it only once.
+    The proxy is reused as long as size and mtime of the source are unchanged.
+
+    Args:
+        video_path (str): Path to the session video
+        output_dir (str): Directory of the proxies
+        height (int): Proxy height
+        fps (int): Proxy frame rate
+
+    Returns:
+        str: Path to the proxy, its timestamps are the timestamps of the source
+    """
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+    proxy_path = os.path.join(output_dir, f"{name}_{height}p{fps}.mp4")
+    manifest_path = f"{proxy_path}.json"
+    manifest = {"source": source_signature(video_path), "height": height, "fps": fps}
+
+    with _proxy_lock:
+        if os.path.exists(manifest_path) and os.path.exists(proxy_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if {k: cached.get(k) for k in manifest} == manifest:
+                return proxy_path
+
+        start = time.perf_counter()
+        tmp_path = f"{proxy_path}.part.mp4"
+        subprocess.run(proxy_command(video_path, tmp_path, height, fps), check=True)
+        os.replace(tmp_path, proxy_path)
+
+        # The fps filter keeps the timeline, a drift would shift every analysis result
+        source_duration = probe_duration(video_path)
+        proxy_duration = probe_duration(proxy_path)
+        if abs(source_duration - proxy_duration) > 2.0 / fps:
+            print(f"Warning: Proxy of {video_path} is {proxy_duration:.2f}s long, the source {source_duration:.2f}s")
+        manifest.update({"source_duration": source_duration, "proxy_duration": proxy_duration})
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Created {height}p proxy of {video_path} in {time.perf_counter() - start:.1f}s")
+    return proxy_path
+
+
+def proxy_range(source: dict) -> tuple:
+    """
+    Where a clip of a session can be analyzed on the proxy.
+
+    Args:
+        source (dict): "proxy" path and "start"/"end" of the clip in the session, as stored
+                       with every statement by prepare_shorts
+
+    Returns:
+        tuple: (proxy path, start, duration), None if there is no usable proxy
+    """
+    if not source or not source.get("proxy") or not os.path.exists(source["proxy"]):
+        return None
+    return source["proxy"], source["start"], source["end"] - source["start"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the low resolution analysis proxy of a session video.")
+    parser.add_argument("video_path", help="Path to the session video")
+    parser.add_argument("--height", type=int, default=PROXY_HEIGHT, help="Proxy height (default: %(default)s)")
+    parser.add_argument("--fps", type=int, default=PROXY_FPS, help="Proxy frame rate (default: %(default)s)")
+    args = parser.parse_args()
+
+    print(build_proxy(args.video_path, height=args.height, fps=args.fps))
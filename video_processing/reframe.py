@@ -0,0 +1,178 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from video_processing.ffmpeg_renderer import crop_x_expression
+from video_processing.frame_analysis import detect_face_boxes
+from video_processing.frame_source import FrameSource
+from video_processing.proxy_media import proxy_range
+
+# The face detection runs on a sub-sampled, downscaled frame stream
+ANALYSIS_FPS = 3
+ANALYSIS_HEIGHT = 360
+# Length of the moving average over the crop centers, in seconds
+SMOOTHING_SECONDS = 1.5
+REFRAME_CACHE_DIR = os.path.join("intermediate", "reframe_cache")
+# "face" follows the speaker, "center" keeps the fixed center crop
+REFRAME_MODE = os.getenv("REFRAME", "face")
+
+
+def trajectory_key(video_path: str, fps: float = ANALYSIS_FPS, height: int = ANALYSIS_HEIGHT,
+                   proxy: tuple = None) -> str:
+    """Cache key of a clip: path, size and modification time plus the analysis settings and proxy range."""
+    stat = os.stat(video_path)
+    payload = json.dumps([os.path.abspath(video_path), stat.st_size, stat.st_mtime, fps, height, SMOOTHING_SECONDS,
+                          proxy])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def iter_analysis_frames(video_path: str, fps: float = ANALYSIS_FPS, height: int = ANALYSIS_HEIGHT,
+                         start: float = None, duration: float = None):
+    """
+    Decode a video (or a range of it) at a low frame rate and resolution with ffmpeg, into reused buffers.
+
+    Yields:
+        tuple: (timestamp relative to start, rgb frame of the given height), the frame is only
+               valid until the next one
+    """
+    with FrameSource(video_path, fps=fps, height=height, start=start, duration=duration) as frames:
+        for t, frame in frames:
+            yield t - (start or 0.0), frame
+
+
+def detect_face_centers(frames) -> tuple:
+    """
+    Find the horizontal center of the largest face in every frame.
+
+    Args:
+        frames: Iterable of (timestamp, rgb frame)
+
+    Returns:
+        tuple: (times, centers) as arrays, centers are relative to the frame width
+               and NaN for frames without a face
+    """
+    times = []
+    centers = []
+    # The warm detector of this worker is reused for every clip
+    for t, frame in frames:
+        box = detect_face_boxes([frame])[0]
+        times.append(t)
+        centers.append(box[0] + box[2] / 2 if box else np.nan)
+    return np.asarray(times, dtype=np.float64), np.asarray(centers, dtype=np.float64)
+
+
+def smooth_trajectory(centers: np.ndarray, fps: float = ANALYSIS_FPS,
+                      smoothing_seconds: float = SMOOTHING_SECONDS) -> np.ndarray:
+    """
+    Fill the frames without a face by interpolation and smooth the crop centers
+    with a moving average, so the crop pans calmly instead of following every jitter.
+
+    Args:
+        centers (np.ndarray): Relative crop centers, NaN where no face was found
+        fps (float): Sample rate of the centers
+        smoothing_seconds (float): Length of the moving average
+
+    Returns:
+        np.ndarray: Smoothed centers, 0.5 (center crop) if no face was found at all
+    """
+    found = ~np.isnan(centers)
+    if not found.any():
+        return np.full_like(centers, 0.5)
+    idx = np.arange(len(centers))
+    filled = np.interp(idx, idx[found], centers[found])
+
+    window = max(1, int(round(smoothing_seconds * fps)))
+    if window == 1 or len(filled) < 2:
+        return filled
+    # Pad with the edge values, so the average does not pull the ends to the center
+    padded = np.pad(filled, (window // 2, window - 1 - window // 2), mode="edge")
+    return np.convolve(padded, np.ones(window) / window, mode="valid")
+
+
+def crop_trajectory(video_path: str, cache_dir: str = REFRAME_CACHE_DIR, source: dict = None) -> dict:
+    """
+    Get the smoothed face-tracked crop trajectory of a clip, analyzing it only on a cache miss.
+    With the session source of the clip, its range is read from the low resolution proxy
+    of the session instead of decoding the clip.
+
+    Args:
+        video_path (str): Path to the clip
+        cache_dir (str): Directory of the trajectory cache
+        source (dict): Optional "proxy", "start" and "end" of the clip in the session, see proxy_media
+
+    Returns:
+        dict: {"times": [...], "centers": [...]} with the crop center relative to the frame width
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    proxy = proxy_range(source)
+    cache_path = os.path.join(cache_dir, f"{trajectory_key(video_path, proxy=proxy)}.json")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            return json.load(f)
+
+    start = time.perf_counter()
+    if proxy:
+        proxy_path, start_time, duration = proxy
+        frames = iter_analysis_frames(proxy_path, start=start_time, duration=duration)
+    else:
+        frames = iter_analysis_frames(video_path)
+    times, centers = detect_face_centers(frames)
+    if not len(times):
+        # An all-centered trajectory in the cache would hide the failure on every rerun
+        raise RuntimeError(f"No frames decoded from {proxy[0] if proxy else video_path}, the trajectory is not cached")
+    trajectory = {"times": times.tolist(), "centers": smooth_trajectory(centers).tolist()}
+    print(f"Analyzed {len(times)} frames of {video_path} for reframing in {time.perf_counter() - start:.1f}s")
+
+    tmp_path = f"{cache_path}.part"
+    with open(tmp_path, "w") as f:
+        json.dump(trajectory, f)
+    os.replace(tmp_path, cache_path)
+    return trajectory
+
+
+def crop_center_at(trajectory: dict, t: float) -> float:
+    """Relative crop center at time t, linearly interpolated between the samples."""
+    if not trajectory or not trajectory["times"]:
+        return 0.5
+    return float(np.interp(t, trajectory["times"], trajectory["centers"]))
+
+
+def crop_left(center: float, frame_width: int, crop_width: int) -> int:
+    """Left edge of a crop around a relative center, kept inside the frame."""
+    return int(min(max(center * frame_width - crop_width / 2, 0), frame_width - crop_width))
+
+
+def tracked_crop(clip, trajectory: dict, crop_width: int):
+    """
+    Crop a moviepy clip to crop_width around the moving crop center of the trajectory.
+
+    Args:
+        clip: moviepy VideoClip
+        trajectory (dict): See crop_trajectory
+        crop_width (int): Width of the crop in pixels, the full height is kept
+
+    Returns:
+        The cropped clip
+    """
+    def crop_frame(get_frame, t):
+        frame = get_frame(t)
+        left = crop_left(crop_center_at(trajectory, t), frame.shape[1], crop_width)
+        return frame[:, left:left + crop_width]
+
+    return clip.transform(crop_frame)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the face-tracked crop trajectory of a clip.")
+    parser.add_argument("video_path", help="Path to the clip")
+    args = parser.parse_args()
+
+    trajectory = crop_trajectory(args.video_path)
+    centers = trajectory["centers"]
+    if centers:
+        print(f"{len(centers)} samples, crop center between {min(centers):.2f} and {max(centers):.2f} of the width")
+    print(f"ffmpeg crop x: {crop_x_expression(trajectory)}")
@@ -0,0 +1,65 @@
+import os
+
+# Named render settings. "preview" is a fast, small render for the editorial review of
+# the cut and the script, "publish" is the final short.
+#   max_height: Output height limit (the width keeps the aspect ratio), None for full resolution
+#   fps, preset, crf: Frame rate and libx264 settings of every encode
+#   caption_renderer: "glyph" or "textclip" (see create_captions), None for the default
+#   output_dir, suffix: Where the captioned short goes and what is appended to its name
+RENDER_PROFILES = {
+    "preview": {
+        "max_height": 480,
+        "fps": 25,
+        "preset": "ultrafast",
+        "crf": 30,
+        "caption_renderer": "glyph",
+        "output_dir": "./output/preview/",
+        "suffix": "_preview",
+    },
+    "publish": {
+        "max_height": None,
+        "fps": 50,
+        "preset": "medium",
+        "crf": 23,
+        "caption_renderer": None,
+        "output_dir": "./output/tiktok/",
+        "suffix": "",
+    },
+}
+DEFAULT_PROFILE = os.getenv("RENDER_PROFILE", "publish")
+
+
+def get_render_profile(name: str = None) -> dict:
+    """
+    Get the settings of a render profile.
+
+    Args:
+        name (str): Profile name, defaults to RENDER_PROFILE or "publish"
+
+    Returns:
+        dict: The profile settings including its "name"
+    """
+    name = name or DEFAULT_PROFILE
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name} (available: {', '.join(RENDER_PROFILES)})")
+    return {"name": name, **RENDER_PROFILES[name]}
+
+
+def scale_dimensions(dims: tuple, max_height: int = None) -> tuple:
+    """
+    Limit a frame size to max_height, keeping the aspect ratio. The size is rounded
+    down to even numbers, which libx264 with yuv420p requires.
+
+    Args:
+        dims (tuple): (width, height)
+        max_height (int): Height limit, None to keep the size
+
+    Returns:
+        tuple: (width, height)
+    """
+    width, height = dims
+    if max_height and height > max_height:
+        width = int(width * max_height / height)
+        height = max_height
+    width, height = int(width), int(height)
+    return width - width % 2, height - height % 2
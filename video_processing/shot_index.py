@@ -0,0 +1,309 @@
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from video_processing.audio_converter import source_signature
+from video_processing.ffmpeg_renderer import probe_duration
+from video_processing.frame_source import FrameSource
+
+# Shot detection reads tiny frames at a low rate, a camera switch changes the whole frame
+SHOT_ANALYSIS_FPS = 10
+SHOT_ANALYSIS_HEIGHT = 72
+HISTOGRAM_BINS = 16
+# Share of the histogram mass that has to change between two frames for a cut
+SHOT_THRESHOLD = float(os.getenv("SHOT_THRESHOLD", "0.3"))
+MIN_SHOT_SECONDS = 0.5
+# A cut point moves to a shot boundary at most this far outside (extend) or inside (trim) the clip,
+# the trim stays below the 0.5s buffer around the words
+SNAP_MAX_EXTEND = 1.5
+SNAP_MAX_TRIM = 0.4
+SHOT_INDEX_DIR = os.path.join("intermediate", "shot_index")
+BATCH_FRAMES = 256
+
+
+def frame_histograms(frames, bins: int = HISTOGRAM_BINS, batch_size: int = BATCH_FRAMES) -> tuple:
+    """
+    Per-channel color histograms of every frame, computed in batches with a single bincount.
+
+    Args:
+        frames: Iterable of (timestamp, rgb frame), frames may be reused buffers
+        bins (int): Bins per channel, a power of two up to 256
+
+    Returns:
+        tuple: (times, histograms) with histograms of shape (frames, 3 * bins), each channel sums to 1
+    """
+    shift = 8 - int(np.log2(bins))
+    times = []
+    hists = []
+    batch = None
+    n = 0
+
+    def flush():
+        q = (batch[:n] >> shift).astype(np.int32)
+        # Offsets make every (frame, channel, bin) its own bincount slot
+        q += np.arange(3, dtype=np.int32) * bins
+        q += (np.arange(n, dtype=np.int32) * 3 * bins)[:, None, None, None]
+        counts = np.bincount(q.ravel(), minlength=n * 3 * bins).reshape(n, 3 * bins)
+        hists.append((counts / (batch.shape[1] * batch.shape[2])).astype(np.float32))
+
+    for t, frame in frames:
+        if batch is None:
+            batch = np.empty((batch_size, *frame.shape), dtype=np.uint8)
+        batch[n] = frame
+        times.append(t)
+        n += 1
+        if n == batch_size:
+            flush()
+            n = 0
+    if n:
+        flush()
+    if not hists:
+        return np.zeros(0), np.zeros((0, 3 * bins), dtype=np.float32)
+    return np.asarray(times, dtype=np.float64), np.concatenate(hists)
+
+
+def histogram_differences(hists: np.ndarray) -> np.ndarray:
+    """
+    Change between consecutive frames in [0, 1]: half the L1 distance of the histograms,
+    averaged over the channels. The first frame gets 0.
+    """
+    diffs = np.zeros(len(hists), dtype=np.float64)
+    if len(hists) > 1:
+        diffs[1:] = np.abs(np.diff(hists, axis=0)).sum(axis=1) / 6.0
+    return diffs
+
+
+def find_boundaries(times: np.ndarray, diffs: np.ndarray, threshold: float = SHOT_THRESHOLD,
+                    min_shot_seconds: float = MIN_SHOT_SECONDS) -> list:
+    """
+    Shot boundaries: frames whose difference exceeds the threshold and is the largest
+    within min_shot_seconds, so a dissolve yields one boundary instead of several.
+
+    Returns:
+        list: Sorted boundary times (first frame of the new shot)
+    """
+    if len(times) < 2:
+        return []
+    step = float(np.median(np.diff(times)))
+    radius = max(1, int(round(min_shot_seconds / step)))
+    padded = np.pad(diffs, radius)
+    local_max = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1).max(axis=1)
+    peaks = np.flatnonzero((diffs > threshold) & (diffs >= local_max))
+
+    boundaries = []
+    for idx in peaks:
+        t = float(times[idx])
+        # Plateaus of equal differences count once
+        if boundaries and t - boundaries[-1] < min_shot_seconds:
+            continue
+        boundaries.append(t)
+    return boundaries
+
+
+class ShotIndex:
+    """
+    Sorted shot boundaries of a video, queried by binary search.
+
+    Usage:
+        index = build_shot_index(proxy_path)
+        start, end = index.snap_cut(start, end)
+        for shot_start, shot_end in index.shots(0, 60):
+            ...
+    """
+
+    def __init__(self, boundaries: list, duration: float):
+        self.boundaries = sorted(boundaries)
+        self.duration = duration
+
+    def shot_at(self, t: float) -> tuple:
+        """(start, end) of the shot that contains t."""
+        idx = bisect.bisect_right(self.boundaries, t)
+        start = self.boundaries[idx - 1] if idx > 0 else 0.0
+        end = self.boundaries[idx] if idx < len(self.boundaries) else self.duration
+        return start, end
+
+    def nearest_boundary(self, t: float, before: float, after: float):
+        """Boundary closest to t within [t - before, t + after], None if there is none."""
+        lo = bisect.bisect_left(self.boundaries, t - before)
+        hi = bisect.bisect_right(self.boundaries, t + after)
+        if lo >= hi:
+            return None
+        return min(self.boundaries[lo:hi], key=lambda b: abs(b - t))
+
+    def snap_cut(self, start: float, end: float, max_extend: float = SNAP_MAX_EXTEND,
+                 max_trim: float = SNAP_MAX_TRIM) -> tuple:
+        """
+        Move the cut points of a clip to nearby shot boundaries, so the clip neither starts
+        with the last frames of the previous shot nor ends with the first frames of the next.
+
+        Returns:
+            tuple: (start, end), unchanged where no boundary is close
+        """
+        snapped_start = self.nearest_boundary(start, before=max_extend, after=max_trim)
+        snapped_end = self.nearest_boundary(end, before=max_trim, after=max_extend)
+        start = start if snapped_start is None else snapped_start
+        end = end if snapped_end is None or snapped_end <= start else snapped_end
+        return start, end
+
+    def shots(self, start: float = 0.0, end: float = None) -> list:
+        """(start, end) of the shots overlapping a time range, clipped to it."""
+        end = self.duration if end is None else end
+        lo = bisect.bisect_right(self.boundaries, start)
+        hi = bisect.bisect_left(self.boundaries, end)
+        edges = [start] + self.boundaries[lo:hi] + [end]
+        return [(a, b) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def _index_path(video_path: str, fps: float, height: int, threshold: float, cache_dir: str) -> str:
+    payload = json.dumps([os.path.abspath(video_path), fps, height, HISTOGRAM_BINS, threshold, MIN_SHOT_SECONDS])
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(cache_dir, f"{name}_{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]}.json")
+
+
+def build_shot_index(video_path: str, fps: float = SHOT_ANALYSIS_FPS, height: int = SHOT_ANALYSIS_HEIGHT,
+                     threshold: float = SHOT_THRESHOLD, cache_dir: str = SHOT_INDEX_DIR) -> ShotIndex:
+    """
+    Get the shot index of a video, detecting the shots only once. Pass the proxy of a session
+    (see proxy_media), its timestamps are those of the original.
+    The index is reused as long as size and mtime of the video are unchanged.
+
+    Args:
+        video_path (str): Path to the video or its proxy
+        fps (float): Analysis frame rate
+        height (int): Analysis height
+        threshold (float): Histogram change of a cut, see histogram_differences
+        cache_dir (str): Directory of the cached indexes
+
+    Returns:
+        ShotIndex: The shot boundaries
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = _index_path(video_path, fps, height, threshold, cache_dir)
+    source = source_signature(video_path)
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached["source"] == source:
+            return ShotIndex(cached["boundaries"], cached["duration"])
+
+    start = time.perf_counter()
+    with FrameSource(video_path, fps=fps, height=height) as frames:
+        times, hists = frame_histograms(frames)
+    duration = probe_duration(video_path)
+    if not len(times) and duration > 0:
+        # Would be cached as a video without any cuts
+        raise RuntimeError(f"No frames decoded from {video_path} ({duration:.1f}s), the shot index is not cached")
+    boundaries = find_boundaries(times, histogram_differences(hists), threshold)
+    print(f"Found {len(boundaries)} shot boundaries in {len(times)} frames of {video_path} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    tmp_path = f"{index_path}.part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "duration": duration, "boundaries": boundaries}, f)
+    os.replace(tmp_path, index_path)
+    return ShotIndex(boundaries, duration)
+
+
+def timeline_shots(timeline: list) -> list:
+    """
+    Shots of a short in its own time, without decoding it: the session shots of every clip,
+    read from the cached index of the session proxy, shifted to the offset of the clip.
+    Image segments are left out.
+
+    Args:
+        timeline (list): Timeline segments in playback order, clips carry the "source" of
+                         their statement (see build_timeline in blue_box)
+
+    Returns:
+        list: (start, end) per shot in seconds from the start of the short
+    """
+    shots = []
+    offset = 0.0
+    for segment in timeline:
+        duration = segment.get("duration")
+        if duration is None:
+            duration = probe_duration(segment["path"])
+        source = segment.get("source") if segment["type"] == "clip" else None
+        if source and source.get("proxy") and os.path.exists(source["proxy"]):
+            index = build_shot_index(source["proxy"])
+            end = min(source["end"], source["start"] + duration)
+            shots += [(offset + a - source["start"], offset + b - source["start"])
+                      for a, b in index.shots(source["start"], end)]
+        elif segment["type"] == "clip":
+            shots.append((offset, offset + duration))
+        offset += duration
+    return shots
+
+
+def shots_path(video_path: str) -> str:
+    return f"{os.path.splitext(video_path)[0]}.shots.json"
+
+
+def write_video_shots(video_path: str, shots: list):
+    """Store the shots of a rendered video next to it, see load_video_shots."""
+    with open(shots_path(video_path), "w", encoding="utf-8") as f:
+        json.dump({"source": source_signature(video_path), "shots": shots}, f)
+
+
+def load_video_shots(video_path: str):
+    """The stored shots of a rendered video, None if there are none or the video changed since."""
+    path = shots_path(video_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        cached = json.load(f)
+    if cached["source"] != source_signature(video_path):
+        return None
+    return [tuple(shot) for shot in cached["shots"]]
+
+
+def self_check(fps: float = 10.0):
+    """Check detection and queries on synthetic shots: flat colors with noise and a dissolve."""
+    rng = np.random.default_rng(0)
+    colors = [(200, 40, 40), (40, 200, 40), (40, 40, 200), (220, 220, 60)]
+    # 3 s per shot, the last cut is a 0.3 s dissolve
+    frames = []
+    for shot, color in enumerate(colors):
+        for i in range(int(3 * fps)):
+            frame = np.clip(rng.normal(color, 12, size=(36, 64, 3)), 0, 255).astype(np.uint8)
+            if shot == 3 and i < 3:
+                mix = (i + 1) / 4
+                frame = (frame * mix + np.array(colors[2]) * (1 - mix)).astype(np.uint8)
+            frames.append(frame)
+    times, hists = frame_histograms(((i / fps, f) for i, f in enumerate(frames)), batch_size=7)
+    assert hists.shape == (len(frames), 3 * HISTOGRAM_BINS)
+    assert np.allclose(hists.reshape(len(frames), 3, -1).sum(axis=2), 1.0)
+    boundaries = find_boundaries(times, histogram_differences(hists))
+    assert len(boundaries) == 3 and all(abs(b - e) <= 0.25 for b, e in zip(boundaries, (3.0, 6.0, 9.0))), boundaries
+
+    index = ShotIndex(boundaries, 12.0)
+    assert index.shot_at(4.0) == (boundaries[0], boundaries[1])
+    # A few frames of the neighbouring shots are trimmed, a nearby cut extends the clip
+    assert index.snap_cut(2.8, 6.3) == (boundaries[0], boundaries[1])
+    assert index.snap_cut(4.0, 5.0) == (boundaries[0], boundaries[1])
+    assert index.snap_cut(4.6, 5.0, max_extend=0.5) == (4.6, 5.0)
+    assert [round(b - a, 6) for a, b in index.shots(1.0, 7.0)] == [
+        round(boundaries[0] - 1.0, 6), round(boundaries[1] - boundaries[0], 6), round(7.0 - boundaries[1], 6)]
+    print(f"Shot index self check passed, boundaries at {', '.join(f'{b:.1f}s' for b in boundaries)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the shot boundary index of a video (or session proxy).")
+    parser.add_argument("video_path", nargs="?", help="Path to the video or its proxy")
+    parser.add_argument("--threshold", type=float, default=SHOT_THRESHOLD, help="Cut threshold (default: %(default)s)")
+    parser.add_argument("--self-check", action="store_true", help="Run the self check on synthetic frames")
+    args = parser.parse_args()
+
+    if args.self_check or not args.video_path:
+        self_check()
+    else:
+        index = build_shot_index(args.video_path, threshold=args.threshold)
+        shots = index.shots()
+        print(f"{len(shots)} shots, mean length {index.duration / max(len(shots), 1):.1f}s")
+        for b in index.boundaries:
+            print(f"{b:.2f}")
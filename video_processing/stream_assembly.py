@@ -0,0 +1,156 @@
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from moviepy import VideoFileClip, ImageClip
+from moviepy.video.fx import FadeOut
+
+from video_processing.caption_renderer import CaptionOverlay
+from video_processing.create_captions import caption_font_size
+from video_processing.ffmpeg_renderer import output_dimensions, render_timeline_audio, probe_duration
+from video_processing.reframe import tracked_crop
+from video_processing.render_profiles import get_render_profile
+
+# Abort guard of the assembling process: the memory is bounded by the design (one open
+# source, one frame in flight, the pipe blocks while the encoder is behind), this ceiling
+# only stops a render that exceeds it anyway, e.g. because of a leaking decoder
+MAX_MEMORY_MB = int(os.getenv("ASSEMBLY_MAX_MEMORY_MB", "1024"))
+# How often the memory usage is checked, in frames
+MEMORY_CHECK_INTERVAL = 25
+
+
+def current_rss_bytes() -> int:
+    """Resident memory of this process (the peak if the current value is not available)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Bytes on macOS, kilobytes on Linux
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def open_segment(segment: dict, dims: tuple):
+    """
+    Open the source of a timeline segment as a moviepy clip, cropped to the 600:945
+    aspect ratio (following the speaker if a trajectory is known) and resized to dims.
+    Only the video is opened, the soundtrack is rendered separately by ffmpeg.
+    """
+    if segment["type"] == "clip":
+        source = VideoFileClip(segment["path"], audio=False)
+    else:
+        source = ImageClip(segment["image"]).with_duration(segment["duration"])
+    crop_width = int(source.h * 600 / 945)
+    if segment.get("trajectory"):
+        clip = tracked_crop(source, segment["trajectory"], crop_width)
+    else:
+        clip = source.cropped(x_center=source.w / 2, y_center=source.h / 2, width=crop_width, height=source.h)
+    clip = clip.resized(dims)
+    if segment["type"] == "image" and segment.get("fade_out"):
+        clip = FadeOut(segment["fade_out"]).apply(clip)
+    return source, clip
+
+
+def encoder_command(output_path: str, audio_path: str, dims: tuple, profile: dict, threads: int = None) -> list:
+    """ffmpeg command that encodes raw RGB frames from stdin together with the rendered soundtrack."""
+    width, height = dims
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(profile["fps"]), "-i", "-",
+        "-i", audio_path,
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "libx264", "-preset", profile["preset"], "-crf", str(profile["crf"]), "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest"
+    ]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd.append(output_path)
+    return cmd
+
+
+def assemble_timeline(timeline: list, output_path: str, words: list = None, profile: dict = None,
+                      threads: int = None, max_memory_mb: int = MAX_MEMORY_MB) -> dict:
+    """
+    Render a timeline by streaming its frames in playback order into a single encoder.
+
+    Only the source of the current segment is open, it is closed before the next one
+    is opened (also if an error occurs), so memory use and open file handles do not
+    grow with the length of the script. Frames go to ffmpeg one at a time and the write
+    blocks while the encoder is behind, so no frames queue up in this process. The
+    soundtrack is rendered beforehand by ffmpeg without decoding any video.
+    max_memory_mb is an abort guard on top of that, checked every MEMORY_CHECK_INTERVAL
+    frames: it cannot keep the memory from being allocated, it stops the render afterwards.
+
+    Args:
+        timeline (list): Timeline segments, see ffmpeg_renderer.build_render_command
+        output_path (str): Path of the rendered video
+        words (list): Optional caption words, burned in during the same encode
+        profile (dict): Render profile, see render_profiles
+        threads (int): Encoder threads
+        max_memory_mb (int): Abort guard, a MemoryError is raised once this process uses more
+
+    Returns:
+        dict: Statistics of the render (frames, peak memory, open sources, seconds)
+    """
+    if not timeline:
+        raise ValueError("Cannot render an empty timeline")
+    profile = profile or get_render_profile()
+    fps = profile["fps"]
+    dims = output_dimensions(timeline, profile["max_height"])
+    overlay = CaptionOverlay(words, dims, caption_font_size(dims[1])) if words else None
+    max_memory = max_memory_mb * 1024 * 1024
+
+    stats = {"segments": len(timeline), "frames": 0, "peak_rss": current_rss_bytes(),
+             "open_sources": 0, "max_open_sources": 0}
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        audio_path = render_timeline_audio(timeline, os.path.join(tmp_dir, "soundtrack.wav"))
+        encoder = subprocess.Popen(encoder_command(output_path, audio_path, dims, profile, threads),
+                                   stdin=subprocess.PIPE)
+        try:
+            offset = 0.0
+            for segment in timeline:
+                source, clip = open_segment(segment, dims)
+                stats["open_sources"] += 1
+                stats["max_open_sources"] = max(stats["max_open_sources"], stats["open_sources"])
+                try:
+                    duration = segment.get("duration") or clip.duration
+                    # Frame numbers from the absolute offset, so rounding does not drift over many segments
+                    first_frame = round(offset * fps)
+                    last_frame = round((offset + duration) * fps)
+                    for frame_idx in range(first_frame, last_frame):
+                        t = frame_idx / fps
+                        frame = clip.get_frame(min(t - offset, clip.duration - 1 / fps))
+                        if overlay:
+                            frame = overlay.blend(frame, t)
+                        encoder.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+                        stats["frames"] += 1
+
+                        if stats["frames"] % MEMORY_CHECK_INTERVAL == 0:
+                            rss = current_rss_bytes()
+                            stats["peak_rss"] = max(stats["peak_rss"], rss)
+                            if rss > max_memory:
+                                raise MemoryError(
+                                    f"Assembly uses {rss / 2**20:.0f} MB, above the ceiling of {max_memory_mb} MB"
+                                )
+                    offset += duration
+                finally:
+                    clip.close()
+                    source.close()
+                    stats["open_sources"] -= 1
+            encoder.stdin.close()
+            if encoder.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed to encode {output_path}")
+        except BaseException:
+            encoder.kill()
+            encoder.wait()
+            raise
+
+    stats["seconds"] = time.perf_counter() - start
+    print(f"Streamed {stats['frames']} frames of {len(timeline)} segments into {output_path} "
+          f"in {stats['seconds']:.1f}s (peak memory {stats['peak_rss'] / 2**20:.0f} MB)")
+    return stats
@@ -0,0 +1,102 @@
+import bisect
+import functools
+import threading
+from itertools import accumulate
+
+# Exact widths kept per font: every wrap measures new candidate lines, so unlike the
+# word advances they grow with the amount of text and need a bound
+WIDTH_CACHE_SIZE = 4096
+
+_measurers = {}
+_measurers_lock = threading.Lock()
+
+
+def font_key(font) -> tuple:
+    """Identity of a Pillow font for the caches: file and size of TrueType fonts."""
+    path = getattr(font, "path", None)
+    size = getattr(font, "size", None)
+    if path is None:
+        return ("builtin", id(font), size)
+    return (str(path), size)
+
+
+class TextMeasurer:
+    """
+    Measures and wraps text of one font (and size) with cached widths.
+
+    Word and space advance widths are measured once, line breaks come from prefix sums
+    of these widths; only the candidate line at a break point is measured exactly
+    (ink bounding box, like draw.textbbox), so wrapping is linear in the text length.
+    Shared per font via get_text_measurer, used by the thumbnail text overlay.
+    """
+
+    def __init__(self, font, width_cache_size: int = WIDTH_CACHE_SIZE):
+        self.font = font
+        self._advances = {}
+        self._widths = functools.lru_cache(maxsize=width_cache_size)(self._measure_width)
+        self.space_width = font.getlength(" ")
+
+    def advance(self, word: str) -> float:
+        """Advance width of a word (how far the pen moves), cached."""
+        width = self._advances.get(word)
+        if width is None:
+            width = self._advances[word] = self.font.getlength(word)
+        return width
+
+    def _measure_width(self, text: str) -> int:
+        left, _, right, _ = self.font.getbbox(text)
+        return right - left
+
+    def text_width(self, text: str) -> int:
+        """Exact width of the ink bounding box of a text, the last WIDTH_CACHE_SIZE are cached."""
+        return self._widths(text)
+
+    def line_height(self, text: str = "Ag") -> int:
+        """Height of the ink bounding box of a sample text."""
+        _, top, _, bottom = self.font.getbbox(text)
+        return bottom - top
+
+    def wrap(self, text: str, max_width: float) -> list:
+        """
+        Wrap text to lines of at most max_width pixels, breaking only between words.
+
+        Args:
+            text (str): The text
+            max_width (float): Maximum line width in pixels
+
+        Returns:
+            list: The lines, words wider than max_width get a line of their own
+        """
+        words = text.split() if text else []
+        if not words:
+            return []
+        # prefix[k]: width of the first k words, each followed by a space
+        prefix = [0.0, *accumulate(self.advance(word) + self.space_width for word in words)]
+
+        lines = []
+        start = 0
+        while start < len(words):
+            # Largest end whose estimated width (without the trailing space) fits
+            end = bisect.bisect_right(prefix, prefix[start] + max_width + self.space_width) - 1
+            end = max(end, start + 1)
+            # Correct the estimate at the break point with exact measurements
+            while end > start + 1 and self.text_width(" ".join(words[start:end])) > max_width:
+                end -= 1
+            while end < len(words) and self.text_width(" ".join(words[start:end + 1])) <= max_width:
+                end += 1
+            line = " ".join(words[start:end])
+            if end == start + 1 and self.text_width(line) > max_width:
+                print(f"Warning: Word '{line}' is wider than max_width.")
+            lines.append(line)
+            start = end
+        return lines
+
+
+def get_text_measurer(font) -> TextMeasurer:
+    """The shared measurer of a font, created on first use."""
+    key = font_key(font)
+    with _measurers_lock:
+        measurer = _measurers.get(key)
+        if measurer is None:
+            measurer = _measurers[key] = TextMeasurer(font)
+        return measurer
@@ -2,7 +2,7 @@ import os
 import json
 import re
 from mutagen.mp3 import MP3
-import openai
+from openai_client import get_client, tracked_call
 import assemblyai as aai
 from fuzzywuzzy import fuzz
 
@@ -23,7 +23,7 @@ def normalize_text(text: str) -> str:
     return text
 
 
-def transcribe_audio(mp3_path: str, openai_key: str, chunk_duration: int = 1400) -> str:
+def transcribe_audio(mp3_path: str, openai_key: str, chunk_duration: int = 1400, chunks: list = None) -> str:
     """
     Transcribe audio file using OpenAI Whisper.
     If the transcript JSON already exists, skip the transcription process.
@@ -32,6 +32,8 @@ def transcribe_audio(mp3_path: str, openai_key: str, chunk_duration: int = 1400)
         mp3_path (str): Path to the MP3 file
         openai_key (str): OpenAI API key
         chunk_duration (int): Duration of each chunk in seconds
+        chunks (list): Already split audio as (path, start offset) pairs, e.g. from
+                       audio_converter.extract_asr_audio; mp3_path is not split then
         
     Returns:
         str: Path to the generated transcript JSON file
@@ -47,29 +49,32 @@ def transcribe_audio(mp3_path: str, openai_key: str, chunk_duration: int = 1400)
         print(f"Transcript already exists at {output_json_path}, skipping transcription")
         return output_json_path
     
-    openai.api_key = openai_key
+    client = get_client(openai_key)
     
-    # Get total duration of the MP3 file
-    audio = MP3(mp3_path)
-    total_duration = int(audio.info.length)
-    
-    # Generate chunking commands
-    chunk_paths = []
-    for start_time in range(0, total_duration, chunk_duration):
-        chunk_name = f"chunk_{(start_time // chunk_duration + 1):0{3}d}.mp3"
-        output_path = os.path.join(transcript_dir, chunk_name)
-        actual_duration = min(chunk_duration, total_duration - start_time)
-        os.system(f"sox \"{mp3_path}\" \"{output_path}\" trim {start_time} {actual_duration}")
-        chunk_paths.append(output_path)
-    
-    print("Audio splitting complete!")
+    if chunks is None:
+        # Get total duration of the MP3 file
+        audio = MP3(mp3_path)
+        total_duration = int(audio.info.length)
+        
+        # Generate chunking commands
+        chunks = []
+        for start_time in range(0, total_duration, chunk_duration):
+            chunk_name = f"chunk_{(start_time // chunk_duration + 1):0{3}d}.mp3"
+            output_path = os.path.join(transcript_dir, chunk_name)
+            actual_duration = min(chunk_duration, total_duration - start_time)
+            os.system(f"sox \"{mp3_path}\" \"{output_path}\" trim {start_time} {actual_duration}")
+            chunks.append((output_path, start_time))
+        
+        print("Audio splitting complete!")
     
     all_segments = []
     
-    for i, path in enumerate(chunk_paths):
+    for path, chunk_offset in chunks:
         print(f"Transcribing {path}...")
         with open(path, "rb") as audio_file:
-            result = openai.audio.transcriptions.create(
+            result = tracked_call(
+                "transcribe_audio",
+                client.audio.transcriptions.create,
                 model="whisper-1",
                 file=audio_file,
                 response_format="verbose_json",
@@ -77,7 +82,6 @@ def transcribe_audio(mp3_path: str, openai_key: str, chunk_duration: int = 1400)
             )
             
             # Add chunk offset to segment times
-            chunk_offset = i * chunk_duration
             for segment in result.segments:
                 segment.start += chunk_offset
                 segment.end += chunk_offset
@@ -103,24 +107,27 @@ def transcribe_audio(mp3_path: str, openai_key: str, chunk_duration: int = 1400)
     return output_json_path
 
 
-def get_word_level_timestamps(mp4_path: str, assemblyai_key: str, sentence: str) -> tuple:
+def find_sentence_words(mp4_path: str, assemblyai_key: str, sentence: str) -> list:
     """
-    Get exact word-level timestamps for a sentence in a video.
+    Get the exact words of a sentence in a video together with their timestamps.
     Uses flexible matching to find the sentence in the transcript.
     
     Args:
-        mp4_path (str): Path to the MP4 file
+        mp4_path (str): Path to the MP4 file, or to an audio file (e.g. an excerpt of the
+                        session audio) that is uploaded as is
         assemblyai_key (str): AssemblyAI API key
-        sentence (str): The sentence to find timestamps for
+        sentence (str): The sentence to find
         
     Returns:
-        tuple: (start_time, end_time) in seconds, or None if sentence not found
+        list: Dicts with "word", "start" and "end" in seconds, or None if sentence not found
     """
+    mp3_path = mp4_path
     # Convert MP4 to MP3 if needed
-    mp3_path = os.path.splitext(mp4_path)[0] + ".mp3"
-    if not os.path.exists(mp3_path):
-        from video_processing.audio_converter import convert_to_mp3
-        mp3_path = convert_to_mp3(mp4_path)
+    if os.path.splitext(mp4_path)[1].lower() == ".mp4":
+        mp3_path = os.path.splitext(mp4_path)[0] + ".mp3"
+        if not os.path.exists(mp3_path):
+            from video_processing.audio_converter import convert_to_mp3
+            mp3_path = convert_to_mp3(mp4_path)
     
     # Get word-level transcript
     aai.settings.api_key = assemblyai_key
@@ -158,8 +165,45 @@ def get_word_level_timestamps(mp4_path: str, assemblyai_key: str, sentence: str)
     # If we found a good enough match (at least 70% of words match)
     if len(best_window)>1 and best_score>=70:
         start_idx, end_idx = best_match
-        start_time = words[start_idx].start / 1000.0  # Convert ms to seconds
-        end_time = words[end_idx].end / 1000.0  # Convert ms to seconds
-        return (max(start_time - 0.5, 0), end_time + 0.5)  # Add small buffer
+        return [
+            {
+                "word": w.text,
+                "start": w.start / 1000.0,  # Convert ms to seconds
+                "end": w.end / 1000.0
+            }
+            for w in words[start_idx:end_idx + 1]
+        ]
+    
+    return None
+
+
+def words_to_timestamps(words: list) -> tuple:
+    """
+    Get the cut timestamps for the words of a sentence.
     
-    return None 
\ No newline at end of file
+    Args:
+        words (list): Word dicts as returned by find_sentence_words
+        
+    Returns:
+        tuple: (start_time, end_time) in seconds, including a small buffer
+    """
+    return (max(words[0]["start"] - 0.5, 0), words[-1]["end"] + 0.5)  # Add small buffer
+
+
+def get_word_level_timestamps(mp4_path: str, assemblyai_key: str, sentence: str) -> tuple:
+    """
+    Get exact word-level timestamps for a sentence in a video.
+    Uses flexible matching to find the sentence in the transcript.
+    
+    Args:
+        mp4_path (str): Path to the MP4 file
+        assemblyai_key (str): AssemblyAI API key
+        sentence (str): The sentence to find timestamps for
+        
+    Returns:
+        tuple: (start_time, end_time) in seconds, or None if sentence not found
+    """
+    words = find_sentence_words(mp4_path, assemblyai_key, sentence)
+    if words is None:
+        return None
+    return words_to_timestamps(words)
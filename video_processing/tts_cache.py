@@ -0,0 +1,157 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+from mutagen.mp3 import MP3
+
+TTS_CACHE_DIR = os.path.join("intermediate", "tts_cache")
+# Size limit of the cache, least recently used narrations are evicted first
+MAX_CACHE_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "500")) * 1024 * 1024
+
+
+
+def narration_key(text: str, voice: str, model: str) -> str:
+    """Content address of a narration: hash of text, voice and model."""
+    payload = json.dumps([text, voice, model], ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+@contextmanager
+def _key_lock(cache_dir: str, key: str, blocking: bool = True):
+    """
+    Exclusive lock of a narration across the threads and render processes, held on a
+    lock file next to it. Yields False if blocking is off and the key is in use.
+    The lock files are kept, a removed lock file could be locked twice.
+    """
+    with open(os.path.join(cache_dir, f"{key}.lock"), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write to a temporary file and rename it, so readers never see partial files."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def get_narration(text: str, synthesize, voice: str = "nova", model: str = "tts-1",
+                  cache_dir: str = TTS_CACHE_DIR) -> tuple:
+    """
+    Get the narration audio for a text, synthesizing it only on a cache miss.
+
+    Args:
+        text (str): Text to speak
+        synthesize (callable): Called as synthesize(text, voice=voice, model=model) on a
+                               cache miss, must return the MP3 bytes
+        voice (str): TTS voice
+        model (str): TTS model
+        cache_dir (str): Directory of the cache
+
+    Returns:
+        tuple: (audio_path, duration) with the duration in seconds from the cached metadata
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = narration_key(text, voice, model)
+    audio_path = os.path.join(cache_dir, f"{key}.mp3")
+    meta_path = os.path.join(cache_dir, f"{key}.json")
+
+    with _key_lock(cache_dir, key):
+        if os.path.exists(audio_path) and os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            # Mark as recently used for the eviction
+            os.utime(audio_path)
+            print(f"Using cached narration {key[:12]} ({meta['duration']:.1f}s)")
+            return audio_path, meta["duration"]
+
+        audio_bytes = synthesize(text, voice=voice, model=model)
+        _atomic_write(audio_path, audio_bytes)
+        # Only the MP3 headers are parsed, the audio is not decoded
+        duration = MP3(audio_path).info.length
+        meta = {
+            "text": text,
+            "voice": voice,
+            "model": model,
+            "duration": duration,
+            "bytes": len(audio_bytes)
+        }
+        _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    # No eviction here, concurrent renders may still use any narration: run evict_cache after the batch
+    return audio_path, duration
+
+
+def narration_words_path(audio_path: str) -> str:
+    """Word timings of a cached narration are stored next to its audio."""
+    return os.path.splitext(audio_path)[0] + ".words.json"
+
+
+def load_narration_words(audio_path: str):
+    """The stored word timings of a narration, None if it was not aligned yet."""
+    path = narration_words_path(audio_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def store_narration_words(audio_path: str, words: list):
+    """Store the word timings of a narration, they are evicted together with the audio."""
+    _atomic_write(narration_words_path(audio_path), json.dumps(words, ensure_ascii=False).encode("utf-8"))
+
+
+def evict_cache(cache_dir: str = TTS_CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES, keep=()):
+    """
+    Remove the least recently used narrations until the cache fits into max_bytes.
+    Run it once before or after a batch of renders; narrations locked by a running
+    get_narration are skipped.
+
+    Args:
+        cache_dir (str): Directory of the cache
+        max_bytes (int): Size limit of the cache
+        keep (set): Keys that must not be evicted
+    """
+    entries = []
+    for filename in os.listdir(cache_dir):
+        if not filename.endswith(".mp3"):
+            continue
+        path = os.path.join(cache_dir, filename)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, os.path.splitext(filename)[0]))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, key in sorted(entries):
+        if total <= max_bytes:
+            break
+        if key in keep:
+            continue
+        with _key_lock(cache_dir, key, blocking=False) as locked:
+            if not locked:
+                continue
+            for ext in (".mp3", ".json", ".words.json"):
+                try:
+                    os.remove(os.path.join(cache_dir, key + ext))
+                except FileNotFoundError:
+                    pass
+        total -= size
+        print(f"Evicted cached narration {key[:12]}")
@@ -0,0 +1,154 @@
+import argparse
+import os
+import threading
+from multiprocessing.managers import BaseManager
+
+import whisper
+
+# Model size (tiny, base, small, medium, large) and CPU threads of the Whisper model
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", "0"))
+# "host:port" of a running worker (python -m video_processing.whisper_service),
+# if unset the model is loaded in-process
+WHISPER_SERVICE = os.getenv("WHISPER_SERVICE")
+DEFAULT_PORT = 50555
+
+
+def service_authkey() -> bytes:
+    """
+    Shared secret of the worker and its clients from WHISPER_SERVICE_AUTHKEY.
+    There is no default: the manager unpickles what authenticated clients send.
+    """
+    authkey = os.getenv("WHISPER_SERVICE_AUTHKEY")
+    if not authkey:
+        raise RuntimeError("WHISPER_SERVICE_AUTHKEY must be set to use the Whisper service, "
+                           "e.g. to the output of: python -c \"import secrets; print(secrets.token_hex(32))\"")
+    return authkey.encode()
+
+
+class WhisperService:
+    """
+    Holds one loaded Whisper model and serves transcription requests with it.
+    Requests are serialized, the model is only loaded on the first request.
+    """
+
+    def __init__(self, model_size: str = WHISPER_MODEL, threads: int = WHISPER_THREADS):
+        self.model_size = model_size
+        self.threads = threads
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        if self._model is None:
+            if self.threads:
+                import torch
+                torch.set_num_threads(self.threads)
+            print(f"Loading Whisper model ({self.model_size})...")
+            self._model = whisper.load_model(self.model_size)
+        return self._model
+
+    def load(self):
+        """Load the model ahead of the first request."""
+        with self._lock:
+            self._get_model()
+
+    def transcribe(self, audio_path: str, word_timestamps: bool = True, **options) -> dict:
+        """
+        Transcribe a single audio (or video) file.
+
+        Args:
+            audio_path (str): Absolute path to the file, must be readable by the service process
+            word_timestamps (bool): Return word-level timestamps
+            **options: Further options for whisper's transcribe
+
+        Returns:
+            dict: The Whisper result
+        """
+        with self._lock:
+            model = self._get_model()
+            return model.transcribe(audio_path, word_timestamps=word_timestamps, **options)
+
+    def transcribe_batch(self, audio_paths: list, word_timestamps: bool = True, **options) -> list:
+        """
+        Transcribe many files with one request, e.g. the fallback segments of several shorts.
+
+        Returns:
+            list: One Whisper result per file, None for files that failed
+        """
+        results = []
+        with self._lock:
+            model = self._get_model()
+            for audio_path in audio_paths:
+                try:
+                    results.append(model.transcribe(audio_path, word_timestamps=word_timestamps, **options))
+                except Exception as e:
+                    print(f"Error transcribing {audio_path}: {e}")
+                    results.append(None)
+        return results
+
+
+class WhisperManager(BaseManager):
+    pass
+
+
+_local_service = None
+_local_service_lock = threading.Lock()
+
+
+def parse_address(address: str) -> tuple:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def connect_whisper_service(address: str, authkey: bytes = None):
+    """
+    Connect to a running Whisper worker.
+
+    Args:
+        address (str): "host:port" of the worker
+        authkey (bytes): Shared secret of the worker, see service_authkey
+
+    Returns:
+        Proxy with the methods of WhisperService
+    """
+    WhisperManager.register("get_service")
+    manager = WhisperManager(address=parse_address(address), authkey=authkey or service_authkey())
+    manager.connect()
+    return manager.get_service()
+
+
+def get_whisper_service(model_size: str = WHISPER_MODEL, threads: int = WHISPER_THREADS):
+    """
+    Get the Whisper service of this process: the shared worker if WHISPER_SERVICE is set,
+    otherwise a model that is loaded once and kept warm in this process.
+    """
+    global _local_service
+    if WHISPER_SERVICE:
+        return connect_whisper_service(WHISPER_SERVICE)
+    with _local_service_lock:
+        if _local_service is None or _local_service.model_size != model_size:
+            _local_service = WhisperService(model_size, threads)
+        return _local_service
+
+
+def serve(model_size: str = WHISPER_MODEL, threads: int = WHISPER_THREADS,
+          port: int = DEFAULT_PORT, authkey: bytes = None):
+    """Load the model once and serve transcription requests of other processes over a local socket."""
+    authkey = authkey or service_authkey()
+    service = WhisperService(model_size, threads)
+    service.load()
+    WhisperManager.register("get_service", callable=lambda: service)
+    manager = WhisperManager(address=("127.0.0.1", port), authkey=authkey)
+    server = manager.get_server()
+    print(f"Whisper service ({model_size}) listening on 127.0.0.1:{port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a warm Whisper model that other processes can share.")
+    parser.add_argument("--model", default=WHISPER_MODEL, help="Whisper model size (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=WHISPER_THREADS, help="CPU threads for inference (0: torch default)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on (default: %(default)s)")
+    args = parser.parse_args()
+
+    serve(args.model, args.threads, args.port)